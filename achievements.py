@@ -0,0 +1,153 @@
+"""
+Astrals Hub - Achievements
+Badge and achievement rules declared as data (content/achievements.json).
+Each rule tests one progress metric against a threshold; rules are indexed
+by metric and sorted by threshold, so an event only looks at the rules whose
+threshold its metric change just crossed.
+"""
+
+import bisect
+import json
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('badge', 'achievement')
+
+# Metrics each event type can change; a rule's metric must be one of these
+EVENT_METRICS = {
+    'chat': ('chats', 'topics', 'subjects', 'streak'),
+    'quiz_completed': ('quizzes', 'perfect_quizzes', 'streak'),
+    'xp': ('xp', 'level'),
+}
+METRICS = {metric for metrics in EVENT_METRICS.values() for metric in metrics}
+
+
+def metric_key(metric, subject=None):
+    """Progress key of a metric, optionally narrowed to one subject"""
+    return f'{metric}:{subject}' if subject else metric
+
+
+class AchievementEngine:
+    """Evaluates achievement rules incrementally as session events arrive"""
+
+    def __init__(self, rules):
+        self.rules = {}
+        # metric key -> (sorted thresholds, rules in the same order)
+        self._index = {}
+        grouped = {}
+        for rule in rules:
+            if rule['id'] in self.rules:
+                raise ValueError(f"Duplicate achievement rule: {rule['id']}")
+            if rule['metric'] not in METRICS:
+                raise ValueError(f"Unknown metric {rule['metric']!r} in rule {rule['id']}")
+            if rule.get('kind', 'achievement') not in KINDS:
+                raise ValueError(f"Unknown kind {rule['kind']!r} in rule {rule['id']}")
+            rule = dict(rule, kind=rule.get('kind', 'achievement'), threshold=int(rule['threshold']))
+            self.rules[rule['id']] = rule
+            grouped.setdefault(metric_key(rule['metric'], rule.get('subject')), []).append(rule)
+        for key, group in grouped.items():
+            group.sort(key=lambda rule: rule['threshold'])
+            self._index[key] = ([rule['threshold'] for rule in group], group)
+
+    @classmethod
+    def load(cls, path):
+        """Engine for the rules in a JSON file; no rules if it is missing"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rules = json.load(f)['rules']
+        except FileNotFoundError:
+            logger.warning(f"No achievement rules at {path}")
+            rules = []
+        engine = cls(rules)
+        logger.info(f"Loaded {len(engine.rules)} achievement rules")
+        return engine
+
+    def apply(self, stats, event, now, **attrs):
+        """Apply one event to a session's gamification stats in place.
+
+        Returns the rules newly earned by it, which are also appended to
+        stats['badges'] or stats['achievements'] by id.
+        """
+        progress = stats.setdefault('progress', {})
+        metrics = progress.setdefault('metrics', {})
+        changes = []
+
+        def set_metric(key, value):
+            old = metrics.get(key, 0)
+            metrics[key] = value
+            if value > old:
+                changes.append((key, old, value))
+
+        subject = attrs.get('subject') or None
+        if event == 'chat':
+            set_metric('chats', metrics.get('chats', 0) + 1)
+            topic = attrs.get('topic')
+            if topic:
+                topics = progress.setdefault('topics', [])
+                if topic not in topics:
+                    topics.append(topic)
+                    set_metric('topics', len(topics))
+            if subject:
+                subjects = progress.setdefault('subjects', [])
+                if subject not in subjects:
+                    subjects.append(subject)
+                    set_metric('subjects', len(subjects))
+        elif event == 'quiz_completed':
+            set_metric('quizzes', metrics.get('quizzes', 0) + 1)
+            if subject:
+                key = metric_key('quizzes', subject)
+                set_metric(key, metrics.get(key, 0) + 1)
+            if attrs.get('total') and attrs.get('score') == attrs['total']:
+                set_metric('perfect_quizzes', metrics.get('perfect_quizzes', 0) + 1)
+        elif event == 'xp':
+            set_metric('xp', stats['total_xp'])
+            set_metric('level', stats['level'])
+        else:
+            raise ValueError(f"Unknown achievement event: {event}")
+
+        if 'streak' in EVENT_METRICS[event]:
+            today = now.date().isoformat()
+            last_active = progress.get('last_active')
+            if last_active != today:
+                yesterday = (now.date() - timedelta(days=1)).isoformat()
+                set_metric('streak', metrics.get('streak', 0) + 1 if last_active == yesterday else 1)
+                progress['last_active'] = today
+
+        return self._earn(stats, changes, now)
+
+    def _earn(self, stats, changes, now):
+        earned_at = stats.setdefault('earned_at', {})
+        new_rules = []
+        for key, old, new in changes:
+            indexed = self._index.get(key)
+            if not indexed:
+                continue
+            thresholds, rules = indexed
+            # Exactly the rules with old < threshold <= new
+            for rule in rules[bisect.bisect_right(thresholds, old):bisect.bisect_right(thresholds, new)]:
+                if rule['id'] in earned_at:
+                    continue
+                stats['badges' if rule['kind'] == 'badge' else 'achievements'].append(rule['id'])
+                earned_at[rule['id']] = now.isoformat()
+                new_rules.append(rule)
+        return new_rules
+
+    def describe(self, stats):
+        """Every rule with the session's earned state and progress, for display"""
+        progress = stats.get('progress', {}).get('metrics', {})
+        earned_at = stats.get('earned_at', {})
+        return [
+            {
+                'id': rule['id'],
+                'kind': rule['kind'],
+                'title': rule['title'],
+                'description': rule['description'],
+                'threshold': rule['threshold'],
+                'progress': min(progress.get(metric_key(rule['metric'], rule.get('subject')), 0), rule['threshold']),
+                'earned': rule['id'] in earned_at,
+                'earned_at': earned_at.get(rule['id'])
+            }
+            for rule in self.rules.values()
+        ]
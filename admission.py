@@ -0,0 +1,205 @@
+"""
+Astrals Hub - Admission Control
+Decides before a request runs whether it may: token buckets per session and
+per client IP turn away clients sending too much with 429, and a global
+concurrency cap with a short, bounded wait queue sheds load with 503 instead
+of letting every request slow down. Both answers carry Retry-After.
+
+Limits are configured per Flask endpoint, for example
+    {'default': {'session': (5, 20), 'ip': (20, 60)},
+     'save_chat_history': {'session': (0.1, 2), 'ip': (1, 5)},
+     'get_subjects': {'session': None, 'ip': (50, 100)}}
+where (rate, burst) is requests per second and bucket size, and None turns
+a limit off. Endpoints without an entry use 'default'.
+
+State is per process; with several gunicorn workers each enforces its own share.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token buckets keyed by client, evicted once idle long enough to be full again"""
+
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [tokens, last refill, seconds to refill completely], least recently used first
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def acquire(self, key, rate, burst):
+        """Take one token; returns 0 if admitted, else the seconds until one is available"""
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now, burst / rate]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            self.rejected += 1
+            return (1 - bucket[0]) / rate
+
+    def _expire(self, now):
+        # A bucket that has refilled is the same as no bucket at all; buckets
+        # are ordered by last use, so the idle ones collect at the front
+        buckets = self._buckets
+        while buckets:
+            key, (_, last, refill) = next(iter(buckets.items()))
+            if now - last < refill and len(buckets) < self.max_keys:
+                break
+            del buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """At most max_active requests at once, with up to max_queued waiting briefly for a slot"""
+
+    def __init__(self, max_active, max_queued=0, queue_timeout=1.0):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Claim a slot; False if none freed up within the queue timeout or the queue is full"""
+        with self._condition:
+            if self.active < self.max_active:
+                self.active += 1
+                return True
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                return False
+            self.queued += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.max_active, self.queue_timeout)
+            finally:
+                self.queued -= 1
+            if not admitted:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class AdmissionControl:
+    """Flask integration: admits or rejects each request before its view runs"""
+
+    def __init__(self, app=None, limits=None, max_active=64, max_queued=128, queue_timeout=1.0,
+                 exempt=('static', 'assets', 'video', 'metrics', 'metrics_profile', 'health_check')):
+        self.limits = limits or {}
+        self.exempt = set(exempt)
+        self.sessions = RateLimiter()
+        self.ips = RateLimiter()
+        self.concurrency = ConcurrencyLimiter(max_active, max_queued, queue_timeout) if max_active else None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from flask import g, jsonify, request
+
+        def reject(status, error, retry_after):
+            response = jsonify({'error': error})
+            response.status_code = status
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response
+
+        @app.before_request
+        def admit():
+            if request.endpoint is None or request.endpoint in self.exempt or request.method == 'OPTIONS':
+                return None
+            policy = self.limits.get(request.endpoint, self.limits.get('default', {}))
+
+            checks = [(self.ips, request.remote_addr or '-', policy.get('ip'))]
+            session_id = self._session_id(request)
+            if session_id:
+                checks.append((self.sessions, session_id, policy.get('session')))
+            for limiter, client, limit in checks:
+                if not limit:
+                    continue
+                rate, burst = limit
+                wait = limiter.acquire((request.endpoint, client), rate, burst)
+                if wait:
+                    return reject(429, 'Too many requests, please slow down', wait)
+
+            if self.concurrency is not None:
+                if not self.concurrency.acquire():
+                    return reject(503, 'Server is busy, please try again shortly', 1)
+                g._admission_slot = _Slot(self.concurrency)
+            return None
+
+        @app.after_request
+        def release_when_sent(response):
+            slot = g.get('_admission_slot')
+            if slot is not None and response.is_streamed:
+                # Streams hold their slot until the body has been sent
+                g._admission_slot = None
+                response.call_on_close(slot.release)
+            return response
+
+        @app.teardown_request
+        def release(exc):
+            slot = g.pop('_admission_slot', None)
+            if slot is not None:
+                slot.release()
+
+        app.extensions['admission_control'] = self
+
+    @staticmethod
+    def _session_id(request):
+        """The session a request acts for: URL, query string or JSON body"""
+        if request.view_args and request.view_args.get('session_id'):
+            return request.view_args['session_id']
+        if request.args.get('session_id'):
+            return request.args['session_id']
+        if request.is_json:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict) and isinstance(data.get('session_id'), str):
+                return data['session_id']
+        return None
+
+    def stats(self):
+        stats = {
+            'session_buckets': len(self.sessions),
+            'ip_buckets': len(self.ips),
+            'rate_limited': self.sessions.rejected + self.ips.rejected
+        }
+        if self.concurrency is not None:
+            stats.update(active=self.concurrency.active, queued=self.concurrency.queued, shed=self.concurrency.rejected)
+        return stats
+
+
+class _Slot:
+    """A held concurrency slot, released exactly once"""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._limiter.release()
@@ -1,11 +1,32 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, url_for
 from flask_cors import CORS
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import logging
-import random
+import atexit
+import gzip
 import hashlib
+import re
+import secrets
+import threading
+import time
+
+from achievements import AchievementEngine
+from admission import AdmissionControl
+from archive import import_archives, save_snapshot
+from assets import AssetPipeline
+from generation import BackendUnavailable, create_backend
+from gamification import GamificationService
+from history_writer import HistoryWriter
+from knowledge import KnowledgeStore
+from leaderboard import Leaderboard
+from metrics import RequestMetrics
+from quiz_store import QuizStore
+from response_cache import LRUCache
+from search import SearchService
+from session_store import SessionStore
+from storage import MemoryStorage, create_storage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,85 +36,222 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
 # Configuration
-app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.config['SECRET_KEY'] = os.environ.get('ASTRALS_SECRET_KEY')
+if not app.config['SECRET_KEY']:
+    # Fine for a single development process; set the variable in production
+    logger.warning("ASTRALS_SECRET_KEY is not set; using a random per-process key")
+    app.config['SECRET_KEY'] = secrets.token_hex(32)
+app.config['DEBUG'] = os.environ.get('ASTRALS_DEBUG', '0') == '1'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# In-memory storage (in production, use a database)
-chat_sessions = {}
-user_profiles = {}
-gamification_data = {}
-quiz_data = {}
-achievements_data = {}
+# Content directories
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUIZ_DIR = os.path.join(BASE_DIR, 'content', 'quizzes')
+KNOWLEDGE_DIR = os.path.join(BASE_DIR, 'content', 'knowledge')
+ACHIEVEMENTS_PATH = os.path.join(BASE_DIR, 'content', 'achievements.json')
+VIDEO_DIR = os.path.join(BASE_DIR, 'static', 'videos')
+
+# Splash video caching: versioned URLs are immutable, plain ones revalidate after this
+app.config['VIDEO_MAX_AGE'] = int(os.environ.get('ASTRALS_VIDEO_MAX_AGE', 7 * 24 * 3600))
+
+# Built assets (python assets.py build); templates fall back to /static without them
+asset_pipeline = AssetPipeline(app)
+
+# Storage backend: 'memory' (single process) or 'sqlite' (shared between workers)
+app.config['STORAGE_BACKEND'] = os.environ.get('ASTRALS_STORAGE', 'memory')
+app.config['STORAGE_PATH'] = os.environ.get('ASTRALS_DB_PATH', os.path.join(BASE_DIR, 'data', 'astrals.db'))
+
+# Bounds for the in-memory chat session store
+app.config['MAX_CHAT_SESSIONS'] = int(os.environ.get('ASTRALS_MAX_CHAT_SESSIONS', 10000))
+app.config['MAX_MESSAGES_PER_SESSION'] = int(os.environ.get('ASTRALS_MAX_MESSAGES_PER_SESSION', 200))
+app.config['CHAT_SESSION_TTL'] = int(os.environ.get('ASTRALS_CHAT_SESSION_TTL', 24 * 3600))
+app.config['CHAT_SPILL_DIR'] = os.environ.get('ASTRALS_CHAT_SPILL_DIR') or None
+
+chat_sessions = SessionStore(
+    max_sessions=app.config['MAX_CHAT_SESSIONS'],
+    max_messages=app.config['MAX_MESSAGES_PER_SESSION'],
+    ttl=app.config['CHAT_SESSION_TTL'],
+    spill_dir=app.config['CHAT_SPILL_DIR']
+)
+storage = create_storage(app.config['STORAGE_BACKEND'], app.config['STORAGE_PATH'], chat_sessions)
+
+# Archives (python archive.py compact/export) loaded into storage at startup;
+# comma-separated globs, imported idempotently
+app.config['IMPORT_ARCHIVES'] = os.environ.get('ASTRALS_IMPORT_ARCHIVES', '')
+if app.config['IMPORT_ARCHIVES']:
+    import_archives(app.config['IMPORT_ARCHIVES'], storage)
+
+# The memory backend is written to this archive at shutdown and read back at
+# startup; without it, profiles, XP and leaderboards end with the process
+app.config['MEMORY_SNAPSHOT'] = os.environ.get('ASTRALS_MEMORY_SNAPSHOT') or None
+if isinstance(storage, MemoryStorage) and app.config['MEMORY_SNAPSHOT']:
+    import_archives(app.config['MEMORY_SNAPSHOT'], storage)
+
+# Worker processes run.py starts; each holds its own memory backend
+app.config['WORKERS'] = int(os.environ.get('ASTRALS_WORKERS', 1))
+
+# Seconds shutdown waits for running requests before closing storage
+app.config['GRACEFUL_TIMEOUT'] = float(os.environ.get('ASTRALS_GRACEFUL_TIMEOUT', 30))
+
+# Saved chats are appended to per-session JSONL files by a background writer
+app.config['CHAT_SAVE_DIR'] = os.environ.get('ASTRALS_CHAT_SAVE_DIR', os.path.join(BASE_DIR, 'data'))
+app.config['CHAT_SAVE_COMPRESS'] = os.environ.get('ASTRALS_CHAT_SAVE_COMPRESS', '0') == '1'
+
+history_writer = HistoryWriter(app.config['CHAT_SAVE_DIR'], compress=app.config['CHAT_SAVE_COMPRESS'])
+
+# How long browsers may use a quiz pack before revalidating it
+app.config['QUIZ_PACK_MAX_AGE'] = int(os.environ.get('ASTRALS_QUIZ_PACK_MAX_AGE', 3600))
+
+# Largest number of messages plus XP events accepted in one /api/sync call
+app.config['SYNC_MAX_BATCH'] = int(os.environ.get('ASTRALS_SYNC_MAX_BATCH', 500))
+
+# XP rankings kept by the storage backend and updated on every award; totals
+# stored before the all-time board existed are added to it here
+leaderboard = Leaderboard(storage)
+leaderboard.load((session_id, stats.get('total_xp', 0)) for session_id, stats in storage.iter_gamification())
+
+# XP awards and achievement events go through one atomic update per session
+achievement_engine = AchievementEngine.load(ACHIEVEMENTS_PATH)
+gamification = GamificationService(storage, leaderboard, achievement_engine)
+
+# Request metrics at /metrics; set ASTRALS_PROFILE_TOKEN and send it in the
+# X-Astrals-Profile header to sample a single request's stacks
+request_metrics = RequestMetrics(app, profile_token=os.environ.get('ASTRALS_PROFILE_TOKEN') or None)
+request_metrics.gauge('astrals_chat_sessions', 'Chat sessions held in memory.', lambda: len(chat_sessions))
+request_metrics.gauge('astrals_chat_messages', 'Chat messages held in memory.', lambda: chat_sessions.stats()['messages'])
+request_metrics.gauge('astrals_gamification_entries', 'Sessions with gamification stats.', lambda: storage.count_gamification())
+request_metrics.gauge('astrals_history_writer_pending', 'Chat saves waiting to be written.', lambda: history_writer.pending())
+request_metrics.gauge('astrals_response_cache_entries', 'Cached chat responses.', lambda: len(astrals_hub.response_cache))
+
+# Admission control: (requests per second, burst) token buckets per session and
+# client IP, by endpoint; ASTRALS_RATE_LIMITS (JSON, same shape) overrides entries
+app.config['RATE_LIMITS'] = {
+    'default': {'session': (5, 30), 'ip': (20, 100)},
+    'chat': {'session': (1, 10), 'ip': (10, 50)},
+    'chat_stream': {'session': (1, 10), 'ip': (10, 50)},
+    'save_chat_history': {'session': (0.1, 3), 'ip': (1, 10)},
+    'sync': {'session': (0.5, 10), 'ip': (10, 50)},
+    'search': {'session': (2, 20), 'ip': (10, 50)},
+    'get_subjects': {'session': None, 'ip': (50, 200)},
+    'get_subject_topics': {'session': None, 'ip': (50, 200)},
+    # A classroom behind one IP installing the service worker fetches every pack at once
+    'index': {'session': None, 'ip': (50, 300)},
+    'service_worker': {'session': None, 'ip': (50, 300)},
+    'get_quiz_pack': {'session': None, 'ip': (100, 1000)},
+}
+app.config['RATE_LIMITS'].update(json.loads(os.environ.get('ASTRALS_RATE_LIMITS') or '{}'))
+# Requests running at once; more wait up to ASTRALS_QUEUE_TIMEOUT seconds in a bounded queue (0 disables)
+app.config['MAX_ACTIVE_REQUESTS'] = int(os.environ.get('ASTRALS_MAX_ACTIVE_REQUESTS', 64))
+app.config['MAX_QUEUED_REQUESTS'] = int(os.environ.get('ASTRALS_MAX_QUEUED_REQUESTS', 128))
+app.config['QUEUE_TIMEOUT'] = float(os.environ.get('ASTRALS_QUEUE_TIMEOUT', 1.0))
+
+admission_control = None
+if os.environ.get('ASTRALS_ADMISSION_CONTROL', '1') == '1':
+    admission_control = AdmissionControl(
+        app,
+        limits=app.config['RATE_LIMITS'],
+        max_active=app.config['MAX_ACTIVE_REQUESTS'],
+        max_queued=app.config['MAX_QUEUED_REQUESTS'],
+        queue_timeout=app.config['QUEUE_TIMEOUT']
+    )
+
+def normalize_message(text):
+    """Lowercased text with runs of whitespace collapsed"""
+    return ' '.join(text.lower().split())
 
 class AstralsHub:
     """Astrals Hub - Gamified Learning Platform for Rural Education"""
     
-    def __init__(self):
-        self.knowledge_base = {
-            'mathematics': {
-                'topics': ['basic_arithmetic', 'fractions', 'percentages', 'geometry', 'algebra', 'measurements'],
-                'responses': {
-                    'basic_arithmetic': "Let's start with basic math using examples from daily life! If you have 15 mangoes and sell 8, how many are left? 15 - 8 = 7 mangoes. This is subtraction!",
-                    'fractions': "Fractions are like sharing! If you have 1 whole roti and share it equally between 2 people, each gets 1/2 (half) of the roti.",
-                    'percentages': "Percentages help us understand discounts and savings. If a seed packet costs ₹100 and has 20% off, you save ₹20 and pay ₹80.",
-                    'geometry': "Geometry is everywhere in farming! Your field might be rectangular (length × width = area). A circular well has a radius and circumference.",
-                    'algebra': "Algebra uses letters for unknown numbers. If you have 'x' cows and buy 3 more, you have 'x + 3' cows total.",
-                    'measurements': "In farming, we measure land in acres, crops in kilograms, and distances in kilometers. 1 acre = 4047 square meters."
-                }
-            },
-            'science': {
-                'topics': ['agriculture', 'weather', 'plants_animals', 'soil_water', 'health_hygiene', 'renewable_energy'],
-                'responses': {
-                    'agriculture': "Agriculture is the science of growing crops and raising animals. Different crops need different amounts of water, sunlight, and nutrients from soil.",
-                    'weather': "Weather affects farming! Monsoon brings rain for crops, but too much rain can flood fields. Temperature affects when to plant seeds.",
-                    'plants_animals': "Plants make their own food using sunlight (photosynthesis). Animals depend on plants or other animals for food. This creates a food chain.",
-                    'soil_water': "Good soil has nutrients like nitrogen, phosphorus, and potassium. Water is essential for all life - plants need it to grow and animals need it to survive.",
-                    'health_hygiene': "Clean water, proper sanitation, and balanced diet keep us healthy. Washing hands prevents diseases. Vaccination protects us from serious illnesses.",
-                    'renewable_energy': "Solar panels use sunlight to make electricity. Windmills use wind power. These are renewable because sun and wind never run out!"
-                }
-            },
-            'english': {
-                'topics': ['basic_english', 'grammar', 'vocabulary', 'reading', 'writing', 'communication'],
-                'responses': {
-                    'basic_english': "English helps us communicate with people from different places. Start with simple words: 'Hello' means 'Namaste', 'Thank you' means 'Dhanyawad'.",
-                    'grammar': "Grammar helps us speak and write correctly. 'I am' (present), 'I was' (past), 'I will be' (future). Subject + verb + object makes a sentence.",
-                    'vocabulary': "Learn new words every day! 'Farmer' grows crops, 'village' is where we live, 'market' is where we buy things. Use a dictionary to find meanings.",
-                    'reading': "Reading improves our knowledge. Start with simple stories, then newspapers. Read aloud to improve pronunciation and understanding.",
-                    'writing': "Writing helps us express thoughts clearly. Start with simple sentences, then paragraphs. Practice writing about your daily life and experiences.",
-                    'communication': "Good communication means speaking clearly and listening carefully. Use simple words, speak slowly, and ask questions if you don't understand."
-                }
-            },
-            'social_studies': {
-                'topics': ['indian_history', 'geography', 'government', 'rights_duties', 'culture_traditions', 'economics'],
-                'responses': {
-                    'indian_history': "India has a rich history! Ancient civilizations like Harappa, great empires like Maurya and Gupta, and the freedom struggle led by Gandhi shaped our country.",
-                    'geography': "India has diverse geography: Himalayas in north, Thar desert in west, coastal plains in south. Different regions have different climates and crops.",
-                    'government': "India is a democracy. People elect leaders through voting. Panchayat governs villages, state government manages states, central government manages the country.",
-                    'rights_duties': "Every citizen has rights (freedom of speech, education) and duties (paying taxes, following laws). Rights and duties go together for a good society.",
-                    'culture_traditions': "India has diverse cultures! Different states have different languages, festivals, food, and traditions. Unity in diversity is our strength.",
-                    'economics': "Economics studies how people earn, spend, and save money. In villages, people earn through farming, handicrafts, and small businesses. Budgeting helps manage money."
-                }
-            }
-        }
+    def __init__(self, quiz_dir=QUIZ_DIR, knowledge_dir=KNOWLEDGE_DIR, response_cache_size=5000,
+                 knowledge_cache_size=64, generation_backend='rules', **generation_options):
+        # Topic explanations per (locale, subject), parsed on first use
+        self.knowledge = KnowledgeStore(knowledge_dir, max_packs=knowledge_cache_size)
+        
+        # Generated responses, keyed on normalized input, locale and pack version
+        self.response_cache = LRUCache(response_cache_size)
+        
+        # Quiz bank, loaded from disk once and reloaded when the files change;
+        # translated questions live in <quiz_dir>/<locale>/ and load on first use
+        self.quiz_dir = quiz_dir
+        self.quiz_store = QuizStore(quiz_dir)
+        self._localized_quiz_stores = {}
+        
+        # Where answers come from; the rules below are always the fallback
+        self.backend = create_backend(generation_backend, self._compute_response, **generation_options)
+    
+    @property
+    def knowledge_base(self):
+        """Subjects of the default locale"""
+        return self.knowledge.knowledge_base()
     
-    def generate_response(self, user_message, subject=None, user_level='intermediate'):
+    def generate_response(self, user_message, subject=None, user_level='intermediate', locale=None):
         """Generate an AI response based on user input"""
-        message_lower = user_message.lower()
+        locale = self.knowledge.resolve_locale(locale)
+        # Matching is case-insensitive, so the normalized text answers identically;
+        # it keys the cache and shared backend calls, but the backend gets the original
+        normalized = normalize_message(user_message)
+        # The greeting varies by hour, so the hour is part of the key
+        key = (normalized, subject, user_level, datetime.now().strftime("%H"), locale, self.knowledge.version(locale))
+        response = self.response_cache.get(key)
+        if response is None:
+            try:
+                response = self.backend.generate(user_message, subject, user_level, locale, key=normalized)
+                self.response_cache.put(key, response)
+            except BackendUnavailable as e:
+                # Not cached, so the next identical question tries the backend again
+                logger.warning(f"Generation backend unavailable, answering from rules: {str(e)}")
+                response = self._compute_response(user_message, subject, user_level, locale)
+        return response
+    
+    def _compute_response(self, user_message, subject, user_level, locale=None):
+        user_message = normalize_message(user_message)
+        knowledge_base = self.knowledge.knowledge_base(locale)
+        match = self.knowledge.matcher(locale).classify(user_message)
         
         # Greeting responses
-        if any(word in message_lower for word in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
+        if match.greeting:
             return self._get_greeting_response(subject)
         
         # Help requests
-        if any(word in message_lower for word in ['help', 'what can you do', 'how do you work']):
+        if match.help:
             return self._get_help_response()
         
         # Subject-specific responses
-        if subject and subject.lower() in self.knowledge_base:
-            return self._get_subject_response(user_message, subject.lower())
+        if subject and subject.lower() in knowledge_base:
+            return self._get_subject_response(user_message, subject.lower(), match, locale)
+        
+        # No subject selected: answer from whichever subject the topic belongs to
+        best_topic = match.best_topic()
+        if best_topic:
+            topic_subject, topic = best_topic
+            return self._get_topic_response(topic_subject, topic, locale)
         
         # General educational responses
-        return self._get_general_response(user_message, user_level)
+        return self._get_general_response(user_message, user_level, match, locale)
+    
+    def topic_of(self, user_message, subject=None, locale=None):
+        """(subject, topic) a message is about, preferring the selected subject, or None"""
+        match = self.knowledge.matcher(locale).classify(normalize_message(user_message))
+        if subject and subject.lower() in self.knowledge.knowledge_base(locale):
+            topic = match.topic_for(subject.lower())
+            return (subject.lower(), topic) if topic else None
+        return match.best_topic()
+    
+    def generate_response_stream(self, user_message, subject=None, user_level='intermediate', chunk_size=48, locale=None):
+        """Yield the response in word-aligned chunks of roughly chunk_size characters
+
+        Backends return complete answers, so this chunks a finished response
+        rather than relaying tokens as they are generated.
+        """
+        response = self.generate_response(user_message, subject, user_level, locale)
+        chunk = ''
+        for word in re.finditer(r'\S+\s*', response):
+            chunk += word.group()
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = ''
+        if chunk:
+            yield chunk
     
     def _get_greeting_response(self, subject=None):
         greetings = [
@@ -120,176 +278,239 @@ class AstralsHub:
 
 Just ask me about any topic, and I'll do my best to help you understand it better!"""
     
-    def _get_subject_response(self, user_message, subject):
-        subject_data = self.knowledge_base[subject]
-        message_lower = user_message.lower()
+    def _get_subject_response(self, user_message, subject, match=None, locale=None):
+        if match is None:
+            match = self.knowledge.matcher(locale).classify(user_message)
         
         # Check for specific topics within the subject
-        for topic in subject_data['topics']:
-            if topic.replace('_', ' ') in message_lower:
-                return subject_data['responses'].get(topic, f"Great question about {topic}! Let me explain this concept in detail...")
+        topic = match.topic_for(subject)
+        if topic:
+            return self._get_topic_response(subject, topic, locale)
         
         # General subject response
         return f"Excellent question about {subject.title()}! I'd be happy to help you understand this better. Could you be more specific about which aspect of {subject} you'd like to explore?"
     
-    def _get_general_response(self, user_message, user_level):
+    def _get_topic_response(self, subject, topic, locale=None):
+        responses = self.knowledge.pack(locale, subject)['responses']
+        return responses.get(topic, f"Great question about {topic}! Let me explain this concept in detail...")
+    
+    def _get_general_response(self, user_message, user_level, match=None, locale=None):
+        if match is None:
+            match = self.knowledge.matcher(locale).classify(user_message)
+        
         # Analyze the message for educational intent
-        if any(word in user_message.lower() for word in ['explain', 'what is', 'how does', 'why']):
+        if match.intent == 'explain':
             return "That's a great question! I'd be happy to explain this concept. Could you provide a bit more context or specify which subject area this relates to?"
         
-        if any(word in user_message.lower() for word in ['example', 'examples', 'show me']):
+        if match.intent == 'example':
             return "I'd love to provide examples! To give you the most relevant examples, could you tell me which subject or topic you're studying?"
         
-        if any(word in user_message.lower() for word in ['practice', 'exercise', 'problem']):
+        if match.intent == 'practice':
             return "Practice is essential for learning! I can help you with practice problems. What subject and topic would you like to practice?"
         
         # Default response
         return "I'm here to help you learn! Could you tell me more about what you'd like to study or which subject you're working on? I can provide explanations, examples, and practice problems."
     
-    def generate_quiz_questions(self, subject, class_level):
-        """Generate quiz questions for a specific subject and class level"""
-        questions = {
-            'mathematics': {
-                6: [
-                    {
-                        'question': 'If a farmer has 15 mangoes and sells 8, how many are left?',
-                        'options': ['7', '23', '8', '15'],
-                        'correct': 0,
-                        'xp': 10,
-                        'explanation': '15 - 8 = 7 mangoes left'
-                    },
-                    {
-                        'question': 'A rectangular field is 8 meters long and 5 meters wide. What is its area?',
-                        'options': ['40 square meters', '13 meters', '26 meters', '35 square meters'],
-                        'correct': 0,
-                        'xp': 15,
-                        'explanation': 'Area = length × width = 8 × 5 = 40 square meters'
-                    },
-                    {
-                        'question': 'If 1 kg of rice costs ₹50, how much will 3 kg cost?',
-                        'options': ['₹150', '₹53', '₹47', '₹100'],
-                        'correct': 0,
-                        'xp': 12,
-                        'explanation': '3 kg × ₹50 = ₹150'
-                    }
-                ],
-                7: [
-                    {
-                        'question': 'What is 3/4 + 1/2?',
-                        'options': ['5/4', '4/6', '1', '3/6'],
-                        'correct': 0,
-                        'xp': 15,
-                        'explanation': '3/4 + 1/2 = 3/4 + 2/4 = 5/4'
-                    }
-                ],
-                8: [
-                    {
-                        'question': 'Solve for x: 2x + 5 = 13',
-                        'options': ['x = 4', 'x = 3', 'x = 5', 'x = 6'],
-                        'correct': 0,
-                        'xp': 20,
-                        'explanation': '2x + 5 = 13, so 2x = 8, therefore x = 4'
-                    }
-                ]
-            },
-            'science': {
-                6: [
-                    {
-                        'question': 'What do plants need to make their own food?',
-                        'options': ['Sunlight, water, and soil', 'Only water', 'Only sunlight', 'Only soil'],
-                        'correct': 0,
-                        'xp': 10,
-                        'explanation': 'Plants use sunlight, water, and nutrients from soil to make food through photosynthesis'
-                    },
-                    {
-                        'question': 'Which season is best for growing rice in India?',
-                        'options': ['Summer', 'Monsoon', 'Winter', 'Spring'],
-                        'correct': 1,
-                        'xp': 15,
-                        'explanation': 'Monsoon season provides the water that rice crops need to grow'
-                    },
-                    {
-                        'question': 'What happens when we don\'t wash our hands before eating?',
-                        'options': ['We can get sick', 'Nothing happens', 'Food tastes better', 'We get stronger'],
-                        'correct': 0,
-                        'xp': 12,
-                        'explanation': 'Dirty hands carry germs that can make us sick when we eat'
-                    }
-                ]
-            },
-            'english': {
-                6: [
-                    {
-                        'question': 'What does "Namaste" mean in English?',
-                        'options': ['Hello', 'Thank you', 'Goodbye', 'Please'],
-                        'correct': 0,
-                        'xp': 10,
-                        'explanation': '"Namaste" is a greeting that means "Hello" in English'
-                    },
-                    {
-                        'question': 'Which word describes a person who grows crops?',
-                        'options': ['Teacher', 'Farmer', 'Doctor', 'Engineer'],
-                        'correct': 1,
-                        'xp': 15,
-                        'explanation': 'A farmer is a person who grows crops and raises animals'
-                    },
-                    {
-                        'question': 'What is the correct way to greet someone in English?',
-                        'options': ['Hello, how are you?', 'Good morning', 'Both A and B', 'None of these'],
-                        'correct': 2,
-                        'xp': 12,
-                        'explanation': 'Both "Hello, how are you?" and "Good morning" are correct English greetings'
-                    }
-                ]
-            },
-            'social_studies': {
-                6: [
-                    {
-                        'question': 'What is the capital of India?',
-                        'options': ['Mumbai', 'New Delhi', 'Kolkata', 'Chennai'],
-                        'correct': 1,
-                        'xp': 10,
-                        'explanation': 'New Delhi is the capital of India'
-                    },
-                    {
-                        'question': 'Who leads the government in a village?',
-                        'options': ['Sarpanch', 'Chief Minister', 'Prime Minister', 'President'],
-                        'correct': 0,
-                        'xp': 15,
-                        'explanation': 'Sarpanch is the head of the village panchayat (local government)'
-                    },
-                    {
-                        'question': 'Which mountain range is in the north of India?',
-                        'options': ['Western Ghats', 'Himalayas', 'Vindhya', 'Aravalli'],
-                        'correct': 1,
-                        'xp': 12,
-                        'explanation': 'The Himalayas are the highest mountain range in the north of India'
-                    }
-                ]
-            }
-        }
-        
-        # Get questions for the specific subject and class level
-        subject_questions = questions.get(subject, {})
-        class_questions = subject_questions.get(class_level, [])
-        
-        # If no questions for specific class, try to get from nearby classes
-        if not class_questions:
-            for level in [class_level - 1, class_level + 1, class_level - 2, class_level + 2]:
-                if level in subject_questions:
-                    class_questions = subject_questions[level]
-                    break
-        
-        # If still no questions, return empty list
-        return class_questions if class_questions else []
+    def generate_quiz_questions(self, subject, class_level, count=None, locale=None):
+        """Get quiz questions for a specific subject and class level"""
+        # Nearby-class fallback is resolved inside the store's index
+        return self.quiz_store_for(subject, class_level, locale).get_questions(subject, class_level, count)
+    
+    def quiz_store_for(self, subject, class_level, locale=None):
+        """The locale's quiz store if it has questions for this subject and class, else the default"""
+        locale = self.knowledge.resolve_locale(locale)
+        if locale == self.knowledge.default_locale:
+            return self.quiz_store
+        store = self._localized_quiz_stores.get(locale)
+        if store is None:
+            directory = os.path.join(self.quiz_dir, locale)
+            if not os.path.isdir(directory):
+                return self.quiz_store
+            store = self._localized_quiz_stores.setdefault(locale, QuizStore(directory))
+        return store if store.content_version(subject, class_level) else self.quiz_store
 
 # Initialize Astrals Hub
-astrals_hub = AstralsHub()
+app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('ASTRALS_RESPONSE_CACHE_SIZE', 5000))
+# Knowledge packs (one per locale and subject) kept parsed in memory
+app.config['KNOWLEDGE_CACHE_SIZE'] = int(os.environ.get('ASTRALS_KNOWLEDGE_CACHE_SIZE', 64))
+
+# Generation backend: 'rules' (built in) or 'http' (a model server, see generation.py)
+app.config['GENERATION_BACKEND'] = os.environ.get('ASTRALS_GENERATION_BACKEND', 'rules')
+app.config['GENERATION_URL'] = os.environ.get('ASTRALS_GENERATION_URL')
+app.config['GENERATION_TIMEOUT'] = float(os.environ.get('ASTRALS_GENERATION_TIMEOUT', 5.0))
+app.config['GENERATION_WORKERS'] = int(os.environ.get('ASTRALS_GENERATION_WORKERS', 8))
+app.config['GENERATION_MAX_PENDING'] = int(os.environ.get('ASTRALS_GENERATION_MAX_PENDING', 64))
+
+generation_options = {}
+if app.config['GENERATION_BACKEND'] == 'http':
+    generation_options = {
+        'url': app.config['GENERATION_URL'],
+        'timeout': app.config['GENERATION_TIMEOUT'],
+        'max_workers': app.config['GENERATION_WORKERS'],
+        'max_pending': app.config['GENERATION_MAX_PENDING'],
+        'api_key': os.environ.get('ASTRALS_GENERATION_API_KEY') or None
+    }
+astrals_hub = AstralsHub(
+    response_cache_size=app.config['RESPONSE_CACHE_SIZE'],
+    knowledge_cache_size=app.config['KNOWLEDGE_CACHE_SIZE'],
+    generation_backend=app.config['GENERATION_BACKEND'],
+    **generation_options
+)
+request_metrics.gauge('astrals_generation_pending', 'Distinct prompts waiting on the generation backend.',
+                      lambda: astrals_hub.backend.pending())
+
+# Search indexes: content is indexed at startup, chat history per session on first search
+app.config['SEARCH_MAX_SESSIONS'] = int(os.environ.get('ASTRALS_SEARCH_MAX_SESSIONS', 1000))
+app.config['SEARCH_MAX_RESULTS'] = int(os.environ.get('ASTRALS_SEARCH_MAX_RESULTS', 50))
+
+def search_documents():
+    """(version, (text, document) pairs) for the knowledge base and quiz bank"""
+    def documents():
+        for subject, subject_data in astrals_hub.knowledge_base.items():
+            for topic, response in subject_data['responses'].items():
+                title = topic.replace('_', ' ')
+                yield f"{title}\n{response}", {'kind': 'topic', 'subject': subject, 'topic': topic, 'title': title.title()}
+        for subject, class_level, question in astrals_hub.quiz_store.iter_questions():
+            yield f"{question.get('question', '')}\n{question.get('explanation', '')}", {
+                'kind': 'quiz', 'subject': subject, 'class': class_level, 'title': question.get('question', '')
+            }
+    return (astrals_hub.knowledge.version(), astrals_hub.quiz_store.version), documents()
+
+search_service = SearchService(storage, search_documents, max_sessions=app.config['SEARCH_MAX_SESSIONS'])
+search_service.content_index()
+request_metrics.gauge('astrals_search_sessions', 'Chat histories held in the search index.', lambda: len(search_service))
+
+# Landing page rendered once per app version, with its gzipped form
+_index_page = {'page': None}
 
 @app.route('/')
 def index():
     """Serve the main page"""
-    return render_template('index.html')
+    version = app_version()
+    page = _index_page['page']
+    if page is None or page['version'] != version:
+        body = render_template('index.html', splash=splash_video()).encode('utf-8')
+        page = {
+            'version': version,
+            'identity': body,
+            'gzip': gzip.compress(body, mtime=0),
+            'etag': hashlib.sha1(body).hexdigest()[:16]
+        }
+        # One assignment, so concurrent requests see the old page or the new one
+        _index_page['page'] = page
+    
+    encoding = 'gzip' if request.accept_encodings['gzip'] else 'identity'
+    response = Response(page[encoding], mimetype='text/html')
+    if encoding == 'gzip':
+        response.headers['Content-Encoding'] = 'gzip'
+    # Strong validators must differ between encodings of the same page
+    response.set_etag(f"{page['etag']}-{encoding}")
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Seconds the app version is trusted before its files are looked at again (debug always looks)
+app.config['VERSION_CHECK_INTERVAL'] = float(os.environ.get('ASTRALS_VERSION_CHECK_INTERVAL', 10))
+_app_version = {'value': None, 'checked': 0.0}
+
+def app_version():
+    """Changes whenever the page, its assets, the splash video or the quiz bank change"""
+    now = time.monotonic()
+    if (_app_version['value'] is None or app.debug
+            or now - _app_version['checked'] >= app.config['VERSION_CHECK_INTERVAL']):
+        _app_version.update(value=compute_app_version(), checked=now)
+    return _app_version['value']
+
+def compute_app_version():
+    parts = [asset_pipeline.version, str(astrals_hub.quiz_store.last_modified), json.dumps(splash_video(), sort_keys=True)]
+    for path in ('templates/index.html', 'templates/sw.js', 'static/styles.css', 'static/script.js'):
+        try:
+            parts.append(str(os.stat(os.path.join(BASE_DIR, path)).st_mtime_ns))
+        except OSError:
+            parts.append('-')
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()[:12]
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker precaching the app shell and quiz packs of the current version"""
+    shell_urls = [url_for('index'), asset_pipeline.asset_url('styles.css'), asset_pipeline.asset_url('script.js')]
+    for vendored in ('vendor/fontawesome.css', 'vendor/fonts.css'):
+        if asset_pipeline.has_asset(vendored):
+            shell_urls.append(asset_pipeline.asset_url(vendored))
+    poster = splash_video()['poster']
+    if poster:
+        shell_urls.append(poster)
+    quiz_pack_urls = [
+        url_for('get_quiz_pack', subject=subject, **{'class': class_level})
+        for subject, class_level in astrals_hub.quiz_store.levels()
+    ]
+    
+    response = Response(
+        render_template('sw.js', version=app_version(), shell_urls=shell_urls, quiz_pack_urls=quiz_pack_urls),
+        mimetype='application/javascript'
+    )
+    # Browsers must always see the current version to notice an update
+    response.cache_control.no_cache = True
+    return response
+
+# Rendition manifest written by `python download_video.py transcode`
+_splash_manifest = {'mtime': None, 'data': None}
+
+def splash_video():
+    """Poster and renditions (smallest first) of the splash video, with versioned URLs"""
+    path = os.path.join(VIDEO_DIR, 'renditions.json')
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _splash_manifest['data'] is None or mtime != _splash_manifest['mtime']:
+        manifest = {'poster': None, 'renditions': [{'file': 'intro.mp4'}]}
+        if mtime is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading splash video renditions: {str(e)}")
+        _splash_manifest.update(mtime=mtime, data=manifest)
+    manifest = _splash_manifest['data']
+
+    renditions = []
+    for rendition in manifest.get('renditions', []):
+        url = video_url(rendition['file'])
+        if url:
+            renditions.append(dict(rendition, url=url))
+    return {
+        'poster': video_url(manifest['poster']) if manifest.get('poster') else None,
+        'renditions': renditions
+    }
+
+def video_version(filename):
+    """Version derived from the file's size and mtime, or None if it is missing"""
+    try:
+        stat = os.stat(os.path.join(VIDEO_DIR, filename))
+    except (OSError, ValueError):
+        return None
+    return hashlib.sha1(f'{stat.st_size}-{stat.st_mtime_ns}'.encode()).hexdigest()[:10]
+
+def video_url(filename):
+    version = video_version(filename)
+    return url_for('video', filename=filename, v=version) if version else None
+
+@app.route('/videos/<path:filename>')
+def video(filename):
+    """Splash video files with byte-range (206) support and strong caching"""
+    # Only a URL naming the current version may be cached forever
+    version = request.args.get('v')
+    versioned = bool(version) and version == video_version(filename)
+    max_age = 365 * 24 * 3600 if versioned else app.config['VIDEO_MAX_AGE']
+    # conditional=True answers Range/If-Range with 206 and ETag/If-None-Match with 304
+    response = send_from_directory(VIDEO_DIR, filename, conditional=True, max_age=max_age)
+    # Advertise range support up front so players can seek without a full download
+    response.accept_ranges = 'bytes'
+    response.cache_control.public = True
+    if versioned:
+        response.cache_control.immutable = True
+    return response
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -300,49 +521,133 @@ def chat():
         session_id = data.get('session_id', 'default')
         subject = data.get('subject', '')
         user_level = data.get('user_level', 'intermediate')
+        locale = astrals_hub.knowledge.resolve_locale(data.get('locale'))
         
         if not user_message:
             return jsonify({'error': 'Message cannot be empty'}), 400
         
         # Generate AI response
-        ai_response = astrals_hub.generate_response(user_message, subject, user_level)
-        
-        # Store in session
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
-        
-        chat_sessions[session_id].append({
-            'user_message': user_message,
-            'ai_response': ai_response,
-            'timestamp': datetime.now().isoformat(),
-            'subject': subject
-        })
-        
-        # Update user profile stats
-        update_user_stats(session_id)
+        ai_response = astrals_hub.generate_response(user_message, subject, user_level, locale)
+        message_id = record_chat(session_id, user_message, ai_response, subject, locale=locale)
         
         return jsonify({
             'response': ai_response,
             'timestamp': datetime.now().isoformat(),
-            'session_id': session_id
+            'session_id': session_id,
+            'message_id': message_id,
+            'locale': locale
         })
         
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the chat response as Server-Sent Events
+
+    The answer is generated whole and then sent in chunks, so the first
+    chunk arrives once generation is done; what streaming saves is the
+    transfer of the rest behind it.
+    """
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    user_message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+    subject = data.get('subject', '')
+    user_level = data.get('user_level', 'intermediate')
+    locale = data.get('locale') or ''
+    if not all(isinstance(field, str) for field in (user_message, session_id, subject, user_level, locale)):
+        return jsonify({'error': 'message, session_id, subject, user_level and locale must be strings'}), 400
+    user_message = user_message.strip()
+    locale = astrals_hub.knowledge.resolve_locale(locale)
+    
+    if not user_message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    def events():
+        chunks = []
+        ttfb = None
+        try:
+            for chunk in astrals_hub.generate_response_stream(user_message, subject, user_level, locale=locale):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                chunks.append(chunk)
+                yield sse_event('chunk', {'text': chunk})
+            
+            # Only a fully delivered response is recorded in the session
+            ai_response = ''.join(chunks)
+            message_id = record_chat(session_id, user_message, ai_response, subject, locale=locale)
+            total = time.perf_counter() - started
+            logger.info(f"Streamed chat response: ttfb={ttfb * 1000:.1f}ms total={total * 1000:.1f}ms")
+            yield sse_event('done', {
+                'timestamp': datetime.now().isoformat(),
+                'session_id': session_id,
+                'message_id': message_id,
+                'ttfb_ms': round(ttfb * 1000, 2),
+                'total_ms': round(total * 1000, 2)
+            })
+        except Exception as e:
+            logger.error(f"Error in chat stream: {str(e)}")
+            yield sse_event('error', {'error': 'Internal server error'})
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # stop reverse proxies from buffering the stream
+    })
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def record_chat(session_id, user_message, ai_response, subject, timestamp=None, locale=None):
+    """Store a completed exchange in the session and update user stats"""
+    message_id = storage.append_message(session_id, {
+        'user_message': user_message,
+        'ai_response': ai_response,
+        'timestamp': timestamp or datetime.now().isoformat(),
+        'subject': subject
+    })
+    
+    # Update user profile stats
+    update_user_stats(session_id)
+    
+    topic = astrals_hub.topic_of(user_message, subject, locale)
+    gamification.record_event(
+        session_id, 'chat',
+        subject=topic[0] if topic else subject_key(subject),
+        topic='/'.join(topic) if topic else None
+    )
+    return message_id
+
+def subject_key(subject):
+    """Knowledge base key for a display name such as 'Social Studies', or None"""
+    key = (subject or '').strip().lower().replace(' ', '_')
+    return key if key in astrals_hub.knowledge.subjects() else None
+
 @app.route('/api/subjects', methods=['GET'])
 def get_subjects():
     """Get available subjects"""
-    subjects = list(astrals_hub.knowledge_base.keys())
-    return jsonify({'subjects': subjects})
+    locale = astrals_hub.knowledge.resolve_locale(request.args.get('locale'))
+    subjects = astrals_hub.knowledge.subjects(locale)
+    return conditional_json(
+        {'subjects': subjects, 'locale': locale, 'locales': astrals_hub.knowledge.locales()},
+        etag=f"subjects-{locale}-{astrals_hub.knowledge.version(locale)}"
+    )
 
 @app.route('/api/subject/<subject_name>', methods=['GET'])
 def get_subject_topics(subject_name):
     """Get topics for a specific subject"""
-    if subject_name.lower() in astrals_hub.knowledge_base:
-        topics = astrals_hub.knowledge_base[subject_name.lower()]['topics']
-        return jsonify({'subject': subject_name, 'topics': topics})
+    locale = astrals_hub.knowledge.resolve_locale(request.args.get('locale'))
+    pack = astrals_hub.knowledge.pack(locale, subject_name.lower())
+    if pack is not None:
+        # The name is echoed as given, so it is part of the validator
+        return conditional_json(
+            {'subject': subject_name, 'title': pack['title'], 'topics': pack['topics'], 'locale': locale},
+            etag=f"subject-{hashlib.sha1(subject_name.encode('utf-8')).hexdigest()[:8]}-{locale}-{astrals_hub.knowledge.version(locale)}"
+        )
     else:
         return jsonify({'error': 'Subject not found'}), 404
 
@@ -351,80 +656,329 @@ def get_quiz_questions(subject):
     """Get quiz questions for a subject"""
     try:
         class_level = request.args.get('class', 6, type=int)
-        questions = astrals_hub.generate_quiz_questions(subject.lower(), class_level)
-        return jsonify({'questions': questions, 'subject': subject, 'class': class_level})
+        count = request.args.get('count', type=int)
+        if count is not None and count < 1:
+            return jsonify({'error': 'count must be a positive integer'}), 400
+        locale = astrals_hub.knowledge.resolve_locale(request.args.get('locale'))
+        store = astrals_hub.quiz_store_for(subject.lower(), class_level, locale)
+        questions = store.get_questions(subject.lower(), class_level, count)
+        # Question order is shuffled per request, so the validator is weak; it
+        # names the number actually served, so count=50 and count=500 can share it
+        version = store.content_version(subject.lower(), class_level)
+        return conditional_json(
+            {'questions': questions, 'subject': subject, 'class': class_level, 'locale': locale},
+            etag=f"quiz-{version}-{len(questions)}" if version else None,
+            weak=True,
+            last_modified=store.last_modified
+        )
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         return jsonify({'error': 'Failed to generate quiz'}), 500
 
+@app.route('/api/quiz-pack/<subject>', methods=['GET'])
+def get_quiz_pack(subject):
+    """Get the compact, versioned quiz pack for a subject and class"""
+    try:
+        class_level = request.args.get('class', 6, type=int)
+        locale = astrals_hub.knowledge.resolve_locale(request.args.get('locale'))
+        store = astrals_hub.quiz_store_for(subject.lower(), class_level, locale)
+        pack = store.pack(subject.lower(), class_level)
+        if not pack['questions']:
+            return jsonify({'error': 'No quiz available for this subject and class'}), 404
+        return conditional_json(
+            pack,
+            etag=f"pack-{pack['version']}",
+            last_modified=store.last_modified,
+            max_age=app.config['QUIZ_PACK_MAX_AGE']
+        )
+    except Exception as e:
+        logger.error(f"Error building quiz pack: {str(e)}")
+        return jsonify({'error': 'Failed to build quiz pack'}), 500
+
+def conditional_json(payload, etag=None, weak=False, last_modified=None, max_age=0, private=False):
+    """JSON response with validators, answered with 304 when the client's copy is current"""
+    response = jsonify(payload)
+    if etag:
+        response.set_etag(etag, weak=weak)
+    if last_modified:
+        # Store mtimes are in nanoseconds
+        response.last_modified = datetime.fromtimestamp(last_modified // 1_000_000_000, timezone.utc)
+    # Per-student data must not be stored by shared caches
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if max_age == 0:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Search topics and quiz questions, plus the student's own chats when ?session_id= is given"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Query cannot be empty'}), 400
+        limit = max(1, min(request.args.get('limit', 10, type=int), app.config['SEARCH_MAX_RESULTS']))
+        session_id = request.args.get('session_id') or None
+        results = search_service.search(query, session_id=session_id, limit=limit)
+        return jsonify({'query': query, 'results': results})
+    except Exception as e:
+        logger.error(f"Error searching: {str(e)}")
+        return jsonify({'error': 'Search failed'}), 500
+
 @app.route('/api/gamification/award-xp', methods=['POST'])
 def award_xp():
-    """Award XP to user"""
+    """Award XP to user; {"events": [{"xp": ..., "reason": ...}, ...]} awards a batch"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         session_id = data.get('session_id')
-        xp_amount = data.get('xp', 0)
-        reason = data.get('reason', '')
-        
-        if session_id not in gamification_data:
-            gamification_data[session_id] = {
-                'total_xp': 0,
-                'level': 1,
-                'badges': [],
-                'achievements': []
-            }
-        
-        gamification_data[session_id]['total_xp'] += xp_amount
-        new_level = (gamification_data[session_id]['total_xp'] // 100) + 1
+        if not session_id or not isinstance(session_id, str):
+            return jsonify({'error': 'session_id is required'}), 400
+        events = data.get('events')
+        if events is None:
+            events = [{'xp': data.get('xp', 0), 'reason': data.get('reason', '')}]
         
-        level_up = new_level > gamification_data[session_id]['level']
-        if level_up:
-            gamification_data[session_id]['level'] = new_level
+        try:
+            result = gamification.award_many(session_id, events)
+        except (TypeError, ValueError, AttributeError) as e:
+            return jsonify({'error': f'Invalid XP award: {str(e)}'}), 400
         
         return jsonify({
             'success': True,
-            'total_xp': gamification_data[session_id]['total_xp'],
-            'level': gamification_data[session_id]['level'],
-            'level_up': level_up,
-            'xp_awarded': xp_amount
+            'total_xp': result['stats']['total_xp'],
+            'level': result['level'],
+            'level_before': result['level_before'],
+            'level_up': result['level_up'],
+            'new_badges': result['new_badges'],
+            'new_achievements': result['new_achievements'],
+            'xp_awarded': result['xp_awarded']
         })
         
     except Exception as e:
         logger.error(f"Error awarding XP: {str(e)}")
         return jsonify({'error': 'Failed to award XP'}), 500
 
+# Events the client reports itself; chats and XP are recorded server-side
+CLIENT_EVENTS = {'quiz_completed'}
+
+@app.route('/api/gamification/event', methods=['POST'])
+def record_gamification_event():
+    """Record a client-side event (a finished quiz) and return any achievements it earned"""
+    try:
+        data = request.get_json() or {}
+        session_id = data.get('session_id')
+        event = data.get('type')
+        if not session_id:
+            return jsonify({'error': 'session_id is required'}), 400
+        if event not in CLIENT_EVENTS:
+            return jsonify({'error': f'Unknown event type: {event}'}), 400
+        
+        result = gamification.record_event(
+            session_id, event,
+            subject=subject_key(data.get('subject')),
+            score=int(data.get('score', 0)),
+            total=int(data.get('total', 0))
+        )
+        return jsonify({
+            'success': True,
+            'new_badges': result['new_badges'],
+            'new_achievements': result['new_achievements'],
+            'earned': [achievement_engine.rules[rule_id] for rule_id in result['new_badges'] + result['new_achievements']]
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid event: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Error recording gamification event: {str(e)}")
+        return jsonify({'error': 'Failed to record event'}), 500
+
+@app.route('/api/achievements/<session_id>', methods=['GET'])
+def get_achievements(session_id):
+    """All achievement rules with this session's earned state and progress"""
+    stats = storage.get_gamification(session_id) or {}
+    return jsonify({'achievements': achievement_engine.describe(stats)})
+
+@app.route('/api/sync', methods=['POST'])
+def sync():
+    """Apply a batch of offline client changes and return the server's delta"""
+    try:
+        data = request.get_json() or {}
+        session_id = data.get('session_id')
+        cursor = int(data.get('cursor') or 0)
+        messages = data.get('messages', [])
+        xp_events = data.get('xp_events', [])
+        
+        if not session_id or not isinstance(session_id, str):
+            return jsonify({'error': 'session_id is required'}), 400
+        if not isinstance(messages, list) or not isinstance(xp_events, list):
+            return jsonify({'error': 'messages and xp_events must be lists'}), 400
+        if len(messages) + len(xp_events) > app.config['SYNC_MAX_BATCH']:
+            return jsonify({'error': 'Sync batch too large'}), 413
+        if any(not isinstance(item, dict) or not item.get('id') for item in messages + xp_events):
+            return jsonify({'error': 'Every message and XP event needs an id'}), 400
+        # Nothing is claimed until the whole batch is known to apply, so a
+        # rejected batch can be fixed and resent without losing any of it
+        validate_sync_batch(messages, xp_events, data.get('profile'))
+        
+        # Client ids make replays of a batch (e.g. after a dropped response) no-ops
+        applied = {'messages': 0, 'xp_events': 0, 'duplicates': 0}
+        uploaded_ids = set()
+        for message in messages:
+            operation_id = f"message:{message['id']}"
+            if not storage.claim_operation(session_id, operation_id):
+                applied['duplicates'] += 1
+                continue
+            try:
+                uploaded_ids.add(record_chat(
+                    session_id,
+                    message.get('user_message', ''),
+                    message.get('ai_response', ''),
+                    message.get('subject', ''),
+                    message.get('timestamp')
+                ))
+            except Exception:
+                storage.release_operation(session_id, operation_id)
+                raise
+            applied['messages'] += 1
+        
+        claimed_events = []
+        for event in xp_events:
+            if not storage.claim_operation(session_id, f"xp:{event['id']}"):
+                applied['duplicates'] += 1
+                continue
+            claimed_events.append(event)
+        if claimed_events:
+            try:
+                gamification.award_many(session_id, claimed_events)
+            except Exception:
+                # The award is all or nothing, so a retry must be able to apply every event
+                for event in claimed_events:
+                    storage.release_operation(session_id, f"xp:{event['id']}")
+                raise
+            applied['xp_events'] = len(claimed_events)
+        
+        profile, conflict = merge_profile(session_id, data.get('profile'))
+        
+        # Everything the client has not seen, minus what it just sent us
+        newer = storage.get_messages_since(session_id, cursor)
+        new_cursor = max([cursor] + [message['id'] for message in newer])
+        
+        return jsonify({
+            'session_id': session_id,
+            'cursor': new_cursor,
+            'messages': [message for message in newer if message['id'] not in uploaded_ids],
+            'gamification': gamification.stats(session_id),
+            'profile': profile,
+            'profile_conflict': conflict,
+            'applied': applied
+        })
+        
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': f'Invalid sync payload: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Error in sync endpoint: {str(e)}")
+        return jsonify({'error': 'Failed to sync'}), 500
+
+def validate_sync_batch(messages, xp_events, profile):
+    """Raise ValueError for any item of a sync batch that could not be applied"""
+    for message in messages:
+        for field in ('user_message', 'ai_response', 'subject'):
+            if not isinstance(message.get(field, ''), str):
+                raise ValueError(f"message {message['id']}: {field} must be a string")
+        timestamp = message.get('timestamp')
+        if timestamp is not None:
+            if not isinstance(timestamp, str):
+                raise ValueError(f"message {message['id']}: timestamp must be an ISO 8601 string")
+            datetime.fromisoformat(timestamp)
+    for event in xp_events:
+        xp = event.get('xp', 0)
+        if isinstance(xp, bool) or not isinstance(xp, (int, str)):
+            raise ValueError(f"XP event {event['id']}: xp must be an integer")
+        int(xp)
+    if profile:
+        if not isinstance(profile, dict) or not isinstance(profile.get('patch') or {}, dict):
+            raise ValueError('profile must be an object with a patch object')
+        int(profile.get('base_version', 0))
+
+# Profile fields maintained by the server; clients cannot overwrite them
+SERVER_PROFILE_FIELDS = {'version', 'questions_asked', 'hours_studied', 'study_sessions'}
+
+def merge_profile(session_id, change):
+    """Apply a versioned profile patch; returns (profile, conflict)"""
+    if not change:
+        return storage.get_profile(session_id) or default_profile(), False
+    patch = {key: value for key, value in (change.get('patch') or {}).items() if key not in SERVER_PROFILE_FIELDS}
+    
+    def apply(current):
+        profile = current or default_profile()
+        version = profile.get('version', 0)
+        # A stale base version is still applied field by field (last writer wins),
+        # but reported so the client can refresh its copy
+        conflict = int(change.get('base_version', version)) != version
+        if patch:
+            profile.update(patch)
+            profile['version'] = version + 1
+        return profile, (profile, conflict)
+    
+    return storage.update_profile(session_id, apply)
+
 @app.route('/api/leaderboard/<period>', methods=['GET'])
 def get_leaderboard(period):
     """Get leaderboard data"""
     try:
-        # Generate sample leaderboard data
-        sample_data = [
-            {'name': 'Cosmic Master', 'level': 15, 'xp': 2500, 'avatar': 'crown'},
-            {'name': 'Star Explorer', 'level': 12, 'xp': 2100, 'avatar': 'medal'},
-            {'name': 'Galaxy Scholar', 'level': 10, 'xp': 1800, 'avatar': 'award'},
-            {'name': 'Space Cadet', 'level': 8, 'xp': 1500, 'avatar': 'user-astronaut'},
-            {'name': 'Astro Student', 'level': 6, 'xp': 1200, 'avatar': 'user-astronaut'}
-        ]
+        limit = min(request.args.get('limit', 10, type=int), 100)
+        session_id = request.args.get('session_id')
+        window = min(request.args.get('window', 2, type=int), 25)
+        
+        def snapshot(board):
+            result = {'top': board.top(limit), 'total': len(board)}
+            if session_id:
+                result['rank'] = board.rank(session_id)
+                result['xp'] = board.score(session_id)
+                result['around'] = board.around(session_id, window)
+            return result
         
-        return jsonify({'leaderboard': sample_data, 'period': period})
+        try:
+            ranking = leaderboard.query(period, snapshot)
+        except KeyError:
+            return jsonify({'error': 'Unknown leaderboard period'}), 404
+        
+        response = {
+            'leaderboard': [leaderboard_entry(*entry, viewer=session_id) for entry in ranking['top']],
+            'period': period,
+            'total': ranking['total']
+        }
+        if session_id:
+            response['me'] = {'rank': ranking['rank'], 'xp': ranking['xp']}
+            response['around_me'] = [leaderboard_entry(*entry, viewer=session_id) for entry in ranking['around']]
+        
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error getting leaderboard: {str(e)}")
         return jsonify({'error': 'Failed to get leaderboard'}), 500
 
+def leaderboard_entry(rank, session_id, xp, viewer=None):
+    """Render a leaderboard row with the player's profile details"""
+    # Session ids double as credentials, so they are never sent to other players
+    profile = storage.get_profile(session_id) or {}
+    stats = storage.get_gamification(session_id) or {}
+    avatars = {1: 'crown', 2: 'medal', 3: 'award'}
+    return {
+        'rank': rank,
+        'is_me': session_id == viewer,
+        'name': profile.get('name', 'Student'),
+        'level': stats.get('level', 1),
+        'xp': xp,
+        'avatar': avatars.get(rank, 'user-astronaut')
+    }
+
 @app.route('/api/profile/<session_id>', methods=['GET'])
 def get_user_profile(session_id):
     """Get user profile"""
-    profile = user_profiles.get(session_id, {
-        'name': 'Student',
-        'level': 'intermediate',
-        'favorite_subjects': [],
-        'study_sessions': 0,
-        'questions_asked': 0,
-        'topics_explored': 0,
-        'hours_studied': 0.0,
-        'understanding_rate': 85
-    })
+    profile = storage.get_profile(session_id) or default_profile()
     return jsonify(profile)
 
 @app.route('/api/profile/<session_id>', methods=['POST'])
@@ -432,47 +986,116 @@ def update_user_profile(session_id):
     """Update user profile"""
     try:
         data = request.get_json()
-        if session_id not in user_profiles:
-            user_profiles[session_id] = {}
         
-        user_profiles[session_id].update(data)
+        def apply(current):
+            profile = current or {}
+            profile.update({key: value for key, value in data.items() if key != 'version'})
+            profile['version'] = profile.get('version', 0) + 1
+            return profile, None
+        
+        storage.update_profile(session_id, apply)
         return jsonify({'message': 'Profile updated successfully'})
         
     except Exception as e:
         logger.error(f"Error updating profile: {str(e)}")
         return jsonify({'error': 'Failed to update profile'}), 500
 
+# Page sizes for /api/chat/history
+app.config['HISTORY_PAGE_SIZE'] = int(os.environ.get('ASTRALS_HISTORY_PAGE_SIZE', 50))
+app.config['HISTORY_MAX_PAGE_SIZE'] = int(os.environ.get('ASTRALS_HISTORY_MAX_PAGE_SIZE', 500))
+
+# Column order of compact history rows; the subject column is left off
+# rows whose subject is the page's default
+HISTORY_FIELDS = ('id', 'timestamp', 'user_message', 'ai_response', 'subject')
+
 @app.route('/api/chat/history/<session_id>', methods=['GET'])
 def get_chat_history(session_id):
-    """Get chat history for a session"""
-    history = chat_sessions.get(session_id, [])
-    return jsonify({'history': history})
+    """Get chat history for a session, whole or one page at a time.
+
+    ?since=<id> pages forward from a message id (what a reconnecting client
+    is missing), ?before=<id> pages back from one, ?limit= sizes the page
+    (alone it returns the newest messages) and ?compact=1 sends rows in
+    HISTORY_FIELDS order instead of objects.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        before = request.args.get('before', type=int)
+        limit = request.args.get('limit', type=int)
+        compact = request.args.get('compact') == '1'
+        if since is not None and before is not None:
+            return jsonify({'error': 'Use either since or before, not both'}), 400
+        
+        has_more = False
+        if since is None and before is None and limit is None:
+            history = storage.get_history(session_id)
+        else:
+            limit = max(1, min(limit or app.config['HISTORY_PAGE_SIZE'], app.config['HISTORY_MAX_PAGE_SIZE']))
+            # One extra message tells us whether another page follows
+            if since is not None:
+                history = storage.get_messages_since(session_id, since, limit + 1)
+                has_more = len(history) > limit
+                history = history[:limit]
+            else:
+                history = storage.get_messages_before(session_id, before, limit + 1)
+                has_more = len(history) > limit
+                history = history[-limit:]
+        
+        payload = {
+            'session_id': session_id,
+            'has_more': has_more,
+            # Pass as ?since= to get newer messages, or oldest_id as ?before= for older ones
+            'cursor': history[-1]['id'] if history else (since or 0),
+            'oldest_id': history[0]['id'] if history else None
+        }
+        if compact:
+            payload.update(compact_history(history))
+        else:
+            payload['history'] = history
+        
+        # Stored messages never change, so the ids bounding a page identify it
+        etag = '-'.join(str(part) for part in (
+            payload['oldest_id'], payload['cursor'], len(history), int(has_more), int(compact)
+        ))
+        return conditional_json(payload, etag=f'history-{etag}', private=True)
+        
+    except Exception as e:
+        logger.error(f"Error getting chat history: {str(e)}")
+        return jsonify({'error': 'Failed to get chat history'}), 500
+
+def compact_history(history):
+    """Rows in HISTORY_FIELDS order, with the most common subject sent once"""
+    subjects = {}
+    for message in history:
+        subjects[message.get('subject')] = subjects.get(message.get('subject'), 0) + 1
+    subject = max(subjects, key=subjects.get) if subjects else ''
+    rows = []
+    for message in history:
+        row = [message.get(field) for field in HISTORY_FIELDS]
+        if row[-1] == subject:
+            row.pop()
+        rows.append(row)
+    return {'fields': list(HISTORY_FIELDS), 'subject': subject, 'history': rows}
 
 @app.route('/api/chat/clear/<session_id>', methods=['POST'])
 def clear_chat_history(session_id):
     """Clear chat history for a session"""
-    if session_id in chat_sessions:
-        chat_sessions[session_id] = []
+    storage.clear_history(session_id)
+    search_service.forget(session_id)
     return jsonify({'message': 'Chat history cleared'})
 
 @app.route('/api/chat/save/<session_id>', methods=['POST'])
 def save_chat_history(session_id):
-    """Save chat history to file"""
+    """Queue chat history to be saved to file"""
     try:
-        if session_id in chat_sessions:
-            # Create data directory if it doesn't exist
-            os.makedirs('data', exist_ok=True)
-            
-            # Save to file
-            filename = f'data/chat_{session_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-            with open(filename, 'w') as f:
-                json.dump({
-                    'session_id': session_id,
-                    'history': chat_sessions[session_id],
-                    'timestamp': datetime.now().isoformat()
-                }, f, indent=2)
-            
-            return jsonify({'message': 'Chat history saved successfully', 'filename': filename})
+        history = storage.get_history(session_id)
+        if history:
+            # Written in the background; poll the ticket for completion
+            ticket_id = history_writer.submit(session_id, history)
+            return jsonify({
+                'message': 'Chat history save queued',
+                'ticket': ticket_id,
+                'filename': os.path.relpath(history_writer.path_for(session_id), BASE_DIR)
+            }), 202
         else:
             return jsonify({'error': 'No chat history found'}), 404
             
@@ -480,38 +1103,186 @@ def save_chat_history(session_id):
         logger.error(f"Error saving chat history: {str(e)}")
         return jsonify({'error': 'Failed to save chat history'}), 500
 
+@app.route('/api/chat/save/status/<ticket_id>', methods=['GET'])
+def get_save_status(ticket_id):
+    """Get the status of a queued chat history save"""
+    ticket = history_writer.status(ticket_id)
+    if not ticket:
+        return jsonify({'error': 'Save ticket not found'}), 404
+    ticket['filename'] = os.path.relpath(ticket['filename'], BASE_DIR)
+    return jsonify(ticket)
+
+def default_profile():
+    """Profile returned for sessions that have not stored one yet"""
+    return {
+        'name': 'Student',
+        'level': 'intermediate',
+        'favorite_subjects': [],
+        'study_sessions': 0,
+        'questions_asked': 0,
+        'topics_explored': 0,
+        'hours_studied': 0.0,
+        'understanding_rate': 85
+    }
+
 def update_user_stats(session_id):
     """Update user statistics"""
-    if session_id not in user_profiles:
-        user_profiles[session_id] = {
-            'name': 'Student',
-            'level': 'intermediate',
-            'favorite_subjects': [],
-            'study_sessions': 0,
-            'questions_asked': 0,
-            'topics_explored': 0,
-            'hours_studied': 0.0,
-            'understanding_rate': 85
-        }
+    # Read outside the update so it does not hold a second storage connection
+    new_session = storage.count_messages(session_id) <= 1
     
-    # Increment questions asked
-    user_profiles[session_id]['questions_asked'] += 1
-    
-    # Simulate time spent (0.1 hours per question)
-    user_profiles[session_id]['hours_studied'] += 0.1
+    def apply(current):
+        profile = current or default_profile()
+        
+        # Increment questions asked
+        profile['questions_asked'] = profile.get('questions_asked', 0) + 1
+        
+        # Simulate time spent (0.1 hours per question)
+        profile['hours_studied'] = profile.get('hours_studied', 0.0) + 0.1
+        
+        # Increment study sessions if this is a new session
+        if new_session:
+            profile['study_sessions'] = profile.get('study_sessions', 0) + 1
+        return profile, None
     
-    # Increment study sessions if this is a new session
-    if session_id not in chat_sessions or len(chat_sessions[session_id]) == 1:
-        user_profiles[session_id]['study_sessions'] += 1
+    storage.update_profile(session_id, apply)
+
+# Readiness, reported by /api/health so load balancers only route to live workers
+service_state = {'ready': False, 'shutting_down': False}
+
+class CountedBody:
+    """Response body that reports its request finished once, on exhaustion or close"""
+
+    def __init__(self, body, finished):
+        self._body = body
+        self._iterator = iter(body)
+        self._finished = finished
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            # Clients that never close the body (the test client) still release it here
+            self._finish()
+            raise
+
+    def close(self):
+        try:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._finish()
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._finished()
+
+class InFlightRequests:
+    """WSGI middleware counting requests until their response body has been sent"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.count = 0
+        self._idle = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._idle:
+            self.count += 1
+        try:
+            response = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self._finished()
+            raise
+        # Streams count until they are sent in full or closed, not when the view returns
+        return CountedBody(response, self._finished)
+
+    def _finished(self):
+        with self._idle:
+            self.count -= 1
+            if not self.count:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Block until no request is running; False if some still are after timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.count, timeout)
+
+in_flight = InFlightRequests(app.wsgi_app)
+app.wsgi_app = in_flight
+
+def mark_ready():
+    """Signal that startup has finished and requests can be served"""
+    service_state['ready'] = True
+
+def shutdown_app(timeout=None):
+    """Stop accepting traffic, let running requests finish and flush in-memory state to disk"""
+    if service_state['shutting_down']:
+        return
+    service_state['shutting_down'] = True
+    service_state['ready'] = False
+    timeout = app.config['GRACEFUL_TIMEOUT'] if timeout is None else timeout
+    if not in_flight.wait_idle(timeout):
+        logger.warning(f"Shutting down with {in_flight.count} requests still running after {timeout}s")
+    logger.info("Shutting down: flushing chat saves and storage")
+    history_writer.close()
+    astrals_hub.backend.close()
+    # The reloader parent never serves, so its empty state must not overwrite the snapshot
+    reloader_parent = app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    if isinstance(storage, MemoryStorage) and not reloader_parent:
+        save_memory_state()
+    storage.close()
+
+def save_memory_state():
+    """Spill chats and snapshot the memory backend, or say what is being discarded"""
+    # Spilled sessions leave memory, so the snapshot only holds chats that were not spilled
+    chat_sessions.spill_all()
+    if app.config['MEMORY_SNAPSHOT'] and app.config['WORKERS'] > 1:
+        # Every worker would overwrite the snapshot with its own share of the state
+        logger.warning(f"Not saving memory snapshot {app.config['MEMORY_SNAPSHOT']}: "
+                       f"{app.config['WORKERS']} workers each hold part of the state; use ASTRALS_STORAGE=sqlite")
+        return
+    if app.config['MEMORY_SNAPSHOT']:
+        try:
+            counts = save_snapshot(storage, app.config['MEMORY_SNAPSHOT'])
+            logger.info(f"Saved memory snapshot to {app.config['MEMORY_SNAPSHOT']}: {counts}")
+            return
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Error saving memory snapshot {app.config['MEMORY_SNAPSHOT']}: {str(e)}")
+    discarded = [
+        f"{len(storage.user_profiles)} profiles",
+        f"{len(storage.gamification_data)} XP records and the leaderboards"
+    ]
+    if not app.config['CHAT_SPILL_DIR']:
+        discarded.append(f"{chat_sessions.stats()['messages']} chat messages")
+    logger.warning(f"Discarding in-memory state ({', '.join(discarded)}); "
+                   "set ASTRALS_MEMORY_SNAPSHOT or use ASTRALS_STORAGE=sqlite to keep it")
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
+    if service_state['shutting_down']:
+        status = 'shutting_down'
+    elif service_state['ready']:
+        status = 'healthy'
+    else:
+        status = 'starting'
+    health = {
+        'status': status,
+        'ready': service_state['ready'],
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0'
-    })
+    }
+    health['response_cache'] = astrals_hub.response_cache.stats()
+    health['generation'] = astrals_hub.backend.stats()
+    if admission_control is not None:
+        health['admission'] = admission_control.stats()
+    if isinstance(storage, MemoryStorage):
+        health['chat_sessions'] = chat_sessions.stats()
+    return jsonify(health), 200 if service_state['ready'] else 503
 
 @app.errorhandler(404)
 def not_found(error):
@@ -521,9 +1292,16 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# Servers call shutdown_app once they stop taking requests; at interpreter exit
+# (scripts, the development server) there is nothing left worth waiting for
+atexit.register(shutdown_app, 0)
+# Everything is loaded at import time, so the app is ready once this module is
+mark_ready()
+
 if __name__ == '__main__':
     # Create data directory
     os.makedirs('data', exist_ok=True)
     
-    # Run the application
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; use `python run.py --serve` in production
+    app.run(debug=app.config['DEBUG'], host=os.environ.get('ASTRALS_HOST', '0.0.0.0'),
+            port=int(os.environ.get('ASTRALS_PORT', 5000)))
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Astrals Hub - Data Archive Tool
+Compacts saved chats in data/ into one deduplicated, compressed JSON Lines
+archive, stream-exports sessions and profiles for analytics, and imports
+archives back into a storage backend.
+
+    python archive.py compact [--delete]          data/chat_* -> data/archive/chats_<stamp>.jsonl.gz
+    python archive.py export [-o FILE] [--db DB]  Every message, profile and XP record as JSON Lines
+    python archive.py import ARCHIVE --db DB      Load an archive into a SQLite database
+
+The app imports archives at startup when ASTRALS_IMPORT_ARCHIVES lists them.
+Archives ending in .zst need the optional zstandard package; .gz uses gzip.
+
+Each line is one record:
+    {"type": "message", "session_id": ..., "timestamp": ..., "subject": ..., "user_message": ..., "ai_response": ...}
+    {"type": "profile", "session_id": ..., "data": {...}}
+    {"type": "gamification", "session_id": ..., "data": {...}}
+    {"type": "score", "board": ..., "session_id": ..., "score": ...}
+"""
+
+import argparse
+import contextlib
+import glob
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from history_writer import safe_session_name
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# data/chat_<session>_<YYYYmmdd_HHMMSS>.json: full snapshots from older releases
+SNAPSHOT_NAME = re.compile(r'^chat_(?P<session>.+)_(?P<stamp>\d{8}_\d{6})\.json$')
+# data/chat_<safe session>.jsonl[.gz]: append-only files from the history writer
+JOURNAL_NAME = re.compile(r'^chat_(?P<session>[A-Za-z0-9_-]+)\.jsonl(\.gz)?$')
+
+MESSAGE_FIELDS = ('timestamp', 'subject', 'user_message', 'ai_response')
+
+
+def message_key(message):
+    """Digest identifying a message across snapshots, journals and archives"""
+    identity = json.dumps([message.get('timestamp'), message.get('user_message'), message.get('ai_response')])
+    return hashlib.sha1(identity.encode('utf-8')).digest()
+
+
+def message_record(session_id, message):
+    return dict({'type': 'message', 'session_id': session_id}, **{field: message.get(field) for field in MESSAGE_FIELDS})
+
+
+def open_archive(path, mode):
+    """Text stream over an archive, compressed according to its extension ('-' is stdio)"""
+    if path == '-':
+        # Leave the process's own streams open
+        return contextlib.nullcontext(sys.stdout if mode == 'w' else sys.stdin)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError('Reading or writing .zst archives needs the zstandard package')
+        raw = open(path, mode + 'b')
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def read_archive(path):
+    """Yield the records of an archive one line at a time"""
+    with open_archive(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chat_files(data_dir):
+    """Saved chat files grouped by session: {group: [paths, oldest first]}"""
+    groups = {}
+    for name in sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []:
+        snapshot = SNAPSHOT_NAME.match(name)
+        if snapshot:
+            groups.setdefault(safe_session_name(snapshot.group('session')), []).append((0, snapshot.group('stamp'), name))
+            continue
+        journal = JOURNAL_NAME.match(name)
+        if journal:
+            # The journal holds everything saved since snapshots were retired
+            groups.setdefault(journal.group('session'), []).append((1, '', name))
+    return {group: [os.path.join(data_dir, name) for _, _, name in sorted(files)] for group, files in groups.items()}
+
+
+def _read_chat_file(path):
+    """Yield (session_id, message) from a snapshot or journal file"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        for message in snapshot.get('history', []):
+            yield snapshot['session_id'], message
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                message = json.loads(line)
+                yield message.pop('session_id'), message
+
+
+def iter_chat_files(data_dir):
+    """Yield (records, paths) per session: deduplicated message records and the files they came from"""
+    for paths in chat_files(data_dir).values():
+        def records(paths=paths):
+            # Only one session's keys are held at a time
+            seen = set()
+            for path in paths:
+                try:
+                    for session_id, message in _read_chat_file(path):
+                        key = message_key(message)
+                        if key not in seen:
+                            seen.add(key)
+                            yield message_record(session_id, message)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Skipping unreadable chat file {path}: {str(e)}")
+        yield records(), paths
+
+
+def compact(data_dir, output, delete=False):
+    """Write every saved chat to one archive; returns (messages, files)"""
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    messages = 0
+    compacted = []
+    # Same extension, so the partial file is compressed the same way
+    partial = os.path.join(os.path.dirname(output), '.partial-' + os.path.basename(output))
+    with open_archive(partial, 'w') as f:
+        for records, paths in iter_chat_files(data_dir):
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                messages += 1
+            compacted.extend(paths)
+    # Sources are only removed once the archive is complete on disk
+    os.replace(partial, output)
+    if delete:
+        for path in compacted:
+            os.remove(path)
+    return messages, len(compacted)
+
+
+def export_storage(storage, f):
+    """Stream every message, profile, gamification record and leaderboard score of a storage backend"""
+    counts = {'message': 0, 'profile': 0, 'gamification': 0, 'score': 0}
+    for session_id, message in storage.iter_messages():
+        f.write(json.dumps(message_record(session_id, message), ensure_ascii=False) + '\n')
+        counts['message'] += 1
+    for kind, rows in (('profile', storage.iter_profiles()), ('gamification', storage.iter_gamification())):
+        for session_id, data in rows:
+            f.write(json.dumps({'type': kind, 'session_id': session_id, 'data': data}, ensure_ascii=False) + '\n')
+            counts[kind] += 1
+    for board, session_id, score in storage.iter_scores():
+        f.write(json.dumps({'type': 'score', 'board': board, 'session_id': session_id, 'score': score}, ensure_ascii=False) + '\n')
+        counts['score'] += 1
+    return counts
+
+
+def save_snapshot(storage, path):
+    """Export storage to an archive at path, replacing it only once the new one is complete"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = os.path.join(os.path.dirname(path), '.partial-' + os.path.basename(path))
+    with open_archive(partial, 'w') as f:
+        counts = export_storage(storage, f)
+    os.replace(partial, path)
+    return counts
+
+
+def import_archive(path, storage):
+    """Load an archive into storage; safe to repeat.
+
+    Messages already imported are skipped via storage operation ids, and
+    profiles, XP and leaderboard scores are only filled in where none exist, so
+    live data always wins over the archive.
+    """
+    counts = {'message': 0, 'profile': 0, 'gamification': 0, 'score': 0, 'skipped': 0, 'invalid': 0}
+    for record in read_archive(path):
+        try:
+            outcome = _import_record(record, storage)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping invalid record in {path}: {str(e)}")
+            outcome = 'invalid'
+        counts[outcome] += 1
+    return counts
+
+
+def _import_record(record, storage):
+    kind = record.get('type')
+    session_id = record['session_id']
+    if kind == 'message':
+        if not storage.claim_operation(session_id, 'import:' + message_key(record).hex()):
+            return 'skipped'
+        storage.append_message(session_id, {field: record.get(field) for field in MESSAGE_FIELDS})
+    elif kind == 'profile':
+        if storage.get_profile(session_id) is not None:
+            return 'skipped'
+        storage.save_profile(session_id, record['data'])
+    elif kind == 'gamification':
+        if storage.get_gamification(session_id) is not None:
+            return 'skipped'
+        storage.save_gamification(session_id, record['data'])
+    elif kind == 'score':
+        if storage.score_position(record['board'], session_id) is not None:
+            return 'skipped'
+        storage.set_scores(record['board'], [(session_id, int(record['score']))], replace=False)
+    else:
+        return 'invalid'
+    return kind
+
+
+def import_archives(patterns, storage):
+    """Import every archive matching the comma-separated glob patterns"""
+    for pattern in filter(None, (item.strip() for item in patterns.split(','))):
+        for path in sorted(glob.glob(pattern)):
+            try:
+                counts = import_archive(path, storage)
+                logger.info(f"Imported {path}: {counts}")
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.error(f"Error importing archive {path}: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact, export and import Astrals Hub data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compact_parser = subparsers.add_parser('compact', help='merge saved chats in data/ into one archive')
+    compact_parser.add_argument('--data-dir', default=DATA_DIR)
+    compact_parser.add_argument('--output', help='archive path (.jsonl, .jsonl.gz or .jsonl.zst)')
+    compact_parser.add_argument('--delete', action='store_true', help='remove the compacted files afterwards')
+
+    export_parser = subparsers.add_parser('export', help='stream all sessions and profiles as JSON Lines')
+    export_parser.add_argument('-o', '--output', default='-', help="output path, '-' for stdout (default)")
+    export_parser.add_argument('--db', help='SQLite database to export (default: saved chats in data/)')
+    export_parser.add_argument('--data-dir', default=DATA_DIR)
+
+    import_parser = subparsers.add_parser('import', help='load an archive into a SQLite database')
+    import_parser.add_argument('archive')
+    import_parser.add_argument('--db', required=True)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if args.command == 'compact':
+        extension = '.jsonl.zst' if zstandard else '.jsonl.gz'
+        output = args.output or os.path.join(args.data_dir, 'archive', f"chats_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+        messages, files = compact(args.data_dir, output, delete=args.delete)
+        print(f"📦 Compacted {files} files into {output} ({messages} messages)", file=sys.stderr)
+
+    elif args.command == 'export':
+        with open_archive(args.output, 'w') as f:
+            if args.db:
+                from storage import SQLiteStorage
+                storage = SQLiteStorage(args.db)
+                try:
+                    counts = export_storage(storage, f)
+                finally:
+                    storage.close()
+            else:
+                counts = {'message': 0}
+                for records, _ in iter_chat_files(args.data_dir):
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                        counts['message'] += 1
+            f.flush()
+        print(f"📤 Exported {counts}", file=sys.stderr)
+
+    elif args.command == 'import':
+        from storage import SQLiteStorage
+        storage = SQLiteStorage(args.db)
+        try:
+            counts = import_archive(args.archive, storage)
+        finally:
+            storage.close()
+        print(f"📥 Imported {counts}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
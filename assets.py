@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Astrals Hub - Static Asset Pipeline
+Build step that minifies, content-hashes and precompresses static assets
+into static/dist, plus the Flask integration that serves them with
+long-lived immutable caching and Content-Encoding negotiation. The
+manifest records a hash of each source, so an asset edited since the
+last build is served from /static until it is rebuilt.
+
+    python assets.py build              Build static/dist from static/
+    python assets.py build --vendor     Also download fonts and icons for offline use
+
+Optional packages improve the output when installed: rjsmin and rcssmin
+(minification) and brotli (.br files next to the .gz ones).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import sys
+import tempfile
+import urllib.request
+from urllib.parse import urljoin, urlparse
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+VENDOR_DIR = os.path.join(STATIC_DIR, 'vendor')
+MANIFEST_NAME = 'manifest.json'
+
+# Entry points, relative to static/; vendored files are added when present
+SOURCES = ['styles.css', 'script.js']
+
+# Third-party stylesheets that --vendor downloads, with the fonts they use
+VENDOR_STYLESHEETS = {
+    'fontawesome.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+    'fonts.css': 'https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700;900&family=Inter:wght@300;400;500;600;700&display=swap',
+}
+# Google Fonts only serves woff2 to browsers it recognises
+VENDOR_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.html', '.txt')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(text):
+    if rcssmin:
+        return rcssmin.cssmin(text)
+    # Conservative fallback: comments and whitespace only
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Without rjsmin the script is shipped as-is; compression still applies
+    return rjsmin.jsmin(text) if rjsmin else text
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(path, digest):
+    root, extension = os.path.splitext(path)
+    return f'{root}.{digest}{extension}'
+
+
+def _fetch(url):
+    request = urllib.request.Request(url, headers={'User-Agent': VENDOR_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def vendor_assets(vendor_dir=VENDOR_DIR):
+    """Download the CDN stylesheets and every font they reference"""
+    fonts_dir = os.path.join(vendor_dir, 'fonts')
+    os.makedirs(fonts_dir, exist_ok=True)
+
+    for name, url in VENDOR_STYLESHEETS.items():
+        css = _fetch(url).decode('utf-8')
+
+        def localize(match):
+            remote = urljoin(url, match.group(2))
+            if remote.startswith('data:'):
+                return match.group(0)
+            filename = os.path.basename(urlparse(remote).path)
+            target = os.path.join(fonts_dir, filename)
+            if not os.path.exists(target):
+                with open(target, 'wb') as f:
+                    f.write(_fetch(remote))
+            return f'url(fonts/{filename})'
+
+        with open(os.path.join(vendor_dir, name), 'w', encoding='utf-8') as f:
+            f.write(CSS_URL.sub(localize, css))
+        print(f"📦 Vendored {name}")
+
+
+def _write_compressed(path, data):
+    if not path.endswith(COMPRESSIBLE):
+        return
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the output byte-identical between builds
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    if brotli:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Build into a staging directory and swap it in for dist_dir; returns {source: hashed name}"""
+    parent = os.path.dirname(dist_dir)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.dist-', dir=parent)
+    try:
+        assets = _build_into(static_dir, staging)
+        # Pages rendered from the previous manifest keep loading until the app reloads it
+        _carry_over(dist_dir, staging)
+        _swap(staging, dist_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return assets
+
+
+def _build_into(static_dir, dist_dir):
+    sources = list(SOURCES)
+    vendor_dir = os.path.join(static_dir, 'vendor')
+    if os.path.isdir(vendor_dir):
+        for root, _, files in os.walk(vendor_dir):
+            for filename in sorted(files):
+                sources.append(os.path.relpath(os.path.join(root, filename), static_dir).replace(os.sep, '/'))
+
+    # Binary files first so stylesheets can point at their hashed names
+    sources.sort(key=lambda path: path.endswith(('.css', '.js')))
+
+    manifest = {}
+    source_hashes = {}
+    for source in sources:
+        with open(os.path.join(static_dir, source), 'rb') as f:
+            data = f.read()
+        source_hashes[source] = content_hash(data)
+
+        if source.endswith('.css'):
+            text = minify_css(data.decode('utf-8'))
+            source_dir = os.path.dirname(source)
+
+            def rewrite(match):
+                target = os.path.normpath(os.path.join(source_dir, match.group(2))).replace(os.sep, '/')
+                if target not in manifest:
+                    return match.group(0)
+                return f'url({os.path.relpath(manifest[target], source_dir or ".").replace(os.sep, "/")})'
+
+            data = CSS_URL.sub(rewrite, text).encode('utf-8')
+        elif source.endswith('.js'):
+            data = minify_js(data.decode('utf-8')).encode('utf-8')
+
+        output = hashed_name(source, content_hash(data))
+        path = os.path.join(dist_dir, output)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        _write_compressed(path, data)
+        manifest[source] = output
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump({'assets': manifest, 'sources': source_hashes}, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _read_manifest(dist_dir):
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME), 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None, {}
+    return raw, json.loads(raw)
+
+
+def _carry_over(old_dir, new_dir):
+    """Copy the previous build's files (only those) into the new one"""
+    _, previous = _read_manifest(old_dir)
+    for output in previous.get('assets', {}).values():
+        for name in (output, output + '.gz', output + '.br'):
+            source, target = os.path.join(old_dir, name), os.path.join(new_dir, name)
+            if os.path.isfile(source) and not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+
+
+def _swap(staging, dist_dir):
+    # Two renames leave dist_dir missing for an instant instead of half-written during the build
+    retired = None
+    if os.path.isdir(dist_dir):
+        retired = staging + '-old'
+        os.rename(dist_dir, retired)
+    os.rename(staging, dist_dir)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+class AssetPipeline:
+    """Flask integration: asset_url() in templates and an /assets/ route"""
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+    MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self, app=None, dist_dir=DIST_DIR, static_dir=STATIC_DIR):
+        self.dist_dir = dist_dir
+        self.static_dir = static_dir
+        self.manifest = {}
+        self.version = 'dev'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.load_manifest()
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.jinja_env.globals['has_asset'] = self.has_asset
+        app.extensions['asset_pipeline'] = self
+
+    def load_manifest(self):
+        """Load the built assets, leaving out those whose source changed since the build"""
+        raw, built = _read_manifest(self.dist_dir)
+        sources = built.get('sources', {})
+        self.manifest = {
+            source: output for source, output in built.get('assets', {}).items()
+            if sources.get(source) == self._source_hash(source)
+        }
+        stale = sorted(set(built.get('assets', {})) - set(self.manifest))
+        if stale:
+            logger.warning(f"Serving {', '.join(stale)} from /static: changed since the last build (python assets.py build)")
+        self.version = content_hash(json.dumps(self.manifest, sort_keys=True).encode()) if self.manifest else 'dev'
+
+    def _source_hash(self, path):
+        try:
+            with open(os.path.join(self.static_dir, path), 'rb') as f:
+                return content_hash(f.read())
+        except OSError:
+            return None
+
+    def has_asset(self, path):
+        return path in self.manifest or os.path.exists(os.path.join(self.static_dir, path))
+
+    def asset_url(self, path):
+        """Hashed /assets/ URL when built and current, plain /static/ URL otherwise"""
+        from flask import current_app, url_for
+        # In debug, edits must show up without a rebuild
+        if path in self.manifest and not current_app.debug:
+            return url_for('assets', filename=self.manifest[path])
+        return url_for('static', filename=path)
+
+    def serve(self, filename):
+        from flask import abort, request, send_from_directory
+
+        if filename.endswith(('.gz', '.br')) or not os.path.isfile(os.path.join(self.dist_dir, filename)):
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        served, encoding = filename, None
+        for candidate, suffix in self.ENCODINGS:
+            if request.accept_encodings[candidate] and os.path.isfile(os.path.join(self.dist_dir, filename + suffix)):
+                served, encoding = filename + suffix, candidate
+                break
+
+        response = send_from_directory(self.dist_dir, served, mimetype=mimetype, max_age=self.MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build Astrals Hub static assets')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='minify, hash and compress static assets')
+    build.add_argument('--vendor', action='store_true', help='download CDN fonts and icons first')
+    args = parser.parse_args()
+
+    if args.vendor:
+        try:
+            vendor_assets()
+        except OSError as e:
+            print(f"❌ Could not vendor fonts and icons: {e}")
+            sys.exit(1)
+
+    manifest = build_assets()
+    print(f"✅ Built {len(manifest)} assets into {os.path.relpath(DIST_DIR, BASE_DIR)}")
+    for source, output in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(DIST_DIR, output))
+        gz = os.path.join(DIST_DIR, output + '.gz')
+        compressed = f", {os.path.getsize(gz)} B gzip" if os.path.exists(gz) else ''
+        print(f"   {source} -> {output} ({size} B{compressed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Astrals Hub - API Benchmark
+Drives the Flask API with a realistic mix of student traffic, either
+in-process through app.test_client() or over a real socket, and records
+latency percentiles, throughput and memory growth as JSON. Percentiles
+cover served requests; 429/503 answers from admission control are counted
+separately as rejections.
+
+Examples:
+    python benchmark.py --requests 20000
+    python benchmark.py --url http://localhost:5000 --concurrency 8
+    python benchmark.py --compare data/benchmarks/previous.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+SUBJECTS = ['mathematics', 'science', 'english', 'social_studies']
+MESSAGES = [
+    'hello', 'help', 'explain fractions', 'what is geometry', 'show me an example of algebra',
+    'tell me about the weather and farming', 'why is soil water important', 'practice problems please',
+    'how does renewable energy work', 'what is indian history', 'grammar examples', 'economics in villages'
+]
+
+# Admission control's answers: rate limited, or the server is saturated
+REJECTED_STATUSES = (429, 503)
+
+# Share of traffic per endpoint, roughly what the web client generates
+ENDPOINT_MIX = [
+    ('chat', 0.50),
+    ('quiz', 0.15),
+    ('award_xp', 0.15),
+    ('profile', 0.10),
+    ('history', 0.10),
+]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def read_rss_kb(pid=None):
+    """Current resident set size in KB (peak RSS where /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if pid is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class SessionPicker:
+    """Zipf-distributed sessions: a few very active students, a long tail of light ones"""
+
+    def __init__(self, sessions, exponent, rng):
+        self.ids = [f'bench_{i}' for i in range(sessions)]
+        self.weights = [1.0 / (rank + 1) ** exponent for rank in range(sessions)]
+        self.rng = rng
+
+    def pick(self):
+        return self.rng.choices(self.ids, self.weights)[0]
+
+
+def build_request(endpoint, session_id, rng):
+    """(method, path, json body) for one request of the given endpoint"""
+    if endpoint == 'chat':
+        return 'POST', '/api/chat', {
+            'message': rng.choice(MESSAGES),
+            'session_id': session_id,
+            'subject': rng.choice(SUBJECTS + ['']),
+        }
+    if endpoint == 'quiz':
+        return 'GET', f'/api/quiz/{rng.choice(SUBJECTS)}?class={rng.randint(6, 8)}', None
+    if endpoint == 'award_xp':
+        return 'POST', '/api/gamification/award-xp', {
+            'session_id': session_id,
+            'xp': rng.choice([10, 12, 15, 20]),
+            'reason': 'quiz',
+        }
+    if endpoint == 'profile':
+        return 'GET', f'/api/profile/{session_id}', None
+    return 'GET', f'/api/chat/history/{session_id}', None
+
+
+def client_address(session_id):
+    """A stable address per simulated student, so per-IP limits see many clients"""
+    number = int(session_id.rsplit('_', 1)[-1])
+    return f'10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}'
+
+
+class InProcessClient:
+    def __init__(self):
+        from app import app
+        self.client = app.test_client()
+
+    def request(self, method, path, body, session_id):
+        response = self.client.open(path, method=method, json=body,
+                                    environ_base={'REMOTE_ADDR': client_address(session_id)})
+        response.get_data()
+        # Closing the body is what tells the app the request has finished
+        response.close()
+        return response.status_code
+
+
+class SocketClient:
+    """Keep-alive HTTP client; one connection per worker thread"""
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body, session_id):
+        # Requests come from this machine's address; the server sees one client
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+def run_benchmark(args):
+    client = SocketClient(args.url) if args.url else InProcessClient()
+    rss_pid = args.server_pid if args.url else None
+    endpoints = [name for name, _ in ENDPOINT_MIX]
+    weights = [weight for _, weight in ENDPOINT_MIX]
+
+    # Latencies of served (2xx/3xx) requests only; turning a request away is fast
+    # and would drag the percentiles down as the server saturates
+    latencies = {name: [] for name in endpoints}
+    statuses = {name: {} for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+    rejected = {name: 0 for name in endpoints}
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        sessions = SessionPicker(args.sessions, args.zipf, rng)
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            endpoint = rng.choices(endpoints, weights)[0]
+            session_id = sessions.pick()
+            method, path, body = build_request(endpoint, session_id, rng)
+            started = time.perf_counter()
+            try:
+                status = client.request(method, path, body, session_id)
+            except Exception:
+                status = None
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if status is not None:
+                    statuses[endpoint][status] = statuses[endpoint].get(status, 0) + 1
+                if status in REJECTED_STATUSES:
+                    rejected[endpoint] += 1
+                elif status is None or status >= 400:
+                    errors[endpoint] += 1
+                else:
+                    latencies[endpoint].append(elapsed)
+
+    # Sample RSS in the background so memory growth shows up as a curve
+    rss_samples = []
+    stop_sampling = threading.Event()
+
+    def sample_rss(started):
+        while True:
+            rss = read_rss_kb(rss_pid)
+            if rss is not None:
+                rss_samples.append({'t': round(time.perf_counter() - started, 3), 'rss_kb': rss})
+            if stop_sampling.wait(args.sample_interval):
+                return
+
+    started = time.perf_counter()
+    sampler = threading.Thread(target=sample_rss, args=(started,), daemon=True)
+    sampler.start()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    duration = time.perf_counter() - started
+    stop_sampling.set()
+    sampler.join()
+    rss = read_rss_kb(rss_pid)
+    if rss is not None:
+        rss_samples.append({'t': round(duration, 3), 'rss_kb': rss})
+
+    def summarize(values, count_errors, count_rejected):
+        values = sorted(values)
+        return {
+            'requests': len(values),
+            'errors': count_errors,
+            'rejected': count_rejected,
+            'rps': round(len(values) / duration, 2) if duration else 0.0,
+            'p50_ms': round(percentile(values, 0.50), 3),
+            'p95_ms': round(percentile(values, 0.95), 3),
+            'p99_ms': round(percentile(values, 0.99), 3),
+            'max_ms': round(values[-1], 3) if values else 0.0,
+        }
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'mode': 'socket' if args.url else 'in-process',
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'sessions': args.sessions,
+            'zipf': args.zipf,
+            'seed': args.seed,
+            'url': args.url,
+        },
+        'duration_s': round(duration, 3),
+        'overall': summarize(all_latencies, sum(errors.values()), sum(rejected.values())),
+        'endpoints': {
+            name: dict(summarize(latencies[name], errors[name], rejected[name]),
+                       statuses={str(k): v for k, v in statuses[name].items()})
+            for name in endpoints
+        },
+        'rss': {
+            'start_kb': rss_samples[0]['rss_kb'] if rss_samples else None,
+            'end_kb': rss_samples[-1]['rss_kb'] if rss_samples else None,
+            'samples': rss_samples,
+        },
+    }
+
+
+def print_report(result):
+    print(f"📊 {result['mode']} benchmark @ {result['commit'] or 'unknown commit'}: "
+          f"{result['overall']['requests']} requests served in {result['duration_s']}s "
+          f"({result['overall']['rps']} req/s)")
+    # reqs, rps and percentiles cover served requests; 429/503 were turned away by admission control
+    print(f"{'endpoint':<12}{'reqs':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}{'429/503':>9}")
+    for name, stats in list(result['endpoints'].items()) + [('overall', result['overall'])]:
+        print(f"{name:<12}{stats['requests']:>8}{stats['rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}{stats['rejected']:>9}")
+    rss = result['rss']
+    if rss['start_kb'] is not None:
+        print(f"RSS: {rss['start_kb']} KB -> {rss['end_kb']} KB ({rss['end_kb'] - rss['start_kb']:+d} KB)")
+
+
+def compare(result, baseline_path, threshold):
+    """Print p95 deltas against a previous run; True if any endpoint regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"🔍 Compared with {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+    regressed = False
+    for name, stats in list(result['endpoints'].items()) + [('overall', result['overall'])]:
+        before = baseline['endpoints'].get(name) if name != 'overall' else baseline.get('overall')
+        if not before or not before['p95_ms']:
+            continue
+        change = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms']
+        flag = ''
+        if change > threshold:
+            flag = '  ❌ regression'
+            regressed = True
+        print(f"  {name:<12} p95 {before['p95_ms']:>9} -> {stats['p95_ms']:>9} ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Astrals Hub API')
+    parser.add_argument('--requests', type=int, default=5000, help='total requests to send')
+    parser.add_argument('--concurrency', type=int, default=1, help='number of client threads')
+    parser.add_argument('--sessions', type=int, default=1000, help='number of distinct student sessions')
+    parser.add_argument('--zipf', type=float, default=1.1, help='session popularity skew (0 = uniform)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--server-pid', type=int, help='PID of the server, to sample its RSS in socket mode')
+    parser.add_argument('--sample-interval', type=float, default=0.5, help='seconds between RSS samples')
+    parser.add_argument('--output', help='result file (default: data/benchmarks/<timestamp>_<commit>.json)')
+    parser.add_argument('--compare', help='previous result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='p95 increase that counts as a regression')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+
+    output = args.output
+    if not output:
+        os.makedirs(os.path.join('data', 'benchmarks'), exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output = os.path.join('data', 'benchmarks', f"{stamp}_{result['commit'] or 'nocommit'}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+    if args.compare and compare(result, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
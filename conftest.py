@@ -0,0 +1,38 @@
+"""Shared test setup: the app is imported once, with side effects kept out of data/"""
+
+import os
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+# Read by app.py at import time, so they must be set before any test imports it
+os.environ.setdefault('ASTRALS_SECRET_KEY', 'test')
+os.environ.setdefault('ASTRALS_ADMISSION_CONTROL', '0')
+os.environ.setdefault('ASTRALS_CHAT_SAVE_DIR', tempfile.mkdtemp(prefix='astrals-test-'))
+
+
+class BufferedClient(FlaskClient):
+    """Reads every response body in full, as a server would, so each request finishes"""
+
+    def open(self, *args, buffered=True, **kwargs):
+        return super().open(*args, buffered=buffered, **kwargs)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    """Each storage backend in turn"""
+    from storage import MemoryStorage, SQLiteStorage
+    if request.param == 'memory':
+        backend = MemoryStorage()
+    else:
+        backend = SQLiteStorage(str(tmp_path / 'astrals.db'))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def client():
+    from app import app
+    with BufferedClient(app, app.response_class, use_cookies=True) as client:
+        yield client
@@ -1,15 +1,36 @@
 #!/usr/bin/env python3
 """
 Astrals Hub - Video Downloader Helper
-This script helps you set up a sample space video for your splash screen.
+This script helps you set up a sample space video for your splash screen,
+and transcodes it into low-bitrate renditions for slow connections.
+
+    python download_video.py                  Set up the videos folder
+    python download_video.py transcode        Build renditions and a poster (needs ffmpeg)
 """
 
+import argparse
+import json
 import os
+import shutil
+import subprocess
+import sys
 from pathlib import Path
 
+VIDEOS_DIR = Path("static/videos")
+SOURCE_VIDEO = "intro.mp4"
+MANIFEST_NAME = "renditions.json"
+
+# (label, height, video bitrate in kbps); the splash video is muted, so no audio
+RENDITIONS = [
+    ("480p", 480, 600),
+    ("360p", 360, 300),
+    ("240p", 240, 120),
+]
+POSTER_HEIGHT = 480
+
 def create_videos_folder():
     """Create the videos folder if it doesn't exist"""
-    videos_dir = Path("static/videos")
+    videos_dir = VIDEOS_DIR
     videos_dir.mkdir(parents=True, exist_ok=True)
     print(f"✅ Videos folder created: {videos_dir}")
     return videos_dir
@@ -47,5 +68,89 @@ def setup_video_folder():
         print(f"📁 Place your video file here: {video_path}")
         print("After adding the video, run your Flask app to see it!")
 
+def probe_video(path):
+    """Height, duration and bitrate of a video via ffprobe"""
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=height:format=duration,bit_rate",
+        "-of", "json", str(path)
+    ], capture_output=True, text=True, check=True)
+    info = json.loads(result.stdout)
+    duration = float(info["format"].get("duration") or 0)
+    bitrate = int(info["format"].get("bit_rate") or 0)
+    if not bitrate and duration:
+        bitrate = int(path.stat().st_size * 8 / duration)
+    return {"height": int(info["streams"][0]["height"]), "duration": duration, "bitrate_kbps": bitrate // 1000}
+
+
+def ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-y", "-v", "error", *args], check=True)
+
+
+def transcode_video(source, videos_dir):
+    """Write low-bitrate renditions, a poster frame and renditions.json"""
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        print("❌ ffmpeg and ffprobe are required: https://ffmpeg.org/download.html")
+        return False
+    if not source.exists():
+        print(f"❌ Source video not found: {source}")
+        return False
+
+    original = probe_video(source)
+    print(f"🎬 Transcoding {source} ({original['height']}p, {original['bitrate_kbps']} kbps, "
+          f"{source.stat().st_size // 1024} KB)")
+    stem = source.stem
+    renditions = [{
+        "file": source.name,
+        "height": original["height"],
+        "bitrate_kbps": original["bitrate_kbps"],
+        "bytes": source.stat().st_size,
+    }]
+
+    for label, height, kbps in RENDITIONS:
+        if height >= original["height"]:
+            continue
+        target = videos_dir / f"{stem}-{label}.mp4"
+        # faststart puts the index first so playback can begin after the first range request
+        ffmpeg("-i", str(source), "-an",
+               "-vf", f"scale=-2:{height}",
+               "-c:v", "libx264", "-preset", "slow", "-profile:v", "main", "-pix_fmt", "yuv420p",
+               "-b:v", f"{kbps}k", "-maxrate", f"{kbps * 3 // 2}k", "-bufsize", f"{kbps * 2}k",
+               "-movflags", "+faststart", str(target))
+        renditions.append({"file": target.name, "height": height, "bitrate_kbps": kbps, "bytes": target.stat().st_size})
+        print(f"✅ {target.name}: {target.stat().st_size // 1024} KB")
+
+    poster = videos_dir / f"{stem}-poster.jpg"
+    ffmpeg("-ss", str(min(0.5, original["duration"] / 2)), "-i", str(source), "-frames:v", "1",
+           "-vf", f"scale=-2:{min(POSTER_HEIGHT, original['height'])}", "-q:v", "5", str(poster))
+    print(f"✅ {poster.name}: {poster.stat().st_size // 1024} KB")
+
+    manifest = {
+        "source": source.name,
+        "poster": poster.name,
+        # Smallest first, the order the client walks them in
+        "renditions": sorted(renditions, key=lambda rendition: rendition["bitrate_kbps"]),
+    }
+    with open(videos_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"💾 Wrote {videos_dir / MANIFEST_NAME}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Set up and transcode the splash video")
+    subparsers = parser.add_subparsers(dest="command")
+    transcode = subparsers.add_parser("transcode", help="build low-bitrate renditions and a poster frame")
+    transcode.add_argument("--input", default=str(VIDEOS_DIR / SOURCE_VIDEO), help="source video")
+    args = parser.parse_args()
+
+    if args.command == "transcode":
+        source = Path(args.input)
+        if not transcode_video(source, source.parent):
+            sys.exit(1)
+    else:
+        setup_video_folder()
+
+
 if __name__ == "__main__":
-    setup_video_folder()
+    main()
@@ -0,0 +1,99 @@
+"""
+Astrals Hub - Gamification
+XP awards and achievement events applied as one atomic read-modify-write
+per session, so concurrent updates neither lose XP nor miss level-ups,
+and every call reports a single consistent level and badge transition.
+"""
+
+from datetime import datetime
+
+XP_PER_LEVEL = 100
+
+
+def level_for(total_xp):
+    return max(1, total_xp // XP_PER_LEVEL + 1)
+
+
+def default_stats():
+    """Gamification state for sessions that have not earned XP yet"""
+    return {
+        'total_xp': 0,
+        'level': 1,
+        'badges': [],
+        'achievements': []
+    }
+
+
+def public_stats(stats):
+    """Stats without the rule engine's bookkeeping"""
+    return {key: value for key, value in stats.items() if key != 'progress'}
+
+
+class GamificationService:
+    """XP, levels and badges on top of a storage backend's atomic updates"""
+
+    def __init__(self, storage, leaderboard=None, achievements=None, clock=datetime.now):
+        self.storage = storage
+        self.leaderboard = leaderboard
+        self.achievements = achievements
+        self._clock = clock
+
+    def stats(self, session_id):
+        return public_stats(self.storage.get_gamification(session_id) or default_stats())
+
+    def award(self, session_id, xp, reason=''):
+        return self.award_many(session_id, [{'xp': xp, 'reason': reason}])
+
+    def award_many(self, session_id, events):
+        """Apply XP events ({'xp': int, 'reason': str}) in order, all or nothing.
+
+        Returns the new stats with the transition they caused: level before
+        and after, and the badges and achievements gained.
+        """
+        amounts = [int(event.get('xp', 0)) for event in events]
+
+        def apply(stats, now):
+            stats['total_xp'] += sum(amounts)
+            # Levels are never taken away, even by negative corrections
+            stats['level'] = max(stats['level'], level_for(stats['total_xp']))
+
+            if self.leaderboard is not None and amounts:
+                # Inside the update so the boards change atomically with the stats
+                self.leaderboard.record(session_id, sum(amounts), stats['total_xp'])
+            if self.achievements is not None:
+                self.achievements.apply(stats, 'xp', now)
+
+        result = self._update(session_id, apply)
+        result['xp_awarded'] = sum(amounts)
+        return result
+
+    def record_event(self, session_id, event, **attrs):
+        """Feed a chat or quiz event to the achievement rules"""
+        if self.achievements is None:
+            return None
+        return self._update(session_id, lambda stats, now: self.achievements.apply(stats, event, now, **attrs))
+
+    def _update(self, session_id, mutate):
+        if not session_id or not isinstance(session_id, str):
+            # Stats and leaderboard rows are keyed by it
+            raise ValueError('session_id must be a non-empty string')
+
+        def apply(current):
+            stats = current or default_stats()
+            level_before = stats['level']
+            badges_before = len(stats['badges'])
+            achievements_before = len(stats['achievements'])
+
+            mutate(stats, self._clock())
+
+            # Both lists only ever grow, so anything past the old length is new
+            return stats, {
+                'stats': public_stats(stats),
+                'level_before': level_before,
+                'level': stats['level'],
+                'level_up': stats['level'] > level_before,
+                'new_badges': stats['badges'][badges_before:],
+                'new_achievements': stats['achievements'][achievements_before:],
+            }
+
+        return self.storage.update_gamification(session_id, apply)
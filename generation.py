@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Astrals Hub - Generation Backends
+Where chat answers come from: the built-in rules engine (default) or a model
+server over HTTP. The HTTP backend runs calls on a bounded worker pool with
+persistent connections, gives up after a per-request deadline, and coalesces
+identical prompts that are already in flight into a single call. Callers fall
+back to the rules engine whenever it raises BackendUnavailable.
+
+    python generation.py stub [--port 8081] [--delay 0.5]    Local model server stub for testing
+
+Protocol: POST the URL with JSON {"prompt", "subject", "user_level",
+"locale"}; the server answers JSON {"response": "..."}.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUnavailable(Exception):
+    """The backend could not answer in time; use the rule-based response"""
+
+
+class GenerationBackend:
+    """Produces the answer to one chat message"""
+
+    name = None
+
+    def generate(self, prompt, subject=None, user_level='intermediate', locale=None, key=None):
+        """Answer prompt as the student wrote it; key (default prompt) identifies equivalent questions"""
+        raise NotImplementedError
+
+    def pending(self):
+        """Calls waiting on the backend"""
+        return 0
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def close(self):
+        pass
+
+
+class RulesBackend(GenerationBackend):
+    """The keyword and topic rules of AstralsHub"""
+
+    name = 'rules'
+
+    def __init__(self, compute):
+        self._compute = compute
+
+    def generate(self, prompt, subject=None, user_level='intermediate', locale=None, key=None):
+        return self._compute(prompt, subject, user_level, locale)
+
+
+class HTTPBackend(GenerationBackend):
+    """Model server client with a bounded pool, deadlines and single-flight calls"""
+
+    name = 'http'
+
+    def __init__(self, url, timeout=5.0, max_workers=8, max_pending=64, api_key=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Invalid generation backend URL: {url}")
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        if api_key:
+            self._headers['Authorization'] = f'Bearer {api_key}'
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation')
+        # One persistent connection per pool thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (key, subject, user_level, locale) -> future of the call answering it
+        self._in_flight = {}
+        self._counters = {'calls': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0, 'rejected': 0}
+
+    def generate(self, prompt, subject=None, user_level='intermediate', locale=None, key=None):
+        # Questions with the same key share one call; the model still sees the first one's text
+        key = (prompt if key is None else key, subject, user_level, locale)
+        deadline = time.monotonic() + self.timeout
+        started = False
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                # Same question already being answered: wait for that call
+                self._counters['coalesced'] += 1
+            elif len(self._in_flight) >= self.max_pending:
+                self._counters['rejected'] += 1
+                raise BackendUnavailable('Generation queue is full')
+            else:
+                self._counters['calls'] += 1
+                future = self._executor.submit(self._call, prompt, subject, user_level, locale, deadline)
+                self._in_flight[key] = future
+                started = True
+        if started:
+            # Outside the lock: a call that has already failed runs the callback right here
+            future.add_done_callback(lambda done: self._finished(key, done))
+
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise BackendUnavailable('Generation deadline exceeded')
+        except BackendUnavailable:
+            raise
+        except Exception as e:
+            self._count('errors')
+            raise BackendUnavailable(str(e))
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _call(self, prompt, subject, user_level, locale, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # Waited in the queue past the deadline; the caller has given up
+            raise BackendUnavailable('Generation deadline exceeded in queue')
+        body = json.dumps({'prompt': prompt, 'subject': subject, 'user_level': user_level, 'locale': locale}).encode('utf-8')
+
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            connection = self._connection(remaining)
+            try:
+                connection.request('POST', self._path, body=body, headers=self._headers)
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._reset_connection()
+                if attempt:
+                    raise
+            except Exception:
+                self._reset_connection()
+                raise
+
+        if response.status != 200:
+            raise BackendUnavailable(f'Generation backend returned HTTP {response.status}')
+        text = json.loads(payload).get('response')
+        if not isinstance(text, str) or not text.strip():
+            raise BackendUnavailable('Generation backend returned no response')
+        return text
+
+    def _connection(self, timeout):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connection_class(self._host, self._port, timeout=timeout)
+        else:
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def pending(self):
+        return len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, backend=self.name, pending=len(self._in_flight))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_backend(name, compute, url=None, timeout=5.0, max_workers=8, max_pending=64, api_key=None):
+    """Build the generation backend named in the app configuration"""
+    if name == 'rules':
+        return RulesBackend(compute)
+    if name == 'http':
+        if not url:
+            raise ValueError('The http generation backend needs ASTRALS_GENERATION_URL')
+        return HTTPBackend(url, timeout=timeout, max_workers=max_workers, max_pending=max_pending, api_key=api_key)
+    raise ValueError(f"Unknown generation backend: {name}")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Model server stand-in: echoes the prompt after a configurable delay"""
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    calls = 0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        type(self).calls += 1
+        time.sleep(self.delay)
+        body = json.dumps({'response': f"[stub #{self.calls}] You asked about: {request.get('prompt', '')}"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Astrals Hub generation backend tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stub_parser = subparsers.add_parser('stub', help='run a local model server stub')
+    stub_parser.add_argument('--host', default='127.0.0.1')
+    stub_parser.add_argument('--port', type=int, default=8081)
+    stub_parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before answering')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'stub':
+        StubHandler.delay = args.delay
+        server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+        print(f"🧪 Stub generation backend on http://{args.host}:{args.port}/ (delay {args.delay}s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Astrals Hub - Chat History Writer
+Background persistence of saved chats: one append-only JSON Lines file
+per session, repeated saves coalesced and fsyncs grouped per batch.
+Each save appends the messages whose storage id is past the last one
+written, which is remembered for recently saved sessions and read back
+from the file's tail for the rest.
+"""
+
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+WRITTEN = 'written'
+FAILED = 'failed'
+
+
+def safe_session_name(session_id):
+    """File-name-safe form of a session id (hashed if it has other characters)"""
+    safe = re.sub(r'[^A-Za-z0-9_-]', '_', session_id)
+    if safe != session_id:
+        safe = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+    return safe
+
+
+class HistoryWriter:
+    """Queue-backed writer appending new chat messages to per-session files"""
+
+    def __init__(self, directory, compress=False, commit_delay=0.05, max_tickets=10000, max_markers=10000):
+        self.directory = directory
+        self.compress = compress
+        self.commit_delay = commit_delay
+        self.max_tickets = max_tickets
+        self.max_markers = max_markers
+        self._cond = threading.Condition()
+        # session_id -> (ticket_id, latest history snapshot)
+        self._pending = OrderedDict()
+        self._tickets = OrderedDict()
+        # session_id -> id of the last message written, least recently saved first;
+        # only the writer thread touches it
+        self._markers = OrderedDict()
+        self._ticket_ids = itertools.count(1)
+        self._closed = False
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+
+    def path_for(self, session_id):
+        extension = '.jsonl.gz' if self.compress else '.jsonl'
+        return os.path.join(self.directory, f'chat_{safe_session_name(session_id)}{extension}')
+
+    def submit(self, session_id, history):
+        """Queue a save; repeated saves of a waiting session share one ticket"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('History writer is closed')
+            pending = self._pending.get(session_id)
+            if pending:
+                ticket_id = pending[0]
+            else:
+                ticket_id = str(next(self._ticket_ids))
+                self._tickets[ticket_id] = {
+                    'ticket': ticket_id,
+                    'status': PENDING,
+                    'session_id': session_id,
+                    'filename': self.path_for(session_id),
+                    'messages_written': 0
+                }
+                while len(self._tickets) > self.max_tickets:
+                    self._tickets.popitem(last=False)
+            self._pending[session_id] = (ticket_id, history)
+            self._cond.notify()
+            return ticket_id
+
+    def status(self, ticket_id):
+        with self._cond:
+            ticket = self._tickets.get(ticket_id)
+            return dict(ticket) if ticket else None
+
+    def pending(self):
+        """Number of sessions waiting to be written"""
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+            # Give concurrent saves a moment to join this group commit
+            time.sleep(self.commit_delay)
+            with self._cond:
+                batch, self._pending = self._pending, OrderedDict()
+                self._busy = True
+
+            results = self._write_batch(batch)
+
+            with self._cond:
+                for ticket_id, outcome in results:
+                    ticket = self._tickets.get(ticket_id)
+                    if ticket:
+                        ticket.update(outcome)
+                self._busy = False
+                self._cond.notify_all()
+
+    def _write_batch(self, batch):
+        os.makedirs(self.directory, exist_ok=True)
+        results = []
+        opened = []
+        for session_id, (ticket_id, history) in batch.items():
+            try:
+                new_messages = self._unwritten(session_id, history)
+                if new_messages:
+                    raw = open(self.path_for(session_id), 'ab')
+                    opened.append((session_id, len(results), raw))
+                    lines = ''.join(
+                        json.dumps(dict(message, session_id=session_id), ensure_ascii=False) + '\n'
+                        for message in new_messages
+                    ).encode('utf-8')
+                    if self.compress:
+                        # Each batch is its own gzip member; readers see one stream
+                        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                            gz.write(lines)
+                    else:
+                        raw.write(lines)
+                    self._remember(session_id, new_messages[-1].get('id'))
+                results.append((ticket_id, {'status': WRITTEN, 'messages_written': len(new_messages)}))
+            except Exception as e:
+                logger.error(f"Error saving chat history for {session_id}: {str(e)}")
+                results.append((ticket_id, {'status': FAILED, 'error': str(e)}))
+
+        # Group commit: one fsync per touched file for the whole batch
+        for session_id, position, raw in opened:
+            try:
+                raw.flush()
+                os.fsync(raw.fileno())
+            except OSError as e:
+                logger.error(f"Error syncing chat history for {session_id}: {str(e)}")
+                results[position] = (results[position][0], {'status': FAILED, 'error': str(e)})
+                # Re-read the file's real tail before the next save
+                self._markers.pop(session_id, None)
+            finally:
+                raw.close()
+        return results
+
+    def _unwritten(self, session_id, history):
+        if session_id in self._markers:
+            last_id = self._markers[session_id]
+        else:
+            last_id = self._read_last_id(session_id)
+            self._remember(session_id, last_id)
+        if last_id is None:
+            return list(history)
+        # Storage ids only grow within a session, even across a cleared history
+        return [message for message in history if (message.get('id') or 0) > last_id]
+
+    def _remember(self, session_id, message_id):
+        self._markers[session_id] = message_id
+        self._markers.move_to_end(session_id)
+        while len(self._markers) > self.max_markers:
+            self._markers.popitem(last=False)
+
+    def _read_last_id(self, session_id):
+        path = self.path_for(session_id)
+        if not os.path.exists(path):
+            return None
+        opener = gzip.open if self.compress else open
+        last = None
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    last = line
+        return json.loads(last).get('id') if last else None
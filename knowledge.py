@@ -0,0 +1,193 @@
+"""
+Astrals Hub - Knowledge Packs
+Topic explanations stored as one compact JSON file per (locale, subject) in
+content/knowledge/<locale>/<subject>.json (lowercase locale directories),
+next to an index.json naming the default locale, the locales and the subject
+order. Only the directory listing is read at startup; packs are parsed on
+first use and kept in a bounded LRU cache, so adding locales leaves startup
+and memory flat.
+
+A locale that lacks a subject falls back to the default locale's pack.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from matcher import MessageMatcher
+from response_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Column order of the rows in a pack's "topics"
+PACK_FIELDS = ('topic', 'response', 'keywords')
+
+INDEX_NAME = 'index.json'
+
+
+class KnowledgeStore:
+    """Lazily loaded, hot-reloadable knowledge packs for every locale"""
+
+    def __init__(self, directory, max_packs=64, max_locales=8, reload_interval=2.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._packs = LRUCache(max_packs)
+        # locale -> (knowledge base, matcher) over all of its subjects
+        self._bases = LRUCache(max_locales)
+        self._signature = None
+        self._checked_at = 0.0
+        self.default_locale = 'en'
+        self.locale_names = {}
+        self._subject_order = []
+        # locale -> {subject: (path, mtime, size)}
+        self._files = {}
+        self._versions = {}
+        self.reload()
+
+    def locales(self):
+        """{locale: display name} of every locale with at least one pack"""
+        self._maybe_reload()
+        return {locale: self.locale_names.get(locale, locale) for locale in sorted(self._files)}
+
+    def resolve_locale(self, locale):
+        """The locale to serve for a requested one: exact, then its language, then the default"""
+        self._maybe_reload()
+        if locale:
+            locale = locale.strip().lower().replace('_', '-')
+            for candidate in (locale, locale.split('-')[0]):
+                if candidate in self._files:
+                    return candidate
+        return self.default_locale
+
+    def subjects(self, locale=None):
+        """Subjects available in a locale (including default-locale fallbacks), in index order"""
+        locale = self.resolve_locale(locale)
+        available = set(self._files.get(locale, {})) | set(self._files.get(self.default_locale, {}))
+        ordered = [subject for subject in self._subject_order if subject in available]
+        return ordered + sorted(available - set(ordered))
+
+    def version(self, locale=None):
+        """Hash of the files behind a locale's packs; changes when any of them does"""
+        locale = self.resolve_locale(locale)
+        version = self._versions.get(locale)
+        if version is None:
+            entries = [self._file(locale, subject) for subject in self.subjects(locale)]
+            payload = json.dumps([[os.path.basename(path), mtime, size] for path, mtime, size in entries])
+            version = self._versions[locale] = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+        return version
+
+    def pack(self, locale, subject):
+        """{'subject', 'title', 'topics', 'responses', 'keywords'} for a subject, or None"""
+        locale = self.resolve_locale(locale)
+        entry = self._file(locale, subject)
+        if entry is None:
+            return None
+        path = entry[0]
+        pack = self._packs.get(path)
+        if pack is None:
+            try:
+                pack = self._load_pack(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error loading knowledge pack {path}: {str(e)}")
+                return None
+            self._packs.put(path, pack)
+        return pack
+
+    def knowledge_base(self, locale=None):
+        """{subject: pack} over every subject of a locale"""
+        return self._base(locale)[0]
+
+    def matcher(self, locale=None):
+        """Message matcher over a locale's topics and keywords"""
+        return self._base(locale)[1]
+
+    def reload(self):
+        """Rescan the directory and drop every cached pack if any file changed"""
+        with self._lock:
+            signature = self._scan_signature()
+            self._checked_at = time.monotonic()
+            if signature == self._signature:
+                return False
+
+            index = {}
+            index_path = os.path.join(self.directory, INDEX_NAME)
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading knowledge index {index_path}: {str(e)}")
+
+            files = {}
+            for locale, name, mtime, size in signature:
+                if locale is not None:
+                    files.setdefault(locale, {})[os.path.splitext(name)[0]] = (
+                        os.path.join(self.directory, locale, name), mtime, size
+                    )
+
+            self.default_locale = index.get('default_locale', 'en')
+            self.locale_names = index.get('locales', {})
+            self._subject_order = index.get('subjects', [])
+            self._files = files
+            self._versions = {}
+            self._packs.clear()
+            self._bases.clear()
+            self._signature = signature
+            logger.info(f"Found knowledge packs for {len(files)} locales: {', '.join(sorted(files))}")
+            return True
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def _scan_signature(self):
+        """(locale, file name, mtime, size) of the index and every pack; locale is None for the index"""
+        if not os.path.isdir(self.directory):
+            return ()
+        entries = []
+        with os.scandir(self.directory) as locales:
+            for locale in locales:
+                if locale.is_file() and locale.name == INDEX_NAME:
+                    stat = locale.stat()
+                    entries.append((None, locale.name, stat.st_mtime_ns, stat.st_size))
+                elif locale.is_dir():
+                    with os.scandir(locale.path) as packs:
+                        for pack in packs:
+                            if pack.is_file() and pack.name.endswith('.json'):
+                                stat = pack.stat()
+                                entries.append((locale.name, pack.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries, key=lambda entry: (entry[0] or '', entry[1])))
+
+    def _file(self, locale, subject):
+        return self._files.get(locale, {}).get(subject) or self._files.get(self.default_locale, {}).get(subject)
+
+    def _base(self, locale):
+        locale = self.resolve_locale(locale)
+        base = self._bases.get(locale)
+        if base is None:
+            knowledge_base = {}
+            for subject in self.subjects(locale):
+                pack = self.pack(locale, subject)
+                if pack is not None:
+                    knowledge_base[subject] = pack
+            base = (knowledge_base, MessageMatcher(knowledge_base))
+            self._bases.put(locale, base)
+        return base
+
+    @staticmethod
+    def _load_pack(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            doc = json.load(f)
+        fields = doc.get('fields', list(PACK_FIELDS))
+        rows = [dict(zip(fields, row)) for row in doc.get('topics', [])]
+        subject = doc.get('subject') or os.path.splitext(os.path.basename(path))[0]
+        return {
+            'subject': subject,
+            'title': doc.get('title') or subject.replace('_', ' ').title(),
+            'topics': [row['topic'] for row in rows],
+            'responses': {row['topic']: row['response'] for row in rows},
+            'keywords': {row['topic']: row.get('keywords') or [] for row in rows}
+        }
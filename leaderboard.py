@@ -0,0 +1,257 @@
+"""
+Astrals Hub - Leaderboard Engine
+Daily, weekly, monthly and all-time XP rankings. Every period's current
+bucket is a named score board kept by the storage backend and updated in
+the same atomic step as the XP award, so rankings survive restarts and
+every worker process sees the same ones. The in-memory backend keeps its
+boards in indexable skip lists, so top-N, rank and around-me queries are
+O(log n); SQLite ranks in O(rank) (see storage.py).
+"""
+
+import random
+import threading
+from datetime import datetime
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        # width[i] = number of level-0 steps from this node to next[i]
+        self.width = [1] * level
+
+
+class RankedSkipList:
+    """Sorted set with O(log n) insert, remove, rank and positional access"""
+
+    def __init__(self, max_level=24, p=0.25, rng=None):
+        self._max_level = max_level
+        self._p = p
+        self._rng = rng or random.Random()
+        self._head = _Node(None, max_level)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_level(self):
+        level = 1
+        while level < self._max_level and self._rng.random() < self._p:
+            level += 1
+        return level
+
+    def insert(self, key):
+        chain = [None] * self._max_level
+        steps_at_level = [0] * self._max_level
+        node = self._head
+        for level in reversed(range(self._max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        new_level = self._random_level()
+        new_node = _Node(key, new_level)
+        steps = 0
+        for level in range(new_level):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(new_level, self._max_level):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain = [None] * self._max_level
+        node = self._head
+        for level in reversed(range(self._max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self._max_level):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """0-based position of key"""
+        node = self._head
+        position = 0
+        for level in reversed(range(self._max_level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0] is None or node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start, stop):
+        """Keys at positions [start, stop)"""
+        start = max(start, 0)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+
+        # Walk down to the node just before `start`, then along level 0
+        node = self._head
+        remaining = start
+        for level in reversed(range(self._max_level)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        keys = []
+        node = node.next[0]
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class ScoreBoard:
+    """Scores ranked highest first (ties by session id) in an indexable skip list"""
+
+    def __init__(self):
+        self._scores = {}
+        self._index = RankedSkipList()
+
+    def set_score(self, session_id, score):
+        old = self._scores.get(session_id)
+        if old == score:
+            return
+        # Insert first: if the key cannot be ordered it raises before anything changed
+        self._index.insert((-score, session_id))
+        if old is not None:
+            self._index.remove((-old, session_id))
+        self._scores[session_id] = score
+
+    def add(self, session_id, xp):
+        self.set_score(session_id, self._scores.get(session_id, 0) + xp)
+
+    def __len__(self):
+        return len(self._index)
+
+    def score(self, session_id):
+        return self._scores.get(session_id)
+
+    def position(self, session_id):
+        """0-based position, or None if the session is not on the board"""
+        score = self._scores.get(session_id)
+        if score is None:
+            return None
+        return self._index.rank((-score, session_id))
+
+    def slice(self, start, stop):
+        """(session_id, score) at 0-based positions [start, stop)"""
+        return [(session_id, -neg_score) for neg_score, session_id in self._index.slice(start, stop)]
+
+
+def board_name(period, now):
+    """Storage name of a period's board for the bucket containing now"""
+    if period == 'all-time':
+        return period
+    if period == 'daily':
+        return f"daily:{now.date().isoformat()}"
+    if period == 'weekly':
+        year, week = tuple(now.isocalendar())[:2]
+        return f"weekly:{year}-W{week:02d}"
+    if period == 'monthly':
+        return f"monthly:{now.year}-{now.month:02d}"
+    raise KeyError(period)
+
+
+class PeriodBoard:
+    """Read view of one period's current board"""
+
+    def __init__(self, storage, name):
+        self._storage = storage
+        self.name = name
+
+    def __len__(self):
+        return self._storage.count_scores(self.name)
+
+    def score(self, session_id):
+        position = self._storage.score_position(self.name, session_id)
+        return position[1] if position is not None else None
+
+    def rank(self, session_id):
+        """1-based rank, or None if the session has no XP this period"""
+        position = self._storage.score_position(self.name, session_id)
+        return position[0] + 1 if position is not None else None
+
+    def entries(self, start, stop):
+        """(rank, session_id, score) for 0-based positions [start, stop)"""
+        # Positions before the top do not exist; number from the first real one
+        start = max(start, 0)
+        if start >= stop:
+            return []
+        return [
+            (start + offset + 1, session_id, score)
+            for offset, (session_id, score) in enumerate(self._storage.score_slice(self.name, start, stop))
+        ]
+
+    def top(self, limit):
+        return self.entries(0, limit)
+
+    def around(self, session_id, window):
+        rank = self.rank(session_id)
+        if rank is None:
+            return []
+        return self.entries(rank - 1 - window, rank + window)
+
+
+class Leaderboard:
+    """Daily, weekly, monthly and all-time XP rankings on top of a storage backend"""
+
+    PERIODS = ('daily', 'weekly', 'monthly', 'all-time')
+
+    def __init__(self, storage, clock=datetime.now):
+        self.storage = storage
+        self._clock = clock
+        self._lock = threading.Lock()
+        # period -> board this process last wrote to, to notice rollovers
+        self._current = {}
+
+    def record(self, session_id, xp, total_xp):
+        """Apply an XP award; total_xp is the session's new all-time total.
+
+        Call inside the storage's gamification update so the boards change
+        in the same atomic step as the stats.
+        """
+        now = self._clock()
+        for period in self.PERIODS:
+            name = board_name(period, now)
+            if period == 'all-time':
+                self.storage.set_scores(name, [(session_id, total_xp)])
+                continue
+            with self._lock:
+                rolled = self._current.get(period) != name
+                self._current[period] = name
+            if rolled:
+                # A new period starts empty; earlier buckets are dropped
+                self.storage.drop_score_boards(f"{period}:", keep=name)
+            self.storage.add_score(name, session_id, xp)
+
+    def load(self, totals):
+        """Seed the all-time board from stored (session_id, total_xp) pairs it does not have yet"""
+        self.storage.set_scores(board_name('all-time', None), totals, replace=False)
+
+    def board(self, period):
+        """The current board of a period; KeyError for unknown periods"""
+        return PeriodBoard(self.storage, board_name(period, self._clock()))
+
+    def query(self, period, fn):
+        """Run fn(board) against the current bucket of a period"""
+        return fn(self.board(period))
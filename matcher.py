@@ -0,0 +1,140 @@
+"""
+Astrals Hub - Message Matcher
+Single-pass classification of chat messages against greeting, help,
+intent and topic phrases using an Aho-Corasick automaton.
+"""
+
+# Phrase tables, in the order the chat engine checks them
+GREETING_PHRASES = ['hello', 'hi', 'hey', 'good morning', 'good afternoon']
+HELP_PHRASES = ['help', 'what can you do', 'how do you work']
+INTENT_PHRASES = [
+    ('explain', ['explain', 'what is', 'how does', 'why']),
+    ('example', ['example', 'examples', 'show me']),
+    ('practice', ['practice', 'exercise', 'problem']),
+]
+
+GREETING = 'greeting'
+HELP = 'help'
+INTENT = 'intent'
+TOPIC = 'topic'
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton reporting every phrase occurring in a text"""
+
+    def __init__(self, phrases):
+        # Node 0 is the root; each node has a goto table, a failure link
+        # and the values of every phrase ending at it (suffixes included)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for phrase, value in phrases:
+            node = 0
+            for ch in phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._output[node].append(value)
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def scan(self, text):
+        """Yield the value of every phrase occurrence in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                yield from output[node]
+
+
+class MessageMatch:
+    """Result of classifying a single chat message"""
+
+    __slots__ = ('greeting', 'help', 'intent', 'topics')
+
+    def __init__(self):
+        self.greeting = False
+        self.help = False
+        self.intent = None
+        # subject -> (rank, topic) of the best matching topic in that subject
+        self.topics = {}
+
+    def topic_for(self, subject):
+        """Best matching topic within a subject, or None"""
+        best = self.topics.get(subject)
+        return best[1] if best else None
+
+    def best_topic(self):
+        """Best matching (subject, topic) across all subjects, or None"""
+        if not self.topics:
+            return None
+        subject, (_, topic) = min(self.topics.items(), key=lambda item: item[1][0])
+        return subject, topic
+
+
+class MessageMatcher:
+    """Classifies chat messages in one pass over the lowercased text"""
+
+    def __init__(self, knowledge_base):
+        phrases = []
+        for phrase in GREETING_PHRASES:
+            phrases.append((phrase, (GREETING, 0, None)))
+        for phrase in HELP_PHRASES:
+            phrases.append((phrase, (HELP, 0, None)))
+        for rank, (intent, words) in enumerate(INTENT_PHRASES):
+            for phrase in words:
+                phrases.append((phrase, (INTENT, rank, intent)))
+
+        # Topic rank follows knowledge base order so that the first listed
+        # topic wins, exactly as a linear scan over the topic list would
+        rank = 0
+        for subject, subject_data in knowledge_base.items():
+            keywords = subject_data.get('keywords', {})
+            for topic in subject_data['topics']:
+                # Extra keywords let packs in other languages name their topics
+                for phrase in [topic.replace('_', ' ')] + keywords.get(topic, []):
+                    phrases.append((phrase.lower(), (TOPIC, rank, (subject, topic))))
+                rank += 1
+
+        self._automaton = PhraseMatcher(phrases)
+
+    def classify(self, message):
+        """Classify a message into greeting/help/intent/topic matches"""
+        match = MessageMatch()
+        intent_rank = None
+
+        for kind, rank, payload in self._automaton.scan(message.lower()):
+            if kind == TOPIC:
+                subject, topic = payload
+                best = match.topics.get(subject)
+                if best is None or rank < best[0]:
+                    match.topics[subject] = (rank, topic)
+            elif kind == GREETING:
+                match.greeting = True
+            elif kind == HELP:
+                match.help = True
+            elif intent_rank is None or rank < intent_rank:
+                intent_rank = rank
+                match.intent = payload
+
+        return match
@@ -0,0 +1,230 @@
+"""
+Astrals Hub - Request Metrics
+Per-endpoint latency histograms, status counts and payload sizes recorded
+around every request, store-size gauges, and a Prometheus text exposition
+at /metrics. An opt-in sampling profiler can be attached to single requests.
+
+Counters are per process; with several gunicorn workers each scrape sees
+the worker that answered it.
+"""
+
+import itertools
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PROFILE_HEADER = 'X-Astrals-Profile'
+PROFILE_ID_HEADER = 'X-Astrals-Profile-Id'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        return list(itertools.accumulate(self.counts))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.001, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns the profile as collapsed stacks (flamegraph input)"""
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self._started
+        lines = [f'# {sum(self.samples.values())} samples every {self.interval * 1000:g} ms over {elapsed * 1000:.1f} ms']
+        lines.extend(f'{stack} {count}' for stack, count in self.samples.most_common())
+        return '\n'.join(lines) + '\n'
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+class RequestMetrics:
+    """Flask integration: request hooks, gauges and the /metrics endpoint"""
+
+    def __init__(self, app=None, profile_token=None, max_profiles=50):
+        self.profile_token = profile_token
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._latency = {}
+        self._request_bytes = {}
+        self._response_bytes = {}
+        self._gauges = []
+        self._profiles = OrderedDict()
+        self._started = time.time()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from flask import g, request
+
+        @app.before_request
+        def start_timer():
+            g._metrics_started = time.perf_counter()
+            if self.profile_token and secrets.compare_digest(request.headers.get(PROFILE_HEADER, ''), self.profile_token):
+                g._metrics_profiler = SamplingProfiler(threading.get_ident()).start()
+
+        @app.after_request
+        def record(response):
+            started = g.pop('_metrics_started', None)
+            if started is None:
+                return response
+            endpoint = request.url_rule.rule if request.url_rule else '<unmatched>'
+            method = request.method
+            request_size = request.content_length or 0
+            profiler = g.pop('_metrics_profiler', None)
+            if profiler:
+                profile_id = secrets.token_hex(8)
+                profile_title = f'# {method} {request.full_path}\n'
+                response.headers[PROFILE_ID_HEADER] = profile_id
+
+            def finish():
+                duration = time.perf_counter() - started
+                self.observe(endpoint, method, response.status_code, duration, request_size,
+                             None if response.is_streamed else response.content_length)
+                if profiler:
+                    self._store_profile(profile_id, profile_title + profiler.stop())
+
+            if response.is_streamed:
+                # Finish once the body has been sent, so streams are timed in full
+                response.call_on_close(finish)
+            else:
+                finish()
+            return response
+
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.add_url_rule('/metrics/profiles/<profile_id>', 'metrics_profile', self.profile_view)
+        app.extensions['request_metrics'] = self
+
+    def gauge(self, name, help_text, fn):
+        """Register fn() -> number, sampled at scrape time"""
+        self._gauges.append((name, help_text, fn))
+
+    def observe(self, endpoint, method, status, duration, request_size, response_size):
+        key = (endpoint, method)
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._request_bytes[key] = Histogram(SIZE_BUCKETS)
+                self._response_bytes[key] = Histogram(SIZE_BUCKETS)
+            self._latency[key].observe(duration)
+            self._request_bytes[key].observe(request_size)
+            if response_size is not None:
+                self._response_bytes[key].observe(response_size)
+
+    def profile(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def _store_profile(self, profile_id, text):
+        with self._lock:
+            self._profiles[profile_id] = text
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP astrals_http_requests_total Requests handled, by route, method and status.',
+                '# TYPE astrals_http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'astrals_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+            for name, help_text, histograms in (
+                ('astrals_http_request_duration_seconds', 'Time from request start until the response body was sent.', self._latency),
+                ('astrals_http_request_size_bytes', 'Request body size.', self._request_bytes),
+                ('astrals_http_response_size_bytes', 'Response body size (streamed responses excluded).', self._response_bytes),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (endpoint, method), histogram in sorted(histograms.items()):
+                    for bound, cumulative in zip(histogram.buckets, histogram.cumulative()):
+                        lines.append(f'{name}_bucket{_labels(endpoint=endpoint, method=method, le=_number(float(bound)))} {cumulative}')
+                    lines.append(f'{name}_bucket{_labels(endpoint=endpoint, method=method, le="+Inf")} {histogram.count}')
+                    lines.append(f'{name}_sum{_labels(endpoint=endpoint, method=method)} {_number(float(histogram.sum))}')
+                    lines.append(f'{name}_count{_labels(endpoint=endpoint, method=method)} {histogram.count}')
+
+        lines += [
+            '# HELP astrals_process_start_time_seconds Unix time the process started.',
+            '# TYPE astrals_process_start_time_seconds gauge',
+            f'astrals_process_start_time_seconds {_number(float(self._started))}',
+        ]
+        for name, help_text, fn in self._gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {_number(value)}']
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        from flask import Response
+        response = Response(self.render())
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+    def profile_view(self, profile_id):
+        from flask import Response, abort
+        text = self.profile(profile_id)
+        if text is None:
+            abort(404)
+        return Response(text, mimetype='text/plain')
@@ -0,0 +1,171 @@
+"""
+Astrals Hub - Quiz Question Store
+Loads the quiz bank from JSON/YAML files once, indexes it by
+(subject, class level) and reloads it when the files change.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+try:
+    import yaml
+except ImportError:  # YAML quiz files are optional
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Order in which nearby class levels are tried when a level has no questions
+FALLBACK_OFFSETS = (0, -1, 1, -2, 2)
+
+# Column order of the compact quiz pack format
+PACK_FIELDS = ('question', 'options', 'correct', 'xp', 'explanation')
+
+JSON_EXTENSIONS = ('.json',)
+YAML_EXTENSIONS = ('.yaml', '.yml')
+
+
+class QuizStore:
+    """Indexed, hot-reloadable quiz question bank"""
+
+    def __init__(self, directory, reload_interval=2.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        # (subject, class level) -> (questions, content version)
+        self._index = {}
+        # (subject, class level) -> questions, for the levels actually on disk
+        self._levels = {}
+        self.version = 0
+        self.last_modified = None
+        self.reload()
+
+    def get_questions(self, subject, class_level, count=None, rng=random):
+        """Sample up to `count` questions without replacement (all if None; none if count < 1)"""
+        self._maybe_reload()
+        questions, _ = self._index.get((subject, class_level), ((), None))
+        if count is None or count >= len(questions):
+            count = len(questions)
+        return rng.sample(questions, max(0, count))
+
+    def content_version(self, subject, class_level):
+        """Hash of the questions served for (subject, class level), or None"""
+        self._maybe_reload()
+        return self._index.get((subject, class_level), ((), None))[1]
+
+    def pack(self, subject, class_level):
+        """Compact, versioned quiz pack: one row per question in PACK_FIELDS order"""
+        self._maybe_reload()
+        questions, version = self._index.get((subject, class_level), ((), None))
+        return {
+            'subject': subject,
+            'class': class_level,
+            'version': version,
+            'fields': list(PACK_FIELDS),
+            'questions': [[question.get(field) for field in PACK_FIELDS] for question in questions]
+        }
+
+    def levels(self):
+        """(subject, class level) pairs that have questions on disk, sorted"""
+        self._maybe_reload()
+        return sorted(self._levels)
+
+    def iter_questions(self):
+        """Yield (subject, class level, question) once per question in the bank"""
+        self._maybe_reload()
+        for (subject, class_level), questions in self._levels.items():
+            for question in questions:
+                yield subject, class_level, question
+
+    def reload(self):
+        """Rebuild the index from disk if any quiz file has changed"""
+        with self._lock:
+            signature = self._scan_signature()
+            self._checked_at = time.monotonic()
+            if signature == self._signature:
+                return False
+
+            bank = {}
+            for name, _, _ in signature:
+                path = os.path.join(self.directory, name)
+                try:
+                    subject, levels = self._load_file(path)
+                except Exception as e:
+                    logger.error(f"Error loading quiz file {path}: {str(e)}")
+                    continue
+                subject_levels = bank.setdefault(subject, {})
+                for level, questions in levels.items():
+                    subject_levels.setdefault(int(level), []).extend(questions)
+
+            # Swap in the new index (questions and versions together) in one
+            # assignment so readers never see a half-built bank
+            self._index = self._with_versions(self._build_index(bank))
+            self._levels = {(subject, level): tuple(questions)
+                            for subject, levels in bank.items() for level, questions in levels.items()}
+            self._signature = signature
+            self.last_modified = max((mtime for _, mtime, _ in signature), default=None)
+            self.version += 1
+            total = sum(len(questions) for levels in bank.values() for questions in levels.values())
+            logger.info(f"Loaded quiz bank v{self.version}: {total} questions")
+            return True
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+    def _scan_signature(self):
+        if not os.path.isdir(self.directory):
+            return ()
+        extensions = JSON_EXTENSIONS + (YAML_EXTENSIONS if yaml else ())
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(extensions):
+                    stat = entry.stat()
+                    entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(entries))
+
+    def _load_file(self, path):
+        with open(path, encoding='utf-8') as f:
+            if path.lower().endswith(YAML_EXTENSIONS):
+                doc = yaml.safe_load(f)
+            else:
+                doc = json.load(f)
+        subject = doc.get('subject') or os.path.splitext(os.path.basename(path))[0]
+        return subject.lower(), doc.get('levels', {})
+
+    @staticmethod
+    def _build_index(bank):
+        """Map every reachable (subject, level) to its nearest level's questions"""
+        index = {}
+        for subject, levels in bank.items():
+            levels = {level: tuple(questions) for level, questions in levels.items() if questions}
+            if not levels:
+                continue
+            reach = max(abs(offset) for offset in FALLBACK_OFFSETS)
+            for class_level in range(min(levels) - reach, max(levels) + reach + 1):
+                for offset in FALLBACK_OFFSETS:
+                    if class_level + offset in levels:
+                        index[(subject, class_level)] = levels[class_level + offset]
+                        break
+        return index
+
+    @staticmethod
+    def _with_versions(index):
+        """Pair each entry with a content hash; levels sharing questions hash once"""
+        by_identity = {}
+        versioned = {}
+        for key, questions in index.items():
+            digest = by_identity.get(id(questions))
+            if digest is None:
+                payload = json.dumps(questions, sort_keys=True, ensure_ascii=False).encode('utf-8')
+                digest = by_identity[id(questions)] = hashlib.sha1(payload).hexdigest()[:16]
+            versioned[key] = (questions, digest)
+        return versioned
+
@@ -2,17 +2,48 @@
 """
 AI Study Buddy - Simple Launcher
 Run this to start your AI Study Buddy website!
+
+    python run.py            Development server with auto-reload, opens a browser
+    python run.py --serve    Production server (gunicorn, waitress or threaded Werkzeug)
+
+Production settings come from the environment:
+    ASTRALS_HOST, ASTRALS_PORT      Bind address (default 0.0.0.0:5000)
+    ASTRALS_WORKERS                 Worker processes (gunicorn only, default 1)
+    ASTRALS_THREADS                 Threads per worker (default 8)
+    ASTRALS_GRACEFUL_TIMEOUT        Seconds to finish in-flight requests on shutdown
+    ASTRALS_SECRET_KEY              Flask secret key
+    ASTRALS_PROFILE_TOKEN           Enables per-request profiling via the X-Astrals-Profile header
+    ASTRALS_IMPORT_ARCHIVES         Archives (globs, comma-separated) loaded into storage at startup
+    ASTRALS_MEMORY_SNAPSHOT         Archive the memory backend is saved to at shutdown and restored from (one worker only)
+    ASTRALS_GENERATION_BACKEND      'rules' (default) or 'http' with ASTRALS_GENERATION_URL (see generation.py)
+    ASTRALS_RATE_LIMITS             Per-endpoint rate limit overrides as JSON (see admission.py)
+    ASTRALS_MAX_ACTIVE_REQUESTS     Concurrent requests before new ones queue, then get 503 (0 disables)
 """
 
-import webbrowser
-import time
-import sys
+import _thread
+import argparse
+import math
 import os
+import signal
+import sys
+import threading
+import webbrowser
 
-def main():
+
+def server_settings():
+    return {
+        'host': os.environ.get('ASTRALS_HOST', '0.0.0.0'),
+        'port': int(os.environ.get('ASTRALS_PORT', 5000)),
+        'workers': int(os.environ.get('ASTRALS_WORKERS', 1)),
+        'threads': int(os.environ.get('ASTRALS_THREADS', 8)),
+        'graceful_timeout': float(os.environ.get('ASTRALS_GRACEFUL_TIMEOUT', 30)),
+    }
+
+
+def run_development():
     print("🤖 AI Study Buddy - Starting up...")
     print("=" * 50)
-    
+
     # Check if Flask is installed
     try:
         import flask
@@ -21,25 +52,145 @@ def main():
         print("❌ Flask is not installed!")
         print("Please run: pip install -r requirements.txt")
         return
-    
+
+    settings = server_settings()
+    url = f"http://localhost:{settings['port']}"
     print("🚀 Starting Flask server...")
-    print("📡 Server will be available at: http://localhost:5000")
-    print("🌐 Opening browser in 3 seconds...")
+    print(f"📡 Server will be available at: {url}")
     print("=" * 50)
-    
-    # Wait a moment then open browser
-    time.sleep(9)
-    webbrowser.open('http://localhost:5000')
-    
+
+    # Open the browser once the server is up, without delaying startup
+    if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        threading.Timer(1.0, webbrowser.open, args=(url,)).start()
+
     # Start Flask app
     try:
         from app import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        app.run(debug=True, host=settings['host'], port=settings['port'])
     except KeyboardInterrupt:
         print("\n👋 Shutting down AI Study Buddy...")
         print("Thank you for using AI Study Buddy!")
     except Exception as e:
         print(f"❌ Error starting application: {e}")
 
+
+def serve_gunicorn(settings):
+    from gunicorn.app.base import BaseApplication
+
+    class AstralsApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{settings['host']}:{settings['port']}")
+            self.cfg.set('workers', settings['workers'])
+            self.cfg.set('threads', settings['threads'])
+            # gunicorn takes whole seconds
+            self.cfg.set('graceful_timeout', math.ceil(settings['graceful_timeout']))
+            # Each worker imports the app itself so its background threads
+            # (history writer) are started after the fork
+            self.cfg.set('preload_app', False)
+            self.cfg.set('worker_exit', lambda server, worker: _shutdown())
+
+        def load(self):
+            from app import app
+            return app
+
+    AstralsApplication().run()
+
+
+def serve_waitress(settings):
+    from waitress import create_server
+    from app import app, in_flight
+
+    # Our own socket map, so the connections still open after draining can be closed
+    sockets = {}
+    server = create_server(app, map=sockets, host=settings['host'], port=settings['port'], threads=settings['threads'])
+    draining = threading.Event()
+
+    def drain():
+        # The loop keeps running meanwhile, sending the responses as they finish
+        in_flight.wait_idle(settings['graceful_timeout'])
+        _thread.interrupt_main()
+
+    def stop():
+        if draining.is_set():
+            # Drained, or a second signal: end server.run()
+            raise KeyboardInterrupt
+        draining.set()
+        threading.Thread(target=drain, name='waitress-drain', daemon=True).start()
+
+    _on_terminate(stop)
+    try:
+        server.run()
+    finally:
+        server.close()
+        for connection in list(sockets.values()):
+            connection.close()
+        _shutdown()
+
+
+def serve_werkzeug(settings):
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server(settings['host'], settings['port'], app, threaded=True)
+    # shutdown() blocks until serve_forever returns, so call it off the signal handler
+    _on_terminate(lambda: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    finally:
+        _shutdown()
+
+
+def _on_terminate(stop):
+    stopping = threading.Event()
+
+    def handler(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            print("\n👋 Shutting down AI Study Buddy...")
+        stop()
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+def _shutdown():
+    from app import shutdown_app
+    shutdown_app()
+
+
+def run_production():
+    settings = server_settings()
+    if settings['workers'] > 1 and os.environ.get('ASTRALS_STORAGE', 'memory') == 'memory':
+        print("⚠️  Several workers with ASTRALS_STORAGE=memory do not share state; use sqlite")
+
+    # Prefer gunicorn (multi-process) where it runs, then waitress, then Werkzeug
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+            print(f"🚀 Serving with gunicorn: {settings['workers']} workers × {settings['threads']} threads")
+            return serve_gunicorn(settings)
+        except ImportError:
+            pass
+    # The other servers run a single process whatever ASTRALS_WORKERS says
+    os.environ['ASTRALS_WORKERS'] = '1'
+    try:
+        import waitress  # noqa: F401
+        print(f"🚀 Serving with waitress: {settings['threads']} threads")
+        return serve_waitress(settings)
+    except ImportError:
+        pass
+    print("🚀 Serving with Werkzeug's threaded server (install waitress or gunicorn for production)")
+    serve_werkzeug(settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Start the Astrals Hub server')
+    parser.add_argument('--serve', action='store_true', help='run the production server')
+    args = parser.parse_args()
+
+    if args.serve:
+        run_production()
+    else:
+        run_development()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+"""
+Astrals Hub - Search
+In-memory inverted indexes with BM25 ranking and prefix matching over the
+knowledge base, the quiz bank and students' own chat history.
+
+Content is indexed once and rebuilt only when its version changes. Chat
+history is indexed per session on first search and caught up with the
+messages stored since, so a query only touches the postings of its terms.
+"""
+
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import OrderedDict
+
+TOKEN = re.compile(r'\w+')
+
+# BM25 parameters (the usual defaults)
+K1 = 1.2
+B = 0.75
+
+# Query words at least this long also match longer terms starting with them
+MIN_PREFIX_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 32
+# A prefix match counts for less than the exact word
+PREFIX_WEIGHT = 0.5
+
+SNIPPET_LENGTH = 160
+
+
+def tokenize(text):
+    return TOKEN.findall((text or '').lower())
+
+
+class InvertedIndex:
+    """BM25-ranked index of documents that can be added to incrementally"""
+
+    def __init__(self):
+        # term -> {doc id: term frequency}
+        self.postings = {}
+        # Sorted vocabulary, for prefix lookups by bisection
+        self.terms = []
+        self.documents = {}
+        self.lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, text, document):
+        """Index text under doc_id; document is what search results return"""
+        tokens = tokenize(text)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                bisect.insort(self.terms, term)
+            postings[doc_id] = frequency
+        self.documents[doc_id] = dict(document, text=text)
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def expand(self, word):
+        """(term, weight) pairs a query word matches: itself and, if long enough, its extensions"""
+        matches = [(word, 1.0)] if word in self.postings else []
+        if len(word) >= MIN_PREFIX_LENGTH:
+            position = bisect.bisect_right(self.terms, word)
+            for term in self.terms[position:position + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(word):
+                    break
+                matches.append((term, PREFIX_WEIGHT))
+        return matches
+
+    def score(self, words):
+        """{doc id: BM25 score} for every document matching at least one word"""
+        if not self.documents:
+            return {}
+        count = len(self.documents)
+        average_length = self.total_length / count or 1
+        scores = {}
+        for word in words:
+            # A word's best matching term per document, so 'grow' does not
+            # score 'grows', 'growth' and 'growing' three times over
+            best = {}
+            for term, weight in self.expand(word):
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self.lengths[doc_id] / average_length)
+                    value = weight * idf * frequency * (K1 + 1) / (frequency + norm)
+                    if value > best.get(doc_id, 0.0):
+                        best[doc_id] = value
+            for doc_id, value in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + value
+        return scores
+
+
+class SearchService:
+    """Content index plus per-session chat history indexes, bounded by LRU"""
+
+    def __init__(self, storage, content, max_sessions=1000):
+        """content() -> (version, iterable of (text, document)) for the shared documents"""
+        self.storage = storage
+        self._content = content
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._content_index = None
+        self._content_version = None
+        # session id -> (index, lock, [last indexed message id]), least recently searched first
+        self._sessions = OrderedDict()
+
+    def content_index(self):
+        """Index of the shared content, rebuilt when its version changes"""
+        version, documents = self._content()
+        with self._lock:
+            if self._content_index is None or version != self._content_version:
+                index = InvertedIndex()
+                for doc_id, (text, document) in enumerate(documents):
+                    index.add(doc_id, text, document)
+                self._content_index, self._content_version = index, version
+            return self._content_index
+
+    def history_index(self, session_id):
+        """(index, lock, [last indexed message id]) of a session's chat history"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = (InvertedIndex(), threading.Lock(), [0])
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return entry
+
+    def _catch_up(self, session_id, index, last_id):
+        """Index the messages stored since the last search of this session"""
+        for message in self.storage.get_messages_since(session_id, last_id[0]):
+            index.add(message['id'], f"{message.get('user_message', '')}\n{message.get('ai_response', '')}", {
+                'kind': 'chat',
+                'message_id': message['id'],
+                'subject': message.get('subject'),
+                'timestamp': message.get('timestamp'),
+                'title': message.get('user_message', '')
+            })
+            last_id[0] = max(last_id[0], message['id'])
+
+    def forget(self, session_id):
+        """Drop a session's history index, e.g. after its history was cleared"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def search(self, query, session_id=None, limit=10):
+        """Best matches for query, highest BM25 score first.
+
+        Chat history is only searched when session_id is given, and only
+        that session's own. Scores from the content and history indexes
+        are ranked together.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        index = self.content_index()
+        candidates = self._candidates(index, index.score(words))
+        if session_id:
+            index, lock, last_id = self.history_index(session_id)
+            # History indexes grow between searches, so score under their lock
+            with lock:
+                self._catch_up(session_id, index, last_id)
+                candidates += self._candidates(index, index.score(words))
+
+        results = []
+        for score, document in heapq.nlargest(limit, candidates, key=lambda candidate: candidate[0]):
+            result = {key: value for key, value in document.items() if key != 'text'}
+            result['score'] = round(score, 4)
+            result['snippet'] = snippet(document['text'], words)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _candidates(index, scores):
+        return [(score, index.documents[doc_id]) for doc_id, score in scores.items()]
+
+
+def snippet(text, words, length=SNIPPET_LENGTH):
+    """About `length` characters of text around the first query match"""
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(word) for word in words) if position >= 0]
+    start = max(0, min(positions, default=0) - length // 4)
+    if start:
+        # Start on a word boundary
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    excerpt = text[start:start + length].strip()
+    return ('…' if start else '') + excerpt + ('…' if start + length < len(text) else '')
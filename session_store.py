@@ -0,0 +1,269 @@
+"""
+Astrals Hub - Chat Session Store
+Bounded in-memory chat history with LRU/TTL eviction, per-session
+message caps and optional spill-to-disk of evicted messages.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class ChatMessage:
+    """Compact chat record; timestamps are epoch seconds"""
+
+    __slots__ = ('id', 'timestamp', 'subject', 'user_message', 'ai_response')
+
+    def __init__(self, timestamp, subject, user_message, ai_response, id=None):
+        self.id = id
+        self.timestamp = timestamp
+        self.subject = subject
+        self.user_message = user_message
+        self.ai_response = ai_response
+
+    @classmethod
+    def from_dict(cls, data):
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = int(datetime.fromisoformat(timestamp).timestamp())
+        elif timestamp is None:
+            timestamp = int(time.time())
+        return cls(int(timestamp), data.get('subject', ''), data.get('user_message', ''), data.get('ai_response', ''), data.get('id'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_message': self.user_message,
+            'ai_response': self.ai_response,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'subject': self.subject
+        }
+
+
+class _Session:
+    __slots__ = ('messages', 'last_access')
+
+    def __init__(self, max_messages, now):
+        self.messages = deque(maxlen=max_messages)
+        self.last_access = now
+
+
+class SessionStore:
+    """LRU/TTL-evicting map of session_id -> recent chat messages"""
+
+    def __init__(self, max_sessions=10000, max_messages=200, ttl=24 * 3600, spill_dir=None, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Ordered least- to most-recently used
+        self._sessions = OrderedDict()
+        self._message_count = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.trimmed_messages = 0
+        self.spilled_messages = 0
+        # Message ids increase monotonically per store and, being seeded from
+        # the clock, across restarts too, so they can serve as sync cursors
+        self._next_id = int(time.time() * 1000)
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def append(self, session_id, message):
+        """Add a message (dict or ChatMessage) to a session; returns its id"""
+        if not isinstance(message, ChatMessage):
+            message = ChatMessage.from_dict(message)
+        spill = []
+        with self._lock:
+            self._next_id += 1
+            message.id = self._next_id
+            now = self._clock()
+            self._expire(now, spill)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_messages, now)
+                while len(self._sessions) > self.max_sessions:
+                    self._evict_oldest(spill)
+                    self.evicted_lru += 1
+            else:
+                session.last_access = now
+                self._sessions.move_to_end(session_id)
+
+            if len(session.messages) == session.messages.maxlen:
+                spill.append((session_id, [session.messages[0]]))
+                self.trimmed_messages += 1
+                self._message_count -= 1
+            session.messages.append(message)
+            self._message_count += 1
+        self._spill(spill)
+        return message.id
+
+    def get(self, session_id):
+        """Full history as dicts, including any spilled messages"""
+        spill = []
+        with self._lock:
+            session = self._touch(session_id, spill)
+            messages = list(session.messages) if session else []
+        self._spill(spill)
+        return self._read_spilled(session_id) + [message.to_dict() for message in messages]
+
+    def since(self, session_id, message_id, limit=None):
+        """Messages with an id greater than message_id, oldest first (the first `limit` of them)"""
+        spill = []
+        with self._lock:
+            session = self._touch(session_id, spill)
+            newer = []
+            if session:
+                for message in reversed(session.messages):
+                    if message.id <= message_id:
+                        break
+                    newer.append(message)
+                complete = len(newer) < len(session.messages)
+            else:
+                complete = False
+        self._spill(spill)
+        # Only go to the spill file when the delta reaches past memory
+        older = [] if complete else [m for m in self._read_spilled(session_id) if (m.get('id') or 0) > message_id]
+        newer.reverse()
+        if limit is not None:
+            older = older[:limit]
+            newer = newer[:limit - len(older)]
+        return older + [message.to_dict() for message in newer]
+
+    def before(self, session_id, message_id=None, limit=100):
+        """The `limit` newest messages with an id below message_id (any if None), oldest first"""
+        spill = []
+        with self._lock:
+            session = self._touch(session_id, spill)
+            page = []
+            if session:
+                for message in reversed(session.messages):
+                    if message_id is not None and message.id >= message_id:
+                        continue
+                    if len(page) == limit:
+                        break
+                    page.append(message)
+        self._spill(spill)
+        page = [message.to_dict() for message in reversed(page)]
+        if len(page) < limit:
+            spilled = [m for m in self._read_spilled(session_id) if message_id is None or (m.get('id') or 0) < message_id]
+            page = spilled[max(0, len(spilled) - (limit - len(page))):] + page
+        return page
+
+    def count(self, session_id):
+        """Number of messages held in memory for a session"""
+        spill = []
+        with self._lock:
+            session = self._touch(session_id, spill)
+            count = len(session.messages) if session else 0
+        self._spill(spill)
+        return count
+
+    def clear(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session:
+                self._message_count -= len(session.messages)
+        path = self._spill_path(session_id)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def spill_all(self):
+        """Evict every session to the spill directory (e.g. at shutdown)"""
+        if not self.spill_dir:
+            return
+        spill = []
+        with self._lock:
+            while self._sessions:
+                self._evict_oldest(spill)
+        self._spill(spill)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'messages': self._message_count,
+                'max_sessions': self.max_sessions,
+                'max_messages': self.max_messages,
+                'evicted_lru': self.evicted_lru,
+                'evicted_ttl': self.evicted_ttl,
+                'trimmed_messages': self.trimmed_messages,
+                'spilled_messages': self.spilled_messages
+            }
+
+    def session_ids(self):
+        """Ids of the sessions currently held in memory"""
+        with self._lock:
+            return list(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _touch(self, session_id, spill):
+        now = self._clock()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_access > self.ttl:
+            self._sessions.pop(session_id)
+            self._drop(session_id, session, spill)
+            self.evicted_ttl += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self, now, spill):
+        # The LRU end holds the least recently used sessions, so expired
+        # sessions are always found there first
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access <= self.ttl:
+                break
+            self._evict_oldest(spill)
+            self.evicted_ttl += 1
+
+    def _evict_oldest(self, spill):
+        session_id, session = self._sessions.popitem(last=False)
+        self._drop(session_id, session, spill)
+
+    def _drop(self, session_id, session, spill):
+        self._message_count -= len(session.messages)
+        if session.messages:
+            spill.append((session_id, list(session.messages)))
+
+    def _spill_path(self, session_id):
+        if not self.spill_dir:
+            return None
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f'{digest}.jsonl')
+
+    def _spill(self, batches):
+        """Append evicted messages to their session's spill file"""
+        if not self.spill_dir or not batches:
+            return
+        for session_id, messages in batches:
+            try:
+                with open(self._spill_path(session_id), 'a', encoding='utf-8') as f:
+                    for message in messages:
+                        f.write(json.dumps(message.to_dict()) + '\n')
+                self.spilled_messages += len(messages)
+            except OSError as e:
+                logger.error(f"Error spilling chat history for {session_id}: {str(e)}")
+
+    def _read_spilled(self, session_id):
+        path = self._spill_path(session_id)
+        if not path or not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
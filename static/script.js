@@ -73,6 +73,8 @@ document.addEventListener('DOMContentLoaded', function() {
     setupEventListeners();
     loadUserProfile();
     initializeGamification();
+    initializeSync();
+    registerServiceWorker();
     console.log('✅ Astrals Hub initialization complete!');
 });
 
@@ -196,9 +198,14 @@ async function sendMessage() {
     showLoading();
     
     try {
-        // Get AI response from backend
-        const aiResponse = await generateAIResponse(message);
-        addAIMessage(aiResponse);
+        try {
+            // Stream the AI response so it starts rendering immediately
+            await streamAIResponse(message);
+        } catch (streamError) {
+            console.error('Streaming unavailable, falling back:', streamError);
+            const aiResponse = await generateAIResponse(message);
+            addAIMessage(aiResponse);
+        }
         
         // Update user profile stats
         updateUserStats();
@@ -266,6 +273,94 @@ function createMessageElement(type, message) {
     return messageDiv;
 }
 
+function getUserLocale() {
+    // Chosen language if set, else the browser's; the server falls back to English
+    return localStorage.getItem('astralsHub_locale') || navigator.language || 'en';
+}
+
+async function streamAIResponse(userMessage) {
+    const chatMessages = document.getElementById('chatMessages');
+    if (!chatMessages) {
+        throw new Error('Chat messages container not found');
+    }
+    
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            message: userMessage,
+            session_id: getSessionId(),
+            subject: currentSubject,
+            user_level: userProfile.level,
+            locale: getUserLocale()
+        })
+    });
+    
+    if (!response.ok || !response.body) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    const messageElement = createMessageElement('ai', '');
+    const content = messageElement.querySelector('.message-content p');
+    chatMessages.appendChild(messageElement);
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseSSEEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                
+                if (event.type === 'chunk') {
+                    hideLoading();
+                    text += event.data.text;
+                    content.innerHTML = text;
+                    scrollToBottom();
+                } else if (event.type === 'done') {
+                    rememberServerMessage(event.data.message_id);
+                } else if (event.type === 'error') {
+                    throw new Error(event.data.error);
+                }
+            }
+        }
+    } catch (error) {
+        messageElement.remove();
+        throw error;
+    }
+    
+    // Save to chat history
+    chatHistory.push({
+        type: 'ai',
+        message: text,
+        timestamp: new Date().toISOString()
+    });
+    return text;
+}
+
+function parseSSEEvent(raw) {
+    const event = { type: 'message', data: null };
+    raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event.type = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            event.data = JSON.parse(line.slice(5).trim());
+        }
+    });
+    return event;
+}
+
 async function generateAIResponse(userMessage) {
     try {
         const response = await fetch('/api/chat', {
@@ -277,21 +372,30 @@ async function generateAIResponse(userMessage) {
                 message: userMessage,
                 session_id: getSessionId(),
                 subject: currentSubject,
-                user_level: userProfile.level
+                user_level: userProfile.level,
+                locale: getUserLocale()
             })
         });
         
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            const error = new Error(`HTTP error! status: ${response.status}`);
+            // Offline: the service worker keeps the message and sends it once we reconnect
+            error.queued = response.headers.get('X-Astrals-Queued') === '1';
+            throw error;
         }
         
         const data = await response.json();
+        rememberServerMessage(data.message_id);
         return data.response;
         
     } catch (error) {
         console.error('Error getting AI response:', error);
         // Fallback to local responses if backend is not available
-        return getFallbackResponse(userMessage);
+        const fallback = getFallbackResponse(userMessage);
+        if (!error.queued) {
+            queueSyncMessage(userMessage, fallback);
+        }
+        return fallback;
     }
 }
 
@@ -532,6 +636,9 @@ function initializeGamification() {
 }
 
 function awardXP(amount, reason) {
+    // Queue for the next server sync (before totals change, see loadSyncQueue)
+    queueXPEvent(amount, reason);
+    
     userProfile.xp += amount;
     userProfile.totalXP += amount;
     
@@ -633,495 +740,70 @@ function checkDailyStreak() {
 }
 
 // Quiz System
-function startQuiz(subject) {
+async function startQuiz(subject) {
     currentQuiz.subject = subject;
-    currentQuiz.questions = generateQuizQuestions(subject, currentClass);
     currentQuiz.currentQuestion = 0;
     currentQuiz.score = 0;
     currentQuiz.streak = 0;
     
+    showLoading();
+    try {
+        currentQuiz.questions = await loadQuizPack(subject, currentClass);
+    } catch (error) {
+        console.error('Error loading quiz:', error);
+        currentQuiz.questions = [];
+        showNotification('This quiz is not available right now. Please try again when you are online.', 'error');
+        return;
+    } finally {
+        hideLoading();
+    }
+    
     showQuizQuestion();
 }
 
-function generateQuizQuestions(subject, classLevel) {
-    // Sample quiz questions for different subjects and classes
-    const questions = {
-        'Mathematics': {
-            6: [
-                {
-                    question: `If a farmer has 24 mangoes and gives away 8, how many are left?`,
-                    options: ['16', '32', '18', '14'],
-                    correct: 0,
-                    xp: 10,
-                    explanation: '24 - 8 = 16 mangoes left'
-                },
-                {
-                    question: `What is the perimeter of a square field with each side 12 meters?`,
-                    options: ['48 meters', '24 meters', '36 meters', '144 meters'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: 'Perimeter = 4 × side = 4 × 12 = 48 meters'
-                },
-                {
-                    question: `If 1 kg of rice costs ₹50, how much will 3 kg cost?`,
-                    options: ['₹150', '₹100', '₹200', '₹120'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: '3 × ₹50 = ₹150'
-                }
-            ],
-            7: [
-                {
-                    question: `What is 15% of 200?`,
-                    options: ['30', '25', '35', '40'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: '15% of 200 = (15/100) × 200 = 30'
-                },
-                {
-                    question: `If a train travels 120 km in 2 hours, what is its speed?`,
-                    options: ['60 km/h', '240 km/h', '40 km/h', '80 km/h'],
-                    correct: 0,
-                    xp: 18,
-                    explanation: 'Speed = Distance/Time = 120/2 = 60 km/h'
-                }
-            ],
-            8: [
-                {
-                    question: `Solve: 2x + 5 = 13`,
-                    options: ['x = 4', 'x = 3', 'x = 5', 'x = 6'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: '2x = 13 - 5 = 8, so x = 4'
-                },
-                {
-                    question: `What is the area of a circle with radius 7 cm? (Use π = 22/7)`,
-                    options: ['154 cm²', '44 cm²', '88 cm²', '308 cm²'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Area = πr² = (22/7) × 7² = 154 cm²'
-                }
-            ],
-            9: [
-                {
-                    question: `What is the value of x² - 4 when x = 3?`,
-                    options: ['5', '7', '9', '11'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: 'x² - 4 = 3² - 4 = 9 - 4 = 5'
-                },
-                {
-                    question: `In a right triangle, if one angle is 30°, what is the other acute angle?`,
-                    options: ['60°', '45°', '90°', '120°'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Sum of angles = 180°, so 90° + 30° + x = 180°, x = 60°'
-                }
-            ],
-            10: [
-                {
-                    question: `What is the discriminant of the quadratic equation x² - 5x + 6 = 0?`,
-                    options: ['1', '-1', '25', '49'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'Discriminant = b² - 4ac = 25 - 24 = 1'
-                },
-                {
-                    question: `What is the probability of getting a head when tossing a coin?`,
-                    options: ['1/2', '1/4', '1/3', '2/3'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'There are 2 outcomes, 1 favorable, so P = 1/2'
-                }
-            ],
-            11: [
-                {
-                    question: `What is the derivative of x³?`,
-                    options: ['3x²', 'x²', '3x', 'x³/3'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'd/dx(x³) = 3x²'
-                },
-                {
-                    question: `What is the value of sin(30°)?`,
-                    options: ['1/2', '√3/2', '1', '0'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'sin(30°) = 1/2'
-                }
-            ],
-            12: [
-                {
-                    question: `What is the integral of 2x?`,
-                    options: ['x² + C', '2x² + C', 'x + C', '2 + C'],
-                    correct: 0,
-                    xp: 40,
-                    explanation: '∫2x dx = 2(x²/2) + C = x² + C'
-                },
-                {
-                    question: `What is the limit of (x² - 1)/(x - 1) as x approaches 1?`,
-                    options: ['2', '0', '1', '∞'],
-                    correct: 0,
-                    xp: 45,
-                    explanation: 'Factor: (x-1)(x+1)/(x-1) = x+1, so limit = 2'
-                }
-            ]
-        },
-        'Science': {
-            6: [
-                {
-                    question: `What gas do plants absorb from the atmosphere during photosynthesis?`,
-                    options: ['Carbon dioxide', 'Oxygen', 'Nitrogen', 'Hydrogen'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: 'Plants absorb CO₂ and release O₂ during photosynthesis'
-                },
-                {
-                    question: `Which part of the plant absorbs water from the soil?`,
-                    options: ['Roots', 'Leaves', 'Stem', 'Flowers'],
-                    correct: 0,
-                    xp: 10,
-                    explanation: 'Roots absorb water and nutrients from the soil'
-                }
-            ],
-            7: [
-                {
-                    question: `What is the chemical symbol for gold?`,
-                    options: ['Au', 'Ag', 'Go', 'Gd'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: 'Au comes from the Latin word "aurum" meaning gold'
-                },
-                {
-                    question: `Which force keeps planets in orbit around the Sun?`,
-                    options: ['Gravitational force', 'Magnetic force', 'Electric force', 'Frictional force'],
-                    correct: 0,
-                    xp: 18,
-                    explanation: 'Gravity keeps planets in their orbits'
-                }
-            ],
-            8: [
-                {
-                    question: `What is the pH of pure water?`,
-                    options: ['7', '0', '14', '1'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: 'Pure water is neutral with pH = 7'
-                },
-                {
-                    question: `Which organelle is known as the powerhouse of the cell?`,
-                    options: ['Mitochondria', 'Nucleus', 'Ribosome', 'Chloroplast'],
-                    correct: 0,
-                    xp: 22,
-                    explanation: 'Mitochondria produce energy (ATP) for the cell'
-                }
-            ],
-            9: [
-                {
-                    question: `What is the speed of light in vacuum?`,
-                    options: ['3 × 10⁸ m/s', '3 × 10⁶ m/s', '3 × 10¹⁰ m/s', '3 × 10⁴ m/s'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Speed of light = 299,792,458 m/s ≈ 3 × 10⁸ m/s'
-                },
-                {
-                    question: `What is the chemical formula for methane?`,
-                    options: ['CH₄', 'C₂H₆', 'CO₂', 'H₂O'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: 'Methane has one carbon and four hydrogen atoms'
-                }
-            ],
-            10: [
-                {
-                    question: `What is the unit of electric current?`,
-                    options: ['Ampere', 'Volt', 'Watt', 'Ohm'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Ampere (A) is the SI unit of electric current'
-                },
-                {
-                    question: `Which blood group is known as the universal donor?`,
-                    options: ['O negative', 'A positive', 'B positive', 'AB positive'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'O negative can be donated to any blood type'
-                }
-            ],
-            11: [
-                {
-                    question: `What is the first law of thermodynamics?`,
-                    options: ['Energy cannot be created or destroyed', 'Entropy always increases', 'Heat flows from hot to cold', 'Pressure and volume are inversely related'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'First law states conservation of energy'
-                },
-                {
-                    question: `What is the molecular formula for glucose?`,
-                    options: ['C₆H₁₂O₆', 'C₆H₁₀O₅', 'C₅H₁₀O₅', 'C₆H₁₄O₆'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'Glucose has 6 carbons, 12 hydrogens, and 6 oxygens'
-                }
-            ],
-            12: [
-                {
-                    question: `What is the uncertainty principle in quantum mechanics?`,
-                    options: ['Position and momentum cannot be precisely measured simultaneously', 'Energy and time are inversely related', 'Wave and particle nature are complementary', 'All of the above'],
-                    correct: 3,
-                    xp: 45,
-                    explanation: 'Heisenberg uncertainty principle has multiple formulations'
-                },
-                {
-                    question: `What is the half-life of Carbon-14?`,
-                    options: ['5730 years', '573 years', '57300 years', '573000 years'],
-                    correct: 0,
-                    xp: 40,
-                    explanation: 'C-14 has a half-life of approximately 5730 years'
-                }
-            ]
-        },
-        'English': {
-            6: [
-                {
-                    question: `What is the past tense of "go"?`,
-                    options: ['went', 'goed', 'gone', 'going'],
-                    correct: 0,
-                    xp: 10,
-                    explanation: 'The past tense of "go" is "went"'
-                },
-                {
-                    question: `Which word is an adjective in: "The beautiful sunset"?`,
-                    options: ['beautiful', 'sunset', 'the', 'All of them'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: '"Beautiful" describes the noun "sunset"'
-                }
-            ],
-            7: [
-                {
-                    question: `What is a synonym for "happy"?`,
-                    options: ['joyful', 'sad', 'angry', 'tired'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: 'Joyful means the same as happy'
-                },
-                {
-                    question: `Which sentence is in passive voice?`,
-                    options: ['The book was read by me', 'I read the book', 'Reading the book', 'I will read the book'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: 'Passive voice: subject receives the action'
-                }
-            ],
-            8: [
-                {
-                    question: `What is the literary device in: "The stars danced playfully"?`,
-                    options: ['Personification', 'Metaphor', 'Simile', 'Alliteration'],
-                    correct: 0,
-                    xp: 18,
-                    explanation: 'Giving human qualities to non-human things'
-                },
-                {
-                    question: `What is the plural of "crisis"?`,
-                    options: ['crises', 'crisises', 'crisis', 'crisi'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: 'Words ending in -is become -es in plural'
-                }
-            ],
-            9: [
-                {
-                    question: `What is the theme of a story?`,
-                    options: ['The main message or lesson', 'The setting', 'The characters', 'The plot'],
-                    correct: 0,
-                    xp: 22,
-                    explanation: 'Theme is the central message or lesson'
-                },
-                {
-                    question: `Which is a compound sentence?`,
-                    options: ['I like tea, and she likes coffee', 'I like tea', 'Liking tea', 'Tea is good'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Compound sentence has two independent clauses joined by conjunction'
-                }
-            ],
-            10: [
-                {
-                    question: `What is the tone of: "I can\'t believe you did that!"?`,
-                    options: ['Shocked/Disappointed', 'Happy', 'Calm', 'Excited'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'The exclamation and "can\'t believe" show shock'
-                },
-                {
-                    question: `What is the purpose of a thesis statement?`,
-                    options: ['To state the main argument', 'To provide evidence', 'To conclude', 'To introduce characters'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'Thesis statement presents the main argument'
-                }
-            ],
-            11: [
-                {
-                    question: `What is the difference between "affect" and "effect"?`,
-                    options: ['Affect is a verb, effect is a noun', 'Effect is a verb, affect is a noun', 'They are the same', 'They are opposites'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'Affect (verb) = to influence; Effect (noun) = result'
-                },
-                {
-                    question: `What is the purpose of a counterargument?`,
-                    options: ['To address opposing views', 'To support your argument', 'To conclude', 'To introduce the topic'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'Counterarguments address opposing viewpoints'
-                }
-            ],
-            12: [
-                {
-                    question: `What is the purpose of rhetorical questions?`,
-                    options: ['To engage the audience', 'To provide answers', 'To confuse readers', 'To end arguments'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'Rhetorical questions engage and make readers think'
-                },
-                {
-                    question: `What is the difference between denotation and connotation?`,
-                    options: ['Denotation is literal meaning, connotation is implied meaning', 'Connotation is literal, denotation is implied', 'They are the same', 'They are opposites'],
-                    correct: 0,
-                    xp: 40,
-                    explanation: 'Denotation = dictionary meaning; Connotation = emotional/implied meaning'
-                }
-            ]
-        },
-        'Social Studies': {
-            6: [
-                {
-                    question: `What is the capital of India?`,
-                    options: ['New Delhi', 'Mumbai', 'Kolkata', 'Chennai'],
-                    correct: 0,
-                    xp: 10,
-                    explanation: 'New Delhi is the capital of India'
-                },
-                {
-                    question: `Which is the largest state in India by area?`,
-                    options: ['Rajasthan', 'Madhya Pradesh', 'Maharashtra', 'Uttar Pradesh'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: 'Rajasthan is the largest state by area'
-                }
-            ],
-            7: [
-                {
-                    question: `Who was the first Prime Minister of India?`,
-                    options: ['Jawaharlal Nehru', 'Mahatma Gandhi', 'Sardar Patel', 'Dr. Rajendra Prasad'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: 'Jawaharlal Nehru was the first PM of independent India'
-                },
-                {
-                    question: `What is the currency of Japan?`,
-                    options: ['Yen', 'Dollar', 'Euro', 'Pound'],
-                    correct: 0,
-                    xp: 12,
-                    explanation: 'Japanese Yen is the currency of Japan'
-                }
-            ],
-            8: [
-                {
-                    question: `Which battle marked the beginning of British rule in India?`,
-                    options: ['Battle of Plassey', 'Battle of Panipat', 'Battle of Haldighati', 'Battle of Buxar'],
-                    correct: 0,
-                    xp: 18,
-                    explanation: 'Battle of Plassey (1757) established British dominance'
-                },
-                {
-                    question: `What is the largest ocean on Earth?`,
-                    options: ['Pacific Ocean', 'Atlantic Ocean', 'Indian Ocean', 'Arctic Ocean'],
-                    correct: 0,
-                    xp: 15,
-                    explanation: 'Pacific Ocean covers about 1/3 of Earth'
-                }
-            ],
-            9: [
-                {
-                    question: `What is the significance of the year 1947 in Indian history?`,
-                    options: ['India gained independence', 'India became a republic', 'First general election', 'Constitution was adopted'],
-                    correct: 0,
-                    xp: 20,
-                    explanation: 'India gained independence from British rule on August 15, 1947'
-                },
-                {
-                    question: `What is the main function of the Parliament?`,
-                    options: ['To make laws', 'To enforce laws', 'To interpret laws', 'To execute laws'],
-                    correct: 0,
-                    xp: 22,
-                    explanation: 'Parliament is the legislative body that makes laws'
-                }
-            ],
-            10: [
-                {
-                    question: `What is the difference between weather and climate?`,
-                    options: ['Weather is short-term, climate is long-term', 'Climate is short-term, weather is long-term', 'They are the same', 'Weather is global, climate is local'],
-                    correct: 0,
-                    xp: 25,
-                    explanation: 'Weather = daily conditions; Climate = average over time'
-                },
-                {
-                    question: `What is the main cause of inflation?`,
-                    options: ['Increase in money supply', 'Decrease in production', 'Increase in taxes', 'All of the above'],
-                    correct: 3,
-                    xp: 30,
-                    explanation: 'Inflation can be caused by multiple factors'
-                }
-            ],
-            11: [
-                {
-                    question: `What is the concept of federalism?`,
-                    options: ['Division of power between central and state governments', 'Concentration of power in central government', 'Power only with state governments', 'No government power'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'Federalism divides power between different levels of government'
-                },
-                {
-                    question: `What is the significance of the Green Revolution?`,
-                    options: ['Increased agricultural production', 'Reduced pollution', 'Increased industrialization', 'Reduced population'],
-                    correct: 0,
-                    xp: 30,
-                    explanation: 'Green Revolution increased food production through new techniques'
-                }
-            ],
-            12: [
-                {
-                    question: `What is the concept of sustainable development?`,
-                    options: ['Development that meets present needs without compromising future', 'Fast economic growth', 'Maximum resource extraction', 'Urban development only'],
-                    correct: 0,
-                    xp: 40,
-                    explanation: 'Sustainable development balances present and future needs'
-                },
-                {
-                    question: `What is the role of the judiciary in democracy?`,
-                    options: ['To interpret and protect the constitution', 'To make laws', 'To execute laws', 'To collect taxes'],
-                    correct: 0,
-                    xp: 35,
-                    explanation: 'Judiciary interprets laws and protects constitutional rights'
-                }
-            ]
-        }
-    };
+// Quiz packs come from the server and are kept in the Cache API, so a quiz
+// that has been played once also works offline
+const QUIZ_PACK_CACHE = 'astrals-quiz-packs-v1';
+
+async function loadQuizPack(subject, classLevel) {
+    const slug = subject.toLowerCase().replace(/\s+/g, '_');
+    const locale = getUserLocale().split('-')[0].toLowerCase();
+    // English packs keep the plain URL the service worker precaches
+    const url = `/api/quiz-pack/${slug}?class=${classLevel}` + (locale === 'en' ? '' : `&locale=${encodeURIComponent(locale)}`);
     
-    // Return questions for the specific subject and class, or default to class 6 if not found
-    const subjectQuestions = questions[subject];
-    if (subjectQuestions && subjectQuestions[classLevel]) {
-        return subjectQuestions[classLevel];
-    } else if (subjectQuestions && subjectQuestions[6]) {
-        return subjectQuestions[6]; // Fallback to class 6
-    } else {
-        return []; // No questions available
+    try {
+        // Revalidates with the pack's ETag, so an unchanged pack costs a 304
+        const response = await fetch(url, { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        if ('caches' in window) {
+            const cache = await caches.open(QUIZ_PACK_CACHE);
+            await cache.put(url, response.clone());
+        }
+        return expandQuizPack(await response.json());
+    } catch (error) {
+        if ('caches' in window) {
+            const cached = await (await caches.open(QUIZ_PACK_CACHE)).match(url);
+            if (cached) {
+                return expandQuizPack(await cached.json());
+            }
+        }
+        throw error;
     }
 }
 
+function expandQuizPack(pack) {
+    // Packs store one row per question in `fields` order
+    return pack.questions.map(row => {
+        const question = {};
+        pack.fields.forEach((field, index) => {
+            question[field] = row[index];
+        });
+        return question;
+    });
+}
+
 function showQuizQuestion() {
     const questionContainer = document.getElementById('quizQuestion');
     const optionsContainer = document.getElementById('quizOptions');
@@ -1272,6 +954,34 @@ function endQuiz() {
     updateMasteryStats();
     updateAchievementTimeline();
     saveUserProfile();
+    reportQuizCompleted(currentQuiz.subject, score, total);
+}
+
+async function reportQuizCompleted(subject, score, total) {
+    // Achievements are awarded server-side; offline quizzes simply don't count towards them
+    try {
+        const response = await fetch('/api/gamification/event', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                session_id: getSessionId(),
+                type: 'quiz_completed',
+                subject: subject,
+                score: score,
+                total: total
+            })
+        });
+        if (!response.ok) return;
+        const result = await response.json();
+        result.earned.forEach(rule => {
+            showNotification(`🏆 ${rule.kind === 'badge' ? 'Badge' : 'Achievement'} unlocked: ${rule.title}!`, 'perfect');
+        });
+        if (result.earned.length > 0) {
+            updateAchievementTimeline();
+        }
+    } catch (error) {
+        console.log('Could not report quiz completion:', error);
+    }
 }
 
 function updateQuizStats() {
@@ -1305,8 +1015,22 @@ function generateSampleLeaderboard() {
     }));
 }
 
-function showLeaderboard(period) {
-    const data = leaderboardData[period];
+async function showLeaderboard(period) {
+    let data = leaderboardData[period === 'all-time' ? 'allTime' : period] || [];
+    
+    // Prefer real rankings from the server; keep the sample board when there are none yet
+    try {
+        const response = await fetch(`/api/leaderboard/${period}?session_id=${encodeURIComponent(getSessionId())}`);
+        if (response.ok) {
+            const result = await response.json();
+            if (result.leaderboard.length) {
+                data = result.leaderboard.map(player => ({ ...player, score: player.xp }));
+            }
+        }
+    } catch (error) {
+        console.error('Error loading leaderboard:', error);
+    }
+    
     const leaderboardList = document.querySelector('.leaderboard-list');
     
     // Update active tab
@@ -1471,6 +1195,7 @@ function registerStudent() {
     // Mark as registered
     localStorage.setItem('astralsHub_registered', 'true');
     localStorage.setItem('astralsHub_profile', JSON.stringify(userProfile));
+    markProfileDirty();
     
     // Close modal and show welcome message
     closeLoginModal();
@@ -1567,10 +1292,45 @@ function updateStreakCalendar() {
     }
 }
 
-function updateAchievementTimeline() {
+async function updateAchievementTimeline() {
     const timeline = document.querySelector('.achievement-timeline');
     if (!timeline) return;
     
+    // Local milestones first, replaced by the server's rules once they arrive
+    renderAchievementTimeline(timeline, localAchievements());
+    try {
+        const response = await fetch(`/api/achievements/${encodeURIComponent(getSessionId())}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        renderAchievementTimeline(timeline, serverAchievements(data.achievements));
+    } catch (error) {
+        console.log('Using local achievements:', error);
+    }
+}
+
+const UPCOMING_ACHIEVEMENTS = 3;
+
+function serverAchievements(rules) {
+    const earned = rules.filter(rule => rule.earned)
+        .sort((a, b) => b.earned_at.localeCompare(a.earned_at));
+    // Closest goals first
+    const upcoming = rules.filter(rule => !rule.earned)
+        .sort((a, b) => (b.progress / b.threshold) - (a.progress / a.threshold))
+        .slice(0, UPCOMING_ACHIEVEMENTS);
+    return earned.map(rule => ({
+        title: rule.title,
+        description: rule.description,
+        date: new Date(rule.earned_at).toLocaleDateString(),
+        completed: true
+    })).concat(upcoming.map(rule => ({
+        title: rule.title,
+        description: rule.description,
+        date: `${rule.progress} / ${rule.threshold}`,
+        completed: false
+    })));
+}
+
+function localAchievements() {
     // Add achievements based on user progress
     const achievements = [];
     
@@ -1621,7 +1381,10 @@ function updateAchievementTimeline() {
         });
     }
     
-    // Update timeline HTML
+    return achievements;
+}
+
+function renderAchievementTimeline(timeline, achievements) {
     timeline.innerHTML = achievements.map(achievement => `
         <div class="timeline-item">
             <div class="timeline-marker ${achievement.completed ? 'completed' : ''}"></div>
@@ -1643,9 +1406,260 @@ function showProgress() {
     initializeProgressTracking();
 }
 
+// Offline Sync
+// Changes made while offline (or never sent) are queued in localStorage and
+// uploaded to /api/sync in one batch; the server answers with its own delta.
+const SYNC_QUEUE_KEY = 'astralsHub_syncQueue';
+const SYNC_BATCH_SIZE = 200;
+const SYNC_INTERVAL = 60000;
+const HISTORY_PAGE_SIZE = 100;
+let syncInFlight = false;
+
+function newOperationId() {
+    return Date.now().toString(36) + '_' + Math.random().toString(36).substr(2, 9);
+}
+
+function loadSyncQueue() {
+    const saved = localStorage.getItem(SYNC_QUEUE_KEY);
+    if (saved) {
+        return JSON.parse(saved);
+    }
+    
+    // First sync on this device: carry over XP earned before syncing existed
+    const queue = { cursor: 0, messages: [], xpEvents: [], knownMessageIds: [], profileVersion: 0, profileDirty: true };
+    if (userProfile.totalXP > 0) {
+        queue.xpEvents.push({ id: newOperationId(), xp: userProfile.totalXP, reason: 'Progress before sync', timestamp: new Date().toISOString() });
+    }
+    return queue;
+}
+
+function saveSyncQueue(queue) {
+    localStorage.setItem(SYNC_QUEUE_KEY, JSON.stringify(queue));
+}
+
+function queueSyncMessage(userMessage, aiResponse) {
+    const queue = loadSyncQueue();
+    queue.messages.push({
+        id: newOperationId(),
+        user_message: userMessage,
+        ai_response: aiResponse,
+        subject: currentSubject,
+        timestamp: new Date().toISOString()
+    });
+    saveSyncQueue(queue);
+}
+
+function queueXPEvent(amount, reason) {
+    const queue = loadSyncQueue();
+    queue.xpEvents.push({ id: newOperationId(), xp: amount, reason: reason, timestamp: new Date().toISOString() });
+    saveSyncQueue(queue);
+}
+
+function markProfileDirty() {
+    const queue = loadSyncQueue();
+    queue.profileDirty = true;
+    saveSyncQueue(queue);
+}
+
+function rememberServerMessage(messageId) {
+    // Messages this device already shows are skipped when merging server deltas
+    if (!messageId) return;
+    const queue = loadSyncQueue();
+    queue.knownMessageIds = [...queue.knownMessageIds, messageId].slice(-200);
+    saveSyncQueue(queue);
+}
+
+function profileSyncFields() {
+    return {
+        name: userProfile.name,
+        age: userProfile.age,
+        class: userProfile.class,
+        school_name: userProfile.schoolName,
+        village_name: userProfile.villageName,
+        district_name: userProfile.districtName,
+        study_time: userProfile.studyTime,
+        favorite_subjects: userProfile.favoriteSubjects
+    };
+}
+
+async function syncWithServer() {
+    if (syncInFlight || !navigator.onLine) return;
+    syncInFlight = true;
+    
+    const queue = loadSyncQueue();
+    const messages = queue.messages.slice(0, SYNC_BATCH_SIZE);
+    const xpEvents = queue.xpEvents.slice(0, SYNC_BATCH_SIZE);
+    const sentProfile = queue.profileDirty;
+    
+    try {
+        const response = await fetch('/api/sync', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                session_id: getSessionId(),
+                cursor: queue.cursor,
+                messages: messages,
+                xp_events: xpEvents,
+                profile: sentProfile ? { base_version: queue.profileVersion, patch: profileSyncFields() } : null
+            })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const result = await response.json();
+        applySyncResult(result, messages, xpEvents, sentProfile);
+    } catch (error) {
+        console.error('Sync failed, will retry later:', error);
+    } finally {
+        syncInFlight = false;
+    }
+}
+
+function applySyncResult(result, sentMessages, sentXPEvents, sentProfile) {
+    // Re-read the queue: new changes may have been queued while we waited
+    const queue = loadSyncQueue();
+    const sentIds = new Set([...sentMessages, ...sentXPEvents].map(item => item.id));
+    queue.messages = queue.messages.filter(item => !sentIds.has(item.id));
+    queue.xpEvents = queue.xpEvents.filter(item => !sentIds.has(item.id));
+    queue.cursor = result.cursor;
+    queue.profileVersion = result.profile.version || 0;
+    if (sentProfile) queue.profileDirty = false;
+    
+    // Merge chat messages from other devices
+    mergeServerMessages(queue, result.messages);
+    saveSyncQueue(queue);
+    
+    // The server total is authoritative; XP still waiting in the queue is added on top
+    const pendingXP = queue.xpEvents.reduce((sum, event) => sum + event.xp, 0);
+    userProfile.totalXP = result.gamification.total_xp + pendingXP;
+    userProfile.xp = userProfile.totalXP;
+    userProfile.level = Math.floor(userProfile.totalXP / 100) + 1;
+    // Badges and achievements are only awarded by the server's rules
+    userProfile.badges = result.gamification.badges || [];
+    userProfile.achievements = result.gamification.achievements || [];
+    saveUserProfile();
+    updateUserStats();
+    
+    // Keep going while a backlog larger than one batch remains
+    if (queue.messages.length > 0 || queue.xpEvents.length > 0) {
+        setTimeout(syncWithServer, 0);
+    }
+}
+
+function mergeServerMessages(queue, messages) {
+    const known = new Set(queue.knownMessageIds);
+    const newMessages = messages.filter(message => !known.has(message.id));
+    newMessages.forEach(message => {
+        chatHistory.push({ type: 'user', message: message.user_message, timestamp: message.timestamp });
+        chatHistory.push({ type: 'ai', message: message.ai_response, timestamp: message.timestamp });
+    });
+    queue.knownMessageIds = [...queue.knownMessageIds, ...newMessages.map(message => message.id)].slice(-200);
+    if (newMessages.length > 0) saveChatHistory();
+}
+
+function expandHistoryRows(page) {
+    // Compact pages send rows in page.fields order; a missing subject is the page default
+    return page.history.map(row => {
+        const message = { subject: page.subject };
+        page.fields.forEach((field, index) => {
+            if (index < row.length) message[field] = row[index];
+        });
+        return message;
+    });
+}
+
+async function fetchHistorySinceCursor() {
+    // Page through only what was saved since this device last synced
+    if (!navigator.onLine) return;
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            const queue = loadSyncQueue();
+            const params = new URLSearchParams({ since: queue.cursor, limit: HISTORY_PAGE_SIZE, compact: '1' });
+            const response = await fetch(`/api/chat/history/${encodeURIComponent(getSessionId())}?${params}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            
+            const page = await response.json();
+            // Re-read the queue: a sync may have advanced the cursor meanwhile
+            const current = loadSyncQueue();
+            mergeServerMessages(current, expandHistoryRows(page));
+            current.cursor = Math.max(current.cursor, page.cursor);
+            saveSyncQueue(current);
+            hasMore = page.has_more;
+        }
+    } catch (error) {
+        console.error('Fetching chat history failed, sync will catch up:', error);
+    }
+}
+
+async function initializeSync() {
+    await fetchHistorySinceCursor();
+    syncWithServer();
+    window.addEventListener('online', syncWithServer);
+    setInterval(syncWithServer, SYNC_INTERVAL);
+}
+
+function registerServiceWorker() {
+    // Caches the app shell and quiz packs so repeat visits load from the device
+    if (!('serviceWorker' in navigator)) return;
+    navigator.serviceWorker.register('/sw.js').catch(error => {
+        console.error('Service worker registration failed:', error);
+    });
+    // Browsers without Background Sync replay queued requests when we reconnect
+    window.addEventListener('online', () => {
+        if (navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({ type: 'replay' });
+        }
+    });
+}
+
 // Splash Video Functions
 let videoInitialized = false;
 
+// Share of the measured downlink a splash rendition may use, leaving room for the app itself
+const SPLASH_BANDWIDTH_SHARE = 0.5;
+
+function readSplashRenditions(splashVideo) {
+    try {
+        const renditions = JSON.parse(splashVideo.dataset.renditions || '[]');
+        return renditions.sort((a, b) => (a.bitrate_kbps || 0) - (b.bitrate_kbps || 0));
+    } catch (error) {
+        return [];
+    }
+}
+
+function chooseSplashRendition(renditions) {
+    // null means skip the video and keep the animated background
+    if (renditions.length === 0) return null;
+    const connection = navigator.connection || navigator.mozConnection || navigator.webkitConnection;
+    if (!connection) return renditions[renditions.length - 1];
+
+    if (connection.saveData) return null;
+    const effectiveType = connection.effectiveType || '4g';
+    if (effectiveType === 'slow-2g' || effectiveType === '2g') return null;
+    if (effectiveType === '3g') return renditions[0];
+
+    // downlink is in Mbps; pick the best rendition that fits, else the smallest
+    if (!connection.downlink) return renditions[renditions.length - 1];
+    const budgetKbps = connection.downlink * 1000 * SPLASH_BANDWIDTH_SHARE;
+    const fitting = renditions.filter(rendition => !rendition.bitrate_kbps || rendition.bitrate_kbps <= budgetKbps);
+    return fitting.length > 0 ? fitting[fitting.length - 1] : renditions[0];
+}
+
+function showSplashAnimation(splashVideo) {
+    splashVideo.style.display = 'none';
+    const splashAnimation = document.querySelector('.splash-animation');
+    if (splashAnimation) {
+        splashAnimation.style.display = 'block';
+    }
+}
+
 function initializeSplashVideo() {
     if (videoInitialized) {
         console.log('🎬 Video already initialized, skipping...');
@@ -1657,11 +1671,20 @@ function initializeSplashVideo() {
         console.log('🎬 Initializing splash video...');
         videoInitialized = true;
         
+        const rendition = chooseSplashRendition(readSplashRenditions(splashVideo));
+        if (!rendition) {
+            console.log('📵 Slow connection or Save-Data, skipping splash video');
+            showSplashAnimation(splashVideo);
+            return;
+        }
+        console.log(`🎬 Using splash rendition ${rendition.file} (${rendition.bitrate_kbps || '?'} kbps)`);
+        
         // Set video properties
         splashVideo.muted = true;
         splashVideo.loop = true;
         splashVideo.playsInline = true;
         splashVideo.preload = 'auto';
+        splashVideo.src = rendition.url;
         
         // Ensure video starts from beginning
         splashVideo.currentTime = 0;
@@ -1671,12 +1694,8 @@ function initializeSplashVideo() {
             console.log('❌ Video failed to load:', e);
             console.log('Using animated background instead');
             // Hide video and show animated background
-            splashVideo.style.display = 'none';
-            const splashAnimation = document.querySelector('.splash-animation');
-            if (splashAnimation) {
-                splashAnimation.style.display = 'block';
-                console.log('✅ Animated background displayed');
-            }
+            showSplashAnimation(splashVideo);
+            console.log('✅ Animated background displayed');
         });
         
         // Show video when it loads successfully
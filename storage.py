@@ -0,0 +1,590 @@
+"""
+Astrals Hub - Storage Backends
+Pluggable persistence for chat history, user profiles and gamification
+state. The in-memory backend keeps everything in process-local dicts;
+the SQLite backend lets several worker processes share one database.
+
+Leaderboard boards cost differently per backend. In memory they are
+indexable skip lists, so rank and around-me lookups are O(log n). SQLite
+reads the top of a board along an index in O(log n + k), but a rank is a
+COUNT(*) of the rows scoring higher and a window starts with an OFFSET
+scan, so both are O(rank): cheap near the top, slower further down.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from leaderboard import ScoreBoard
+from session_store import SessionStore
+
+MAX_OPERATIONS_PER_SESSION = 5000
+MAX_OPERATION_SESSIONS = 10000
+
+
+class StripedLock:
+    """Fixed set of locks shared by hashing keys, so per-session locking costs no per-session memory"""
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class Storage:
+    """Interface implemented by every storage backend"""
+
+    def append_message(self, session_id, message):
+        """Store a message and return its id (increasing within a session)"""
+        raise NotImplementedError
+
+    def get_history(self, session_id):
+        raise NotImplementedError
+
+    def get_messages_since(self, session_id, message_id, limit=None):
+        """Messages with an id greater than message_id, oldest first (at most `limit`)"""
+        raise NotImplementedError
+
+    def get_messages_before(self, session_id, message_id=None, limit=100):
+        """The `limit` newest messages with an id below message_id (any if None), oldest first"""
+        raise NotImplementedError
+
+    def count_messages(self, session_id):
+        raise NotImplementedError
+
+    def clear_history(self, session_id):
+        raise NotImplementedError
+
+    def get_profile(self, session_id):
+        """Return the stored profile dict, or None if there is none"""
+        raise NotImplementedError
+
+    def save_profile(self, session_id, profile):
+        raise NotImplementedError
+
+    def update_profile(self, session_id, fn):
+        """Atomically replace the profile with fn(profile or None) -> (new, result); returns result"""
+        raise NotImplementedError
+
+    def get_gamification(self, session_id):
+        """Return the stored gamification dict, or None if there is none"""
+        raise NotImplementedError
+
+    def save_gamification(self, session_id, data):
+        raise NotImplementedError
+
+    def update_gamification(self, session_id, fn):
+        """Atomically replace the gamification dict, like update_profile"""
+        raise NotImplementedError
+
+    def iter_gamification(self):
+        """Yield (session_id, data) for every stored gamification record"""
+        raise NotImplementedError
+
+    def count_gamification(self):
+        """Number of sessions with stored gamification records"""
+        raise NotImplementedError
+
+    def iter_messages(self):
+        """Yield (session_id, message) for every stored message, grouped by session"""
+        raise NotImplementedError
+
+    def iter_profiles(self):
+        """Yield (session_id, profile) for every stored profile"""
+        raise NotImplementedError
+
+    def claim_operation(self, session_id, operation_id):
+        """Record a client operation id; False if it was already applied"""
+        raise NotImplementedError
+
+    def release_operation(self, session_id, operation_id):
+        """Forget a claimed operation id whose change could not be applied"""
+        raise NotImplementedError
+
+    def add_score(self, board, session_id, delta):
+        """Add delta to a session's score on a named board (starting from 0)"""
+        raise NotImplementedError
+
+    def set_scores(self, board, scores, replace=True):
+        """Store (session_id, score) pairs on a board; keep existing scores unless replace"""
+        raise NotImplementedError
+
+    def score_position(self, board, session_id):
+        """(0-based position, score) of a session, highest score first, or None"""
+        raise NotImplementedError
+
+    def score_slice(self, board, start, stop):
+        """(session_id, score) at positions [start, stop), highest score first, ties by session id"""
+        raise NotImplementedError
+
+    def count_scores(self, board):
+        raise NotImplementedError
+
+    def drop_score_boards(self, prefix, keep=None):
+        """Delete every board whose name starts with prefix, except keep"""
+        raise NotImplementedError
+
+    def iter_scores(self):
+        """Yield (board, session_id, score) for every stored score"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStorage(Storage):
+    """Process-local storage; state is lost on restart"""
+
+    def __init__(self, chat_sessions=None):
+        # Chat history is bounded; profiles and gamification are small per session
+        self.chat_sessions = chat_sessions if chat_sessions is not None else SessionStore()
+        self.user_profiles = {}
+        self.gamification_data = {}
+        # session_id -> recent operation ids, least recently synced session first
+        self.applied_operations = OrderedDict()
+        self.operations_lock = threading.Lock()
+        self.score_boards = {}
+        # Serializes read-modify-write updates of one session's documents
+        self.session_lock = StripedLock()
+        # Boards are shared by every session
+        self.scores_lock = threading.Lock()
+
+    def append_message(self, session_id, message):
+        return self.chat_sessions.append(session_id, message)
+
+    def get_history(self, session_id):
+        return self.chat_sessions.get(session_id)
+
+    def get_messages_since(self, session_id, message_id, limit=None):
+        return self.chat_sessions.since(session_id, message_id, limit)
+
+    def get_messages_before(self, session_id, message_id=None, limit=100):
+        return self.chat_sessions.before(session_id, message_id, limit)
+
+    def count_messages(self, session_id):
+        return self.chat_sessions.count(session_id)
+
+    def clear_history(self, session_id):
+        self.chat_sessions.clear(session_id)
+
+    def get_profile(self, session_id):
+        profile = self.user_profiles.get(session_id)
+        return dict(profile) if profile is not None else None
+
+    def save_profile(self, session_id, profile):
+        self.user_profiles[session_id] = dict(profile)
+
+    def update_profile(self, session_id, fn):
+        return self._update(self.user_profiles, session_id, fn)
+
+    def get_gamification(self, session_id):
+        data = self.gamification_data.get(session_id)
+        return dict(data) if data is not None else None
+
+    def save_gamification(self, session_id, data):
+        self.gamification_data[session_id] = dict(data)
+
+    def update_gamification(self, session_id, fn):
+        return self._update(self.gamification_data, session_id, fn)
+
+    def iter_gamification(self):
+        for session_id, data in list(self.gamification_data.items()):
+            yield session_id, dict(data)
+
+    def count_gamification(self):
+        return len(self.gamification_data)
+
+    def iter_messages(self):
+        for session_id in self.chat_sessions.session_ids():
+            for message in self.chat_sessions.get(session_id):
+                yield session_id, message
+
+    def iter_profiles(self):
+        for session_id, profile in list(self.user_profiles.items()):
+            yield session_id, dict(profile)
+
+    def claim_operation(self, session_id, operation_id):
+        with self.operations_lock:
+            applied = self.applied_operations.get(session_id)
+            if applied is None:
+                applied = self.applied_operations[session_id] = OrderedDict()
+            self.applied_operations.move_to_end(session_id)
+            if operation_id in applied:
+                return False
+            applied[operation_id] = True
+            # Retries arrive soon after the original, so only recent ids
+            # of recently synced sessions are kept
+            while len(applied) > MAX_OPERATIONS_PER_SESSION:
+                applied.popitem(last=False)
+            while len(self.applied_operations) > MAX_OPERATION_SESSIONS:
+                self.applied_operations.popitem(last=False)
+            return True
+
+    def release_operation(self, session_id, operation_id):
+        with self.operations_lock:
+            self.applied_operations.get(session_id, {}).pop(operation_id, None)
+
+    def add_score(self, board, session_id, delta):
+        with self.scores_lock:
+            self.score_boards.setdefault(board, ScoreBoard()).add(session_id, delta)
+
+    def set_scores(self, board, scores, replace=True):
+        with self.scores_lock:
+            scoreboard = self.score_boards.setdefault(board, ScoreBoard())
+            for session_id, score in scores:
+                if replace or scoreboard.score(session_id) is None:
+                    scoreboard.set_score(session_id, score)
+
+    def score_position(self, board, session_id):
+        with self.scores_lock:
+            scoreboard = self.score_boards.get(board)
+            if scoreboard is None or scoreboard.score(session_id) is None:
+                return None
+            return scoreboard.position(session_id), scoreboard.score(session_id)
+
+    def score_slice(self, board, start, stop):
+        with self.scores_lock:
+            scoreboard = self.score_boards.get(board)
+            return scoreboard.slice(start, stop) if scoreboard is not None else []
+
+    def count_scores(self, board):
+        with self.scores_lock:
+            return len(self.score_boards.get(board, ()))
+
+    def drop_score_boards(self, prefix, keep=None):
+        with self.scores_lock:
+            for board in [board for board in self.score_boards if board.startswith(prefix) and board != keep]:
+                del self.score_boards[board]
+
+    def iter_scores(self):
+        with self.scores_lock:
+            rows = [(board, session_id, score) for board, scoreboard in self.score_boards.items()
+                    for session_id, score in scoreboard.slice(0, len(scoreboard))]
+        yield from rows
+
+    def _update(self, documents, session_id, fn):
+        with self.session_lock(session_id):
+            current = documents.get(session_id)
+            new, result = fn(dict(current) if current is not None else None)
+            documents[session_id] = dict(new)
+        return result
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by request threads"""
+
+    def __init__(self, path, size=5, timeout=5.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            isolation_level=None,  # explicit BEGIN/COMMIT only
+            cached_statements=128,  # keeps our parameterized statements prepared
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            # Connections must not cross a fork (e.g. gunicorn pre-fork workers)
+            if self._pid != os.getpid():
+                self._reset()
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                if self._created < self.size:
+                    conn = self._connect()
+                    self._created += 1
+        if conn is None:
+            conn = self._idle.get(timeout=self.timeout)
+
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteStorage(Storage):
+    """SQLite storage in WAL mode, safe to share between worker processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+        CREATE TABLE IF NOT EXISTS profiles (
+            session_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS gamification (
+            session_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS operations (
+            session_id TEXT NOT NULL,
+            operation_id TEXT NOT NULL,
+            PRIMARY KEY (session_id, operation_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS scores (
+            board TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            PRIMARY KEY (board, session_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_scores_rank ON scores (board, score DESC, session_id);
+    """
+
+    def __init__(self, path, pool_size=5):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path, size=pool_size)
+        # Connection of the update transaction running on this thread, if any
+        self._local = threading.local()
+        with self.pool.connection() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        """A pooled connection, or the open transaction's when called from inside an update"""
+        conn = getattr(self._local, 'transaction', None)
+        if conn is not None:
+            yield conn
+            return
+        with self.pool.connection() as conn:
+            yield conn
+
+    def append_message(self, session_id, message):
+        message = {key: value for key, value in message.items() if key != 'id'}
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                'INSERT INTO messages (session_id, data) VALUES (?, ?)',
+                (session_id, json.dumps(message)),
+            )
+        return cursor.lastrowid
+
+    def get_history(self, session_id):
+        return self.get_messages_since(session_id, 0)
+
+    def get_messages_since(self, session_id, message_id, limit=None):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT id, data FROM messages WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (session_id, message_id, -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(json.loads(data), id=row_id) for row_id, data in rows]
+
+    def get_messages_before(self, session_id, message_id=None, limit=100):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT id, data FROM messages WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                (session_id, (1 << 63) - 1 if message_id is None else message_id, limit),
+            ).fetchall()
+        return [dict(json.loads(data), id=row_id) for row_id, data in reversed(rows)]
+
+    def count_messages(self, session_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE session_id = ?',
+                (session_id,),
+            ).fetchone()
+        return row[0]
+
+    def clear_history(self, session_id):
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+
+    def get_profile(self, session_id):
+        return self._get_document('profiles', session_id)
+
+    def save_profile(self, session_id, profile):
+        self._save_document('profiles', session_id, profile)
+
+    def update_profile(self, session_id, fn):
+        return self._update_document('profiles', session_id, fn)
+
+    def get_gamification(self, session_id):
+        return self._get_document('gamification', session_id)
+
+    def save_gamification(self, session_id, data):
+        self._save_document('gamification', session_id, data)
+
+    def update_gamification(self, session_id, fn):
+        return self._update_document('gamification', session_id, fn)
+
+    def iter_gamification(self):
+        with self.pool.connection() as conn:
+            for session_id, data in conn.execute('SELECT session_id, data FROM gamification'):
+                yield session_id, json.loads(data)
+
+    def count_gamification(self):
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM gamification').fetchone()[0]
+
+    def iter_messages(self):
+        # Rows are streamed from the cursor rather than fetched all at once
+        with self.pool.connection() as conn:
+            for session_id, row_id, data in conn.execute('SELECT session_id, id, data FROM messages ORDER BY session_id, id'):
+                yield session_id, dict(json.loads(data), id=row_id)
+
+    def iter_profiles(self):
+        with self.pool.connection() as conn:
+            for session_id, data in conn.execute('SELECT session_id, data FROM profiles'):
+                yield session_id, json.loads(data)
+
+    def claim_operation(self, session_id, operation_id):
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO operations (session_id, operation_id) VALUES (?, ?)',
+                (session_id, operation_id),
+            )
+        return cursor.rowcount == 1
+
+    def release_operation(self, session_id, operation_id):
+        with self.pool.connection() as conn:
+            conn.execute(
+                'DELETE FROM operations WHERE session_id = ? AND operation_id = ?',
+                (session_id, operation_id),
+            )
+
+    def add_score(self, board, session_id, delta):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO scores (board, session_id, score) VALUES (?, ?, ?) '
+                'ON CONFLICT (board, session_id) DO UPDATE SET score = score + excluded.score',
+                (board, session_id, delta),
+            )
+
+    def set_scores(self, board, scores, replace=True):
+        conflict = 'DO UPDATE SET score = excluded.score' if replace else 'DO NOTHING'
+        with self._connection() as conn:
+            conn.executemany(
+                f'INSERT INTO scores (board, session_id, score) VALUES (?, ?, ?) ON CONFLICT (board, session_id) {conflict}',
+                ((board, session_id, score) for session_id, score in scores),
+            )
+
+    def score_position(self, board, session_id):
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT score FROM scores WHERE board = ? AND session_id = ?',
+                (board, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            # Counted along idx_scores_rank: everyone ahead of this session
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM scores WHERE board = ? AND (score > ? OR (score = ? AND session_id < ?))',
+                (board, row[0], row[0], session_id),
+            ).fetchone()[0]
+        return ahead, row[0]
+
+    def score_slice(self, board, start, stop):
+        start = max(start, 0)
+        if start >= stop:
+            return []
+        with self._connection() as conn:
+            rows = conn.execute(
+                'SELECT session_id, score FROM scores WHERE board = ? ORDER BY score DESC, session_id LIMIT ? OFFSET ?',
+                (board, stop - start, start),
+            ).fetchall()
+        return [(session_id, score) for session_id, score in rows]
+
+    def count_scores(self, board):
+        with self._connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM scores WHERE board = ?', (board,)).fetchone()[0]
+
+    def drop_score_boards(self, prefix, keep=None):
+        with self._connection() as conn:
+            conn.execute(
+                'DELETE FROM scores WHERE substr(board, 1, ?) = ? AND board != ?',
+                (len(prefix), prefix, keep or ''),
+            )
+
+    def iter_scores(self):
+        with self.pool.connection() as conn:
+            for board, session_id, score in conn.execute('SELECT board, session_id, score FROM scores'):
+                yield board, session_id, score
+
+    def _get_document(self, table, session_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                f'SELECT data FROM {table} WHERE session_id = ?',
+                (session_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save_document(self, table, session_id, data):
+        with self.pool.connection() as conn:
+            conn.execute(
+                f'INSERT INTO {table} (session_id, data) VALUES (?, ?) '
+                'ON CONFLICT (session_id) DO UPDATE SET data = excluded.data',
+                (session_id, json.dumps(data)),
+            )
+
+    def _update_document(self, table, session_id, fn):
+        with self.pool.connection() as conn:
+            # IMMEDIATE takes the write lock up front, so concurrent updates
+            # from other threads or workers queue instead of overwriting
+            conn.execute('BEGIN IMMEDIATE')
+            # Storage calls made by fn (e.g. score updates) join this transaction
+            self._local.transaction = conn
+            try:
+                row = conn.execute(
+                    f'SELECT data FROM {table} WHERE session_id = ?',
+                    (session_id,),
+                ).fetchone()
+                new, result = fn(json.loads(row[0]) if row else None)
+                conn.execute(
+                    f'INSERT INTO {table} (session_id, data) VALUES (?, ?) '
+                    'ON CONFLICT (session_id) DO UPDATE SET data = excluded.data',
+                    (session_id, json.dumps(new)),
+                )
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                self._local.transaction = None
+            conn.execute('COMMIT')
+        return result
+
+    def close(self):
+        self.pool.close()
+
+
+def create_storage(backend='memory', path=None, chat_sessions=None):
+    """Build the storage backend named in the app configuration"""
+    if backend == 'memory':
+        return MemoryStorage(chat_sessions)
+    if backend == 'sqlite':
+        return SQLiteStorage(path or os.path.join('data', 'astrals.db'))
+    raise ValueError(f"Unknown storage backend: {backend}")
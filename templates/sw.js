@@ -0,0 +1,211 @@
+// Astrals Hub service worker, rendered by app.py at /sw.js.
+// A new app version changes VERSION, which makes browsers install this
+// worker again: the new shell is precached and the old caches are dropped.
+
+const VERSION = {{ version|tojson }};
+const SHELL_CACHE = `astrals-shell-${VERSION}`;
+const API_CACHE = `astrals-api-${VERSION}`;
+// Hashed /assets/ files and CDN fonts never change under the same URL
+const RUNTIME_CACHE = 'astrals-runtime-v1';
+// Shared with loadQuizPack in script.js, which falls back to it offline
+const QUIZ_PACK_CACHE = 'astrals-quiz-packs-v1';
+
+const SHELL_URLS = {{ shell_urls|tojson }};
+const QUIZ_PACK_URLS = {{ quiz_pack_urls|tojson }};
+
+// Served from cache at once and refreshed in the background
+const REVALIDATED_API = [/^\/api\/subjects$/, /^\/api\/subject\/[^/]+$/];
+// Kept while offline and sent again once the connection is back
+const QUEUED_POSTS = ['/api/chat', '/api/gamification/award-xp'];
+const CDN_HOSTS = ['fonts.googleapis.com', 'fonts.gstatic.com', 'cdnjs.cloudflare.com'];
+
+const OUTBOX_DB = 'astrals-outbox';
+const OUTBOX_STORE = 'requests';
+const OUTBOX_LIMIT = 200;
+const SYNC_TAG = 'astrals-outbox';
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const shell = await caches.open(SHELL_CACHE);
+        await shell.addAll(SHELL_URLS);
+        // A missing pack must not stop the shell from installing
+        const packs = await caches.open(QUIZ_PACK_CACHE);
+        await Promise.all(QUIZ_PACK_URLS.map(url => packs.add(url).catch(() => null)));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => (name.startsWith('astrals-shell-') || name.startsWith('astrals-api-'))
+                && name !== SHELL_CACHE && name !== API_CACHE)
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+        await replayOutbox();
+    })());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+
+    if (request.method === 'POST') {
+        if (sameOrigin && QUEUED_POSTS.includes(url.pathname)) {
+            event.respondWith(postOrQueue(request));
+        }
+        return;
+    }
+    if (request.method !== 'GET') return;
+
+    if (!sameOrigin) {
+        if (CDN_HOSTS.includes(url.hostname)) {
+            event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+        }
+        return;
+    }
+    if (request.mode === 'navigate' && url.pathname === '/') {
+        event.respondWith(cacheFirst(new Request('/'), SHELL_CACHE, request));
+    } else if (REVALIDATED_API.some(pattern => pattern.test(url.pathname))) {
+        event.respondWith(staleWhileRevalidate(event, API_CACHE));
+    } else if (url.pathname.startsWith('/assets/')) {
+        event.respondWith(cacheFirst(request, RUNTIME_CACHE));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(request, SHELL_CACHE));
+    }
+    // Everything else (videos, other API calls) goes straight to the network
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        // Rejecting makes the browser retry the sync later
+        event.waitUntil(replayOutbox().then(done => {
+            if (!done) throw new Error('Outbox not yet empty');
+        }));
+    }
+});
+
+self.addEventListener('message', event => {
+    // Sent by the page when it comes back online, for browsers without Background Sync
+    if (event.data && event.data.type === 'replay') {
+        event.waitUntil(replayOutbox());
+    }
+});
+
+async function cacheFirst(key, cacheName, request = key) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(key);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        await cache.put(key, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request);
+    const refresh = fetch(event.request).then(async response => {
+        if (response.ok) await cache.put(event.request, response.clone());
+        return response;
+    });
+    if (cached) {
+        // Keep the worker alive until the cached copy has been refreshed
+        event.waitUntil(refresh.catch(() => null));
+        return cached;
+    }
+    return refresh;
+}
+
+async function postOrQueue(request) {
+    const body = await request.clone().text();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        await outboxAdd({
+            url: request.url,
+            body: body,
+            contentType: request.headers.get('Content-Type') || 'application/json',
+            queuedAt: Date.now()
+        });
+        if (self.registration.sync) {
+            await self.registration.sync.register(SYNC_TAG).catch(() => null);
+        }
+        // The page shows its offline answer and leaves the request to us
+        return new Response(JSON.stringify({ error: 'Offline, request queued', queued: true }), {
+            status: 503,
+            headers: { 'Content-Type': 'application/json', 'X-Astrals-Queued': '1' }
+        });
+    }
+}
+
+let replaying = null;
+
+function replayOutbox() {
+    // Sync events, messages and activation may all ask at once; send each request once
+    if (!replaying) {
+        replaying = sendOutbox().finally(() => {
+            replaying = null;
+        });
+    }
+    return replaying;
+}
+
+async function sendOutbox() {
+    // Oldest first, stopping at the first failure so requests stay in order
+    for (const entry of await outboxAll()) {
+        let response;
+        try {
+            response = await fetch(entry.url, {
+                method: 'POST',
+                headers: { 'Content-Type': entry.contentType },
+                body: entry.body
+            });
+        } catch (error) {
+            return false;
+        }
+        if (response.status === 429 || response.status >= 500) return false;
+        // Sent, or rejected for good (4xx): either way it leaves the outbox
+        await outboxDelete(entry.id);
+    }
+    return true;
+}
+
+function openOutbox() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(OUTBOX_DB, 1);
+        open.onupgradeneeded = () => open.result.createObjectStore(OUTBOX_STORE, { keyPath: 'id', autoIncrement: true });
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+async function outboxTransaction(mode, work) {
+    const db = await openOutbox();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(OUTBOX_STORE, mode);
+        const result = work(transaction.objectStore(OUTBOX_STORE));
+        transaction.oncomplete = () => resolve(result.result);
+        transaction.onerror = () => reject(transaction.error);
+    });
+}
+
+async function outboxAdd(entry) {
+    await outboxTransaction('readwrite', store => store.add(entry));
+    const entries = await outboxAll();
+    // Drop the oldest requests rather than grow without bound while offline
+    for (const stale of entries.slice(0, Math.max(0, entries.length - OUTBOX_LIMIT))) {
+        await outboxDelete(stale.id);
+    }
+}
+
+function outboxAll() {
+    return outboxTransaction('readonly', store => store.getAll());
+}
+
+function outboxDelete(id) {
+    return outboxTransaction('readwrite', store => store.delete(id));
+}
@@ -0,0 +1,50 @@
+"""Achievement rules evaluated on events"""
+
+from datetime import datetime
+
+import pytest
+
+from achievements import AchievementEngine
+from gamification import default_stats
+
+RULES = [
+    {'id': 'first_question', 'metric': 'chats', 'threshold': 1},
+    {'id': 'curious', 'kind': 'badge', 'metric': 'chats', 'threshold': 3},
+    {'id': 'math_fan', 'kind': 'badge', 'metric': 'quizzes', 'subject': 'mathematics', 'threshold': 2},
+    {'id': 'regular', 'metric': 'streak', 'threshold': 2},
+]
+MONDAY = datetime(2026, 10, 19, 9, 0)
+
+
+def test_rules_are_earned_once_when_crossed():
+    engine = AchievementEngine(RULES)
+    stats = default_stats()
+    earned = [[rule['id'] for rule in engine.apply(stats, 'chat', MONDAY)] for _ in range(4)]
+    assert earned == [['first_question'], [], ['curious'], []]
+    assert stats['achievements'] == ['first_question']
+    assert stats['badges'] == ['curious']
+
+
+def test_subject_rules_count_only_their_subject():
+    engine = AchievementEngine(RULES)
+    stats = default_stats()
+    engine.apply(stats, 'quiz_completed', MONDAY, subject='science')
+    engine.apply(stats, 'quiz_completed', MONDAY, subject='mathematics')
+    assert engine.apply(stats, 'quiz_completed', MONDAY, subject='mathematics')[0]['id'] == 'math_fan'
+
+
+def test_streak_counts_consecutive_days():
+    engine = AchievementEngine(RULES)
+    stats = default_stats()
+    engine.apply(stats, 'chat', MONDAY)
+    engine.apply(stats, 'chat', MONDAY.replace(hour=20))
+    assert 'regular' not in stats['achievements']
+    engine.apply(stats, 'chat', datetime(2026, 10, 20, 8, 0))
+    assert 'regular' in stats['achievements']
+
+
+def test_bad_rules_are_rejected():
+    with pytest.raises(ValueError):
+        AchievementEngine([{'id': 'x', 'metric': 'bogus', 'threshold': 1}])
+    with pytest.raises(ValueError):
+        AchievementEngine(RULES + [RULES[0]])
@@ -0,0 +1,55 @@
+"""Admission control: 429 for clients over their limit, 503 when saturated"""
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from admission import AdmissionControl, RateLimiter
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route('/ask/<session_id>')
+    def ask(session_id):
+        return jsonify({'session_id': session_id})
+
+    @app.route('/stream')
+    def stream():
+        return Response(iter(['a', 'b']), mimetype='text/plain')
+
+    return app
+
+
+def test_bucket_refills_over_time():
+    now = [0.0]
+    limiter = RateLimiter(clock=lambda: now[0])
+    assert limiter.acquire('ana', 1, 2) == 0
+    assert limiter.acquire('ana', 1, 2) == 0
+    assert limiter.acquire('ana', 1, 2) == pytest.approx(1.0)
+    now[0] = 1.0
+    assert limiter.acquire('ana', 1, 2) == 0
+
+
+def test_session_over_its_limit_gets_429_with_retry_after(app):
+    AdmissionControl(app, limits={'default': {'session': (0.5, 2), 'ip': None}}, max_active=0)
+    client = app.test_client()
+    assert [client.get('/ask/ana').status_code for _ in range(2)] == [200, 200]
+    limited = client.get('/ask/ana')
+    assert limited.status_code == 429
+    assert limited.headers['Retry-After'] == '2'
+    # Other sessions have their own bucket
+    assert client.get('/ask/ben').status_code == 200
+
+
+def test_saturated_server_sheds_with_503(app):
+    admission = AdmissionControl(app, limits={'default': {}}, max_active=1, max_queued=0)
+    client = app.test_client()
+    # A stream holds its slot until its body has been sent
+    held = client.get('/stream', buffered=False)
+    shed = client.get('/ask/ana')
+    assert shed.status_code == 503
+    assert shed.headers['Retry-After'] == '1'
+    held.close()
+    assert admission.concurrency.active == 0
+    assert client.get('/ask/ana').status_code == 200
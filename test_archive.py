@@ -0,0 +1,48 @@
+"""Archives: compaction of data/, export and idempotent import"""
+
+import json
+
+from archive import compact, import_archive, read_archive, save_snapshot
+from storage import MemoryStorage
+
+
+def message(text, timestamp=1792341685):
+    return {'timestamp': timestamp, 'subject': 'science', 'user_message': text, 'ai_response': 'answer'}
+
+
+def test_compact_merges_snapshots_and_journals_without_duplicates(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    first, second = message('q1'), message('q2', 1792341699)
+    (data / 'chat_ana_20261001_120000.json').write_text(json.dumps({'session_id': 'ana', 'history': [first]}))
+    (data / 'chat_ana.jsonl').write_text(''.join(json.dumps(dict(m, session_id='ana')) + '\n' for m in (first, second)))
+    output = str(tmp_path / 'archive' / 'chats.jsonl.gz')
+    assert compact(str(data), output, delete=True) == (2, 2)
+    assert [record['user_message'] for record in read_archive(output)] == ['q1', 'q2']
+    assert list(data.iterdir()) == []
+
+
+def test_snapshot_round_trip_is_idempotent(tmp_path, storage):
+    source = MemoryStorage()
+    source.append_message('ana', message('q1'))
+    source.save_profile('ana', {'name': 'Ana'})
+    source.save_gamification('ana', {'total_xp': 40})
+    source.add_score('all-time', 'ana', 40)
+    path = str(tmp_path / 'snapshot.jsonl.gz')
+    save_snapshot(source, path)
+
+    counts = import_archive(path, storage)
+    assert (counts['message'], counts['profile'], counts['gamification'], counts['score']) == (1, 1, 1, 1)
+    assert import_archive(path, storage)['skipped'] == 4
+    assert len(storage.get_history('ana')) == 1
+    assert storage.score_slice('all-time', 0, 10) == [('ana', 40)]
+
+
+def test_live_data_wins_over_the_archive(tmp_path, storage):
+    source = MemoryStorage()
+    source.save_profile('ana', {'name': 'Old'})
+    path = str(tmp_path / 'snapshot.jsonl')
+    save_snapshot(source, path)
+    storage.save_profile('ana', {'name': 'New'})
+    import_archive(path, storage)
+    assert storage.get_profile('ana') == {'name': 'New'}
@@ -0,0 +1,57 @@
+"""Asset builds and the manifest's fallback to /static"""
+
+import os
+
+import pytest
+from flask import Flask
+
+from assets import AssetPipeline, build_assets
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'styles.css').write_text('body { color: red; }')
+    (static / 'script.js').write_text('console.log("v1");')
+    return static
+
+
+def asset_url(static_dir, path, debug=False):
+    app = Flask(__name__, static_folder=str(static_dir))
+    app.debug = debug
+    pipeline = AssetPipeline(app, dist_dir=str(static_dir / 'dist'), static_dir=str(static_dir))
+    with app.test_request_context():
+        return pipeline.asset_url(path)
+
+
+def test_built_assets_get_hashed_urls(static_dir):
+    assets = build_assets(str(static_dir), str(static_dir / 'dist'))
+    assert asset_url(static_dir, 'script.js') == f"/assets/{assets['script.js']}"
+
+
+def test_sources_changed_since_the_build_are_served_from_static(static_dir):
+    assets = build_assets(str(static_dir), str(static_dir / 'dist'))
+    (static_dir / 'script.js').write_text('console.log("v2");')
+    assert asset_url(static_dir, 'script.js') == '/static/script.js'
+    assert asset_url(static_dir, 'styles.css') == f"/assets/{assets['styles.css']}"
+
+
+def test_debug_serves_sources(static_dir):
+    build_assets(str(static_dir), str(static_dir / 'dist'))
+    assert asset_url(static_dir, 'script.js', debug=True) == '/static/script.js'
+
+
+def test_rebuild_swaps_in_and_keeps_the_previous_build(static_dir):
+    dist = static_dir / 'dist'
+    first = build_assets(str(static_dir), str(dist))
+    (static_dir / 'script.js').write_text('console.log("v2");')
+    second = build_assets(str(static_dir), str(dist))
+    # Pages rendered before the rebuild still load their script
+    assert (dist / first['script.js']).exists()
+    third = build_assets(str(static_dir), str(dist))
+    assert first['script.js'] != second['script.js'] == third['script.js']
+    assert not (dist / first['script.js']).exists()
+    assert (dist / second['script.js']).exists()
+    # No staging or retired directories are left behind
+    assert sorted(os.listdir(static_dir)) == ['dist', 'script.js', 'styles.css']
@@ -0,0 +1,31 @@
+"""The API benchmark itself: sampling, percentiles and the result format"""
+
+import argparse
+import random
+
+from benchmark import SessionPicker, client_address, percentile, run_benchmark
+
+
+def test_percentile_picks_the_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 51
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.95) == 0.0
+
+
+def test_sessions_are_skewed_and_addresses_stable():
+    picker = SessionPicker(100, 1.1, random.Random(1))
+    picks = [picker.pick() for _ in range(2000)]
+    assert picks.count('bench_0') > picks.count('bench_99') * 5
+    assert client_address('bench_258') == client_address('bench_258') == '10.0.1.2'
+
+
+def test_in_process_run_accounts_for_every_request():
+    args = argparse.Namespace(requests=60, concurrency=2, sessions=10, zipf=1.1, seed=7, url=None,
+                              server_pid=None, sample_interval=0.05)
+    result = run_benchmark(args)
+    overall = result['overall']
+    assert result['mode'] == 'in-process'
+    assert overall['requests'] + overall['errors'] + overall['rejected'] == 60
+    assert sum(stats['requests'] for stats in result['endpoints'].values()) == overall['requests']
+    assert overall['p50_ms'] <= overall['p95_ms'] <= overall['p99_ms'] <= overall['max_ms']
@@ -0,0 +1,22 @@
+"""Chat endpoints: request validation and the streamed reply"""
+
+import pytest
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'data': 'not json', 'content_type': 'application/json'},
+    {'json': ['a', 'list']},
+    {'json': {'message': 42}},
+    {'json': {'message': 'hi', 'session_id': None}},
+    {'json': {'message': 'hi', 'locale': ['en']}},
+])
+def test_stream_rejects_malformed_bodies(client, kwargs):
+    assert client.post('/api/chat/stream', **kwargs).status_code == 400
+
+
+def test_stream_sends_chunks_then_done(client):
+    response = client.post('/api/chat/stream', json={'message': 'hello', 'session_id': 'test-stream'})
+    body = response.get_data(as_text=True)
+    response.close()
+    assert response.status_code == 200
+    assert body.index('event: chunk') < body.index('event: done')
@@ -0,0 +1,45 @@
+"""XP awards: atomic per session, levels and transitions"""
+
+import threading
+
+import pytest
+
+from gamification import GamificationService, level_for
+
+
+def test_levels_follow_xp():
+    assert [level_for(xp) for xp in (0, 99, 100, 250)] == [1, 1, 2, 3]
+
+
+def test_award_reports_its_transition(storage):
+    service = GamificationService(storage)
+    result = service.award('ana', 120, 'quiz')
+    assert result['xp_awarded'] == 120
+    assert (result['level_before'], result['level'], result['level_up']) == (1, 2, True)
+    # Corrections can take XP away but never a level
+    corrected = service.award_many('ana', [{'xp': -50}, {'xp': 5}])
+    assert corrected['stats']['total_xp'] == 75
+    assert corrected['level'] == 2 and not corrected['level_up']
+
+
+def test_concurrent_awards_are_not_lost(storage):
+    service = GamificationService(storage)
+
+    def worker():
+        for _ in range(25):
+            service.award('ana', 2)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert service.stats('ana')['total_xp'] == 200
+
+
+def test_invalid_events_apply_nothing(storage):
+    service = GamificationService(storage)
+    service.award('ana', 10)
+    with pytest.raises(ValueError):
+        service.award_many('ana', [{'xp': 10}, {'xp': 'lots'}])
+    assert service.stats('ana')['total_xp'] == 10
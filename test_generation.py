@@ -0,0 +1,84 @@
+"""HTTP generation backend against the local stub server"""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from generation import BackendUnavailable, HTTPBackend, StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    # The backend keeps its connections open, so closing must not wait for their handlers
+    block_on_close = False
+
+
+def serve(delay=0.0):
+    handler = type('Handler', (StubHandler,), {'delay': delay, 'calls': 0})
+    server = StubServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server, handler
+
+
+@pytest.fixture
+def stub():
+    server, handler = serve()
+    yield f'http://127.0.0.1:{server.server_port}/', handler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slow_stub():
+    server, handler = serve(delay=0.3)
+    yield f'http://127.0.0.1:{server.server_port}/', handler
+    server.shutdown()
+    server.server_close()
+
+
+def test_answers_with_the_student_message(stub):
+    url, handler = stub
+    backend = HTTPBackend(url)
+    assert backend.generate('What is Photosynthesis?', key='what is photosynthesis') == \
+        '[stub #1] You asked about: What is Photosynthesis?'
+    # The kept-alive connection serves the next call
+    assert backend.generate('next question').startswith('[stub #2]')
+    backend.close()
+
+
+def test_identical_questions_in_flight_share_one_call(slow_stub):
+    url, handler = slow_stub
+    backend = HTTPBackend(url)
+    answers = []
+    threads = [
+        threading.Thread(target=lambda text: answers.append(backend.generate(text, key='fractions')), args=(text,))
+        for text in ('Fractions?', 'fractions')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.calls == 1
+    assert len(set(answers)) == 1
+    assert backend.stats()['coalesced'] == 1
+    backend.close()
+
+
+def test_missed_deadline_is_unavailable(slow_stub):
+    url, _ = slow_stub
+    backend = HTTPBackend(url, timeout=0.05)
+    with pytest.raises(BackendUnavailable):
+        backend.generate('too slow')
+    assert backend.stats()['timeouts'] == 1
+    backend.close()
+
+
+def test_unreachable_server_is_unavailable():
+    server, _ = serve()
+    url = f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+    backend = HTTPBackend(url, timeout=1.0)
+    with pytest.raises(BackendUnavailable):
+        backend.generate('anyone there?')
+    backend.close()
@@ -0,0 +1,48 @@
+"""Chat history paging and conditional requests"""
+
+import pytest
+
+import app as astrals
+
+
+@pytest.fixture
+def message_ids():
+    session_id = 'test-history'
+    astrals.storage.clear_history(session_id)
+    return [astrals.record_chat(session_id, f'question {i}', f'answer {i}', 'science') for i in range(5)]
+
+
+def page(client, query):
+    return client.get(f'/api/chat/history/test-history?{query}').get_json()
+
+
+def test_since_pages_forward(client, message_ids):
+    first = page(client, f'since={message_ids[0]}&limit=2')
+    assert [m['id'] for m in first['history']] == message_ids[1:3]
+    assert first['has_more']
+    last = page(client, f"since={first['cursor']}&limit=2")
+    assert [m['id'] for m in last['history']] == message_ids[3:]
+    assert not last['has_more']
+
+
+def test_before_pages_back(client, message_ids):
+    newest = page(client, 'limit=2')
+    assert [m['id'] for m in newest['history']] == message_ids[3:]
+    older = page(client, f"before={newest['oldest_id']}&limit=2")
+    assert [m['id'] for m in older['history']] == message_ids[1:3]
+    assert older['has_more']
+
+
+def test_since_and_before_together_are_rejected(client, message_ids):
+    response = client.get(f'/api/chat/history/test-history?since={message_ids[0]}&before={message_ids[-1]}')
+    assert response.status_code == 400
+
+
+def test_unchanged_page_is_not_modified(client, message_ids):
+    url = f'/api/chat/history/test-history?since={message_ids[0]}&limit=2'
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    # A new message changes the newest page, so its old ETag no longer matches
+    newest = client.get('/api/chat/history/test-history?limit=10')
+    astrals.record_chat('test-history', 'one more', 'answer', 'science')
+    assert client.get('/api/chat/history/test-history?limit=10', headers={'If-None-Match': newest.headers['ETag']}).status_code == 200
@@ -0,0 +1,36 @@
+"""Chat history files: what each save appends"""
+
+import json
+
+from history_writer import HistoryWriter
+
+
+def message(message_id, text='same question'):
+    return {'id': message_id, 'timestamp': 1792341685, 'subject': 'physics', 'user_message': text, 'ai_response': 'same answer'}
+
+
+def written(writer, session_id):
+    with open(writer.path_for(session_id), encoding='utf-8') as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def test_identical_messages_in_the_same_second_are_both_kept(tmp_path):
+    writer = HistoryWriter(str(tmp_path), commit_delay=0)
+    writer.submit('ana', [message(1)])
+    writer.flush()
+    writer.submit('ana', [message(1), message(2)])
+    writer.flush()
+    writer.close()
+    assert written(writer, 'ana') == [1, 2]
+
+
+def test_markers_are_bounded_and_evicted_sessions_resume_from_the_file(tmp_path):
+    writer = HistoryWriter(str(tmp_path), commit_delay=0, max_markers=2)
+    for session_id in ('ana', 'ben', 'cai'):
+        writer.submit(session_id, [message(1)])
+        writer.flush()
+    assert list(writer._markers) == ['ben', 'cai']
+    writer.submit('ana', [message(1), message(2)])
+    writer.flush()
+    writer.close()
+    assert written(writer, 'ana') == [1, 2]
@@ -0,0 +1,69 @@
+"""Knowledge packs: locale resolution, fallbacks and lazy loading"""
+
+import json
+import os
+
+import pytest
+
+from knowledge import KnowledgeStore
+
+
+def write_pack(directory, locale, subject, rows):
+    path = directory / locale
+    path.mkdir(exist_ok=True)
+    (path / f'{subject}.json').write_text(json.dumps({'subject': subject, 'topics': rows}))
+
+
+@pytest.fixture
+def directory(tmp_path):
+    (tmp_path / 'index.json').write_text(json.dumps({
+        'default_locale': 'en',
+        'locales': {'en': 'English', 'pt-br': 'Português (Brasil)'},
+        'subjects': ['science', 'mathematics']
+    }))
+    write_pack(tmp_path, 'en', 'mathematics', [['fractions', 'Fractions are parts of a whole.', []]])
+    write_pack(tmp_path, 'en', 'science', [['photosynthesis', 'Plants make sugar from light.', []]])
+    write_pack(tmp_path, 'pt-br', 'science', [['photosynthesis', 'As plantas fazem açúcar.', ['fotossíntese']]])
+    return tmp_path
+
+
+def test_locales_resolve_exactly_then_by_language_then_to_default(directory):
+    knowledge = KnowledgeStore(str(directory))
+    assert knowledge.locales() == {'en': 'English', 'pt-br': 'Português (Brasil)'}
+    assert knowledge.resolve_locale('PT_BR') == 'pt-br'
+    assert knowledge.resolve_locale('en-GB') == 'en'
+    assert knowledge.resolve_locale('fr') == 'en'
+    assert knowledge.resolve_locale(None) == 'en'
+
+
+def test_missing_subjects_fall_back_to_the_default_locale(directory):
+    knowledge = KnowledgeStore(str(directory))
+    assert knowledge.subjects('pt-br') == ['science', 'mathematics']
+    assert knowledge.pack('pt-br', 'science')['responses']['photosynthesis'] == 'As plantas fazem açúcar.'
+    assert knowledge.pack('pt-br', 'mathematics')['title'] == 'Mathematics'
+    assert knowledge.pack('pt-br', 'history') is None
+
+
+def test_packs_are_parsed_on_first_use_only(directory, monkeypatch):
+    loaded = []
+    load = KnowledgeStore._load_pack
+    monkeypatch.setattr(KnowledgeStore, '_load_pack', staticmethod(lambda path: loaded.append(path) or load(path)))
+    knowledge = KnowledgeStore(str(directory))
+    assert loaded == []
+    knowledge.pack('en', 'science')
+    knowledge.pack('en', 'science')
+    assert [os.path.basename(path) for path in loaded] == ['science.json']
+
+
+def test_each_locale_has_its_own_matcher(directory):
+    knowledge = KnowledgeStore(str(directory))
+    assert knowledge.matcher('pt-br').classify('o que é fotossíntese?').best_topic() == ('science', 'photosynthesis')
+    assert knowledge.matcher('en').classify('o que é fotossíntese?').best_topic() is None
+
+
+def test_changed_files_bump_the_version(directory):
+    knowledge = KnowledgeStore(str(directory), reload_interval=0)
+    before = knowledge.version('pt-br')
+    write_pack(directory, 'pt-br', 'mathematics', [['fractions', 'Frações são partes de um todo.', ['frações']]])
+    assert knowledge.version('pt-br') != before
+    assert knowledge.pack('pt-br', 'mathematics')['responses']['fractions'] == 'Frações são partes de um todo.'
@@ -0,0 +1,62 @@
+"""Leaderboard ranking on both storage backends"""
+
+from datetime import datetime
+
+import pytest
+
+from leaderboard import Leaderboard, ScoreBoard
+
+
+def make_board(storage, now=datetime(2026, 10, 20, 12, 0)):
+    board = Leaderboard(storage, clock=lambda: now)
+    for session_id, xp in (('ana', 300), ('ben', 200), ('cai', 100), ('dev', 50)):
+        board.record(session_id, xp, xp)
+    return board
+
+
+def test_around_top_ranked_starts_at_rank_one(storage):
+    board = make_board(storage).board('weekly')
+    assert board.around('ana', 1) == [(1, 'ana', 300), (2, 'ben', 200)]
+
+
+def test_around_second_ranked_includes_the_leader(storage):
+    board = make_board(storage).board('weekly')
+    assert board.around('ben', 1) == [(1, 'ana', 300), (2, 'ben', 200), (3, 'cai', 100)]
+    assert board.around('ben', 3) == [(1, 'ana', 300), (2, 'ben', 200), (3, 'cai', 100), (4, 'dev', 50)]
+
+
+def test_periods_roll_over_and_all_time_keeps_totals(storage):
+    make_board(storage)
+    later = Leaderboard(storage, clock=lambda: datetime(2026, 10, 21, 9, 0))
+    later.record('dev', 20, 70)
+    assert later.board('daily').top(10) == [(1, 'dev', 20)]
+    assert later.board('weekly').top(2) == [(1, 'ana', 300), (2, 'ben', 200)]
+    assert later.board('all-time').rank('dev') == 4
+    assert later.board('all-time').score('dev') == 70
+
+
+def test_boards_are_shared_through_storage(storage):
+    make_board(storage)
+    # A second worker (or a restart) sees the same rankings
+    other = Leaderboard(storage, clock=lambda: datetime(2026, 10, 20, 20, 0))
+    assert other.board('daily').rank('cai') == 3
+    assert len(other.board('monthly')) == 4
+
+
+def test_unorderable_key_leaves_the_board_intact():
+    board = ScoreBoard()
+    board.set_score('ana', 10)
+    with pytest.raises(TypeError):
+        board.set_score(None, 10)
+    assert board.score(None) is None
+    board.set_score('ana', 20)
+    assert board.slice(0, 5) == [('ana', 20)]
+
+
+@pytest.mark.parametrize('body', [{'xp': 150}, {'session_id': 7, 'xp': 150}])
+def test_award_without_session_is_rejected(client, body):
+    assert client.post('/api/gamification/award-xp', json=body).status_code == 400
+    assert client.post('/api/sync', json=dict(body, xp_events=[])).status_code == 400
+    # The board was not touched, so later awards still work
+    response = client.post('/api/gamification/award-xp', json={'session_id': 'test-award', 'xp': 5})
+    assert response.status_code == 200
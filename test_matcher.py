@@ -0,0 +1,28 @@
+"""Single-pass message classification"""
+
+from matcher import MessageMatcher, PhraseMatcher
+
+KNOWLEDGE = {
+    'mathematics': {'topics': ['fractions', 'algebra'], 'responses': {}},
+    'science': {'topics': ['photosynthesis', 'energy'], 'keywords': {'energy': ['urja']}, 'responses': {}},
+}
+
+
+def test_overlapping_phrases_are_all_reported():
+    automaton = PhraseMatcher([('he', 1), ('she', 2), ('hers', 3), ('his', 4)])
+    assert sorted(automaton.scan('ushers')) == [1, 2, 3]
+
+
+def test_classify_finds_greeting_intent_and_topics():
+    match = MessageMatcher(KNOWLEDGE).classify('Hello! Please explain Fractions, then show me algebra')
+    assert match.greeting and not match.help
+    # 'explain' outranks 'show me' whatever their order in the message
+    assert match.intent == 'explain'
+    assert match.topic_for('mathematics') == 'fractions'
+    assert match.best_topic() == ('mathematics', 'fractions')
+
+
+def test_pack_keywords_name_topics():
+    match = MessageMatcher(KNOWLEDGE).classify('urja kya hai')
+    assert match.best_topic() == ('science', 'energy')
+    assert match.intent is None and not match.greeting
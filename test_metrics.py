@@ -0,0 +1,62 @@
+"""Request metrics and the /metrics endpoint"""
+
+import pytest
+from flask import Flask, Response
+
+from metrics import Histogram, RequestMetrics
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route('/items/<int:item_id>')
+    def item(item_id):
+        return {'id': item_id}
+
+    @app.route('/stream')
+    def stream():
+        return Response(iter(['a', 'b']), mimetype='text/plain')
+
+    return app
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([0.1, 1.0])
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [1, 3]
+    assert histogram.count == 4
+
+
+def test_requests_are_counted_by_route_and_status(app):
+    metrics = RequestMetrics(app)
+    metrics.gauge('test_items', 'Items held.', lambda: 3)
+    client = app.test_client()
+    client.get('/items/1')
+    client.get('/items/2')
+    client.get('/missing').close()
+    text = client.get('/metrics').get_data(as_text=True)
+    # Routes are labelled by rule, so ids do not multiply the series
+    assert 'astrals_http_requests_total{endpoint="/items/<int:item_id>",method="GET",status="200"} 2' in text
+    assert 'status="404"' in text
+    assert 'astrals_http_request_duration_seconds_count{endpoint="/items/<int:item_id>",method="GET"} 2' in text
+    assert 'test_items 3' in text
+
+
+def test_streams_are_recorded_once_sent(app):
+    metrics = RequestMetrics(app)
+    response = app.test_client().get('/stream', buffered=False)
+    assert 'endpoint="/stream"' not in metrics.render()
+    response.close()
+    assert 'astrals_http_requests_total{endpoint="/stream",method="GET",status="200"} 1' in metrics.render()
+
+
+def test_profiles_need_the_token(app):
+    RequestMetrics(app, profile_token='secret')
+    client = app.test_client()
+    assert 'X-Astrals-Profile-Id' not in client.get('/items/1').headers
+    profiled = client.get('/items/1', headers={'X-Astrals-Profile': 'secret'})
+    profile = client.get(f"/metrics/profiles/{profiled.headers['X-Astrals-Profile-Id']}")
+    assert profile.status_code == 200
+    assert profile.get_data(as_text=True).startswith('# GET /items/1')
@@ -0,0 +1,37 @@
+"""Landing page and the app version it is cached under"""
+
+import pytest
+
+import app as astrals
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    calls = []
+
+    def compute():
+        calls.append(None)
+        return f'v{len(calls)}'
+
+    monkeypatch.setattr(astrals, 'compute_app_version', compute)
+    monkeypatch.setattr(astrals, '_app_version', {'value': None, 'checked': 0.0})
+    monkeypatch.setitem(astrals.app.config, 'VERSION_CHECK_INTERVAL', 60)
+    return calls
+
+
+def test_version_is_computed_once_per_interval(computed, monkeypatch):
+    assert [astrals.app_version() for _ in range(3)] == ['v1'] * 3
+    monkeypatch.setitem(astrals.app.config, 'VERSION_CHECK_INTERVAL', 0)
+    assert astrals.app_version() == 'v2'
+
+
+def test_debug_checks_every_time(computed, monkeypatch):
+    monkeypatch.setattr(astrals.app, 'debug', True)
+    assert [astrals.app_version() for _ in range(2)] == ['v1', 'v2']
+
+
+def test_index_is_served_and_revalidated(client):
+    page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert page.status_code == 200
+    assert page.headers['Content-Encoding'] == 'gzip'
+    assert client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': page.headers['ETag']}).status_code == 304
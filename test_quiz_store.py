@@ -0,0 +1,63 @@
+"""Quiz bank sampling and the quiz API's count bounds"""
+
+import json
+import os
+import random
+
+import pytest
+
+from quiz_store import QuizStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    questions = [{'question': f'Q{i}', 'options': ['a', 'b'], 'correct': 0, 'xp': 10} for i in range(5)]
+    (tmp_path / 'mathematics.json').write_text(json.dumps({'subject': 'mathematics', 'levels': {'6': questions}}))
+    return QuizStore(str(tmp_path))
+
+
+def test_count_is_clamped_to_the_bank(store):
+    assert len(store.get_questions('mathematics', 6, 3, rng=random.Random(1))) == 3
+    assert len(store.get_questions('mathematics', 6, 50)) == 5
+    assert len(store.get_questions('mathematics', 6)) == 5
+    assert store.get_questions('mathematics', 6, -1) == []
+
+
+@pytest.mark.parametrize('count', ['-1', '0'])
+def test_non_positive_count_is_rejected(client, count):
+    response = client.get(f'/api/quiz/mathematics?class=6&count={count}')
+    assert response.status_code == 400
+
+
+def test_etag_names_the_number_of_questions_served(client):
+    everything = client.get('/api/quiz/mathematics?class=6')
+    oversized = client.get('/api/quiz/mathematics?class=6&count=100000')
+    assert oversized.status_code == 200
+    assert oversized.headers['ETag'] == everything.headers['ETag']
+    assert len(oversized.get_json()['questions']) == len(everything.get_json()['questions'])
+
+
+def test_pack_rows_follow_its_fields(store):
+    pack = store.pack('mathematics', 6)
+    assert len(pack['questions']) == 5
+    row = dict(zip(pack['fields'], pack['questions'][0]))
+    assert row['question'] == 'Q0' and row['correct'] == 0
+    assert pack['version'] == store.content_version('mathematics', 6)
+
+
+def test_edited_bank_is_reloaded_with_a_new_version(store, tmp_path):
+    before = store.content_version('mathematics', 6)
+    questions = [{'question': 'New', 'options': ['a', 'b'], 'correct': 1, 'xp': 10}]
+    (tmp_path / 'mathematics.json').write_text(json.dumps({'subject': 'mathematics', 'levels': {'6': questions}}))
+    os.utime(tmp_path / 'mathematics.json', ns=(1, 1))
+    assert store.reload()
+    assert store.content_version('mathematics', 6) != before
+    assert [q['question'] for q in store.get_questions('mathematics', 6)] == ['New']
+
+
+def test_quiz_pack_is_cacheable(client):
+    pack = client.get('/api/quiz-pack/mathematics?class=6')
+    assert pack.status_code == 200
+    assert pack.get_json()['questions']
+    assert client.get('/api/quiz-pack/mathematics?class=6', headers={'If-None-Match': pack.headers['ETag']}).status_code == 304
+    assert client.get('/api/quiz-pack/mathematics?class=99').status_code == 404
@@ -0,0 +1,47 @@
+"""Cached chat responses"""
+
+from app import AstralsHub
+from generation import BackendUnavailable
+from response_cache import LRUCache
+
+
+class CountingBackend:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def generate(self, prompt, subject=None, user_level='intermediate', locale=None, key=None):
+        self.calls += 1
+        if self.fail:
+            raise BackendUnavailable('down')
+        return f'answer to {prompt}'
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_equivalent_messages_share_a_cached_response():
+    hub = AstralsHub()
+    hub.backend = CountingBackend()
+    first = hub.generate_response('What is  Photosynthesis?', 'science')
+    assert hub.generate_response('what is photosynthesis?', 'science') == first
+    assert hub.backend.calls == 1
+    hub.generate_response('what is photosynthesis?', 'mathematics')
+    assert hub.backend.calls == 2
+
+
+def test_fallback_answers_are_not_cached():
+    hub = AstralsHub()
+    hub.backend = CountingBackend(fail=True)
+    hub.generate_response('hello', 'science')
+    hub.generate_response('hello', 'science')
+    assert hub.backend.calls == 2
+    assert len(hub.response_cache) == 0
@@ -0,0 +1,78 @@
+"""Search: BM25 ranking, prefix matching and per-session chat history"""
+
+from search import InvertedIndex, SearchService, snippet
+
+CONTENT = [
+    ('Photosynthesis turns light into sugar in plant leaves', {'kind': 'topic', 'title': 'Photosynthesis'}),
+    ('Plants grow towards light; growth needs water', {'kind': 'topic', 'title': 'Growth'}),
+    ('Fractions add up when their denominators match', {'kind': 'topic', 'title': 'Fractions'}),
+]
+
+
+def chat(text):
+    return {'timestamp': 1792341685, 'subject': 'science', 'user_message': text, 'ai_response': 'answer'}
+
+
+def test_rarer_and_more_frequent_terms_rank_higher():
+    index = InvertedIndex()
+    index.add(1, 'light light light', {})
+    index.add(2, 'light and water', {})
+    index.add(3, 'water', {})
+    scores = index.score(['light'])
+    assert set(scores) == {1, 2}
+    assert scores[1] > scores[2]
+
+
+def test_prefixes_match_longer_words_for_less():
+    index = InvertedIndex()
+    index.add(1, 'grow', {})
+    index.add(2, 'growth', {})
+    assert index.expand('gr') == []
+    assert index.expand('grow') == [('grow', 1.0), ('growth', 0.5)]
+    scores = index.score(['grow'])
+    assert scores[1] > scores[2] > 0
+
+
+def test_content_is_reindexed_only_when_its_version_changes(storage):
+    version = ['v1']
+    service = SearchService(storage, lambda: (version[0], CONTENT))
+    first = service.content_index()
+    assert service.content_index() is first
+    version[0] = 'v2'
+    assert service.content_index() is not first
+    results = service.search('photosynthesis')
+    assert [result['title'] for result in results] == ['Photosynthesis']
+    assert 'text' not in results[0] and results[0]['score'] > 0
+
+
+def test_history_is_private_and_caught_up(storage):
+    service = SearchService(storage, lambda: ('v1', CONTENT))
+    storage.append_message('ana', chat('why do volcanoes erupt'))
+    assert service.search('volcanoes') == []
+    assert [result['kind'] for result in service.search('volcanoes', session_id='ana')] == ['chat']
+    assert service.search('volcanoes', session_id='ben') == []
+    storage.append_message('ana', chat('how hot is volcanic lava'))
+    assert len(service.search('volcanic', session_id='ana')) == 1
+
+
+def test_history_indexes_are_bounded_and_forgettable(storage):
+    service = SearchService(storage, lambda: ('v1', CONTENT), max_sessions=2)
+    for session_id in ('ana', 'ben', 'cleo'):
+        service.search('light', session_id=session_id)
+    assert len(service) == 2
+    service.forget('cleo')
+    assert len(service) == 1
+
+
+def test_snippet_is_centred_on_the_first_match():
+    text = 'filler words ' * 40 + 'the mitochondria is the powerhouse'
+    excerpt = snippet(text, ['mitochondria'], length=60)
+    assert 'mitochondria' in excerpt
+    assert len(excerpt) <= 70
+
+
+def test_endpoint_validates_the_query(client):
+    assert client.get('/api/search?q=').status_code == 400
+    response = client.get('/api/search?q=photosynthesis&limit=1000')
+    assert response.status_code == 200
+    assert response.get_json()['query'] == 'photosynthesis'
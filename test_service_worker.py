@@ -0,0 +1,30 @@
+"""The service worker: versioned app shell and precached quiz packs"""
+
+import json
+import re
+
+import app as astrals
+
+
+def constant(script, name):
+    return json.loads(re.search(rf'^const {name} = (.*);$', script, re.MULTILINE).group(1))
+
+
+def test_worker_carries_the_current_version(client, monkeypatch):
+    monkeypatch.setattr(astrals, 'app_version', lambda: 'abc123')
+    response = client.get('/sw.js')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/javascript'
+    assert response.cache_control.no_cache
+    assert constant(response.get_data(as_text=True), 'VERSION') == 'abc123'
+
+
+def test_shell_and_quiz_packs_are_precached(client):
+    script = client.get('/sw.js').get_data(as_text=True)
+    shell = constant(script, 'SHELL_URLS')
+    assert shell[0] == '/'
+    with astrals.app.test_request_context():
+        assert astrals.asset_pipeline.asset_url('script.js') in shell
+    packs = constant(script, 'QUIZ_PACK_URLS')
+    assert len(packs) == len(list(astrals.astrals_hub.quiz_store.levels()))
+    assert all(client.get(url).status_code == 200 for url in packs[:2])
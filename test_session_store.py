@@ -0,0 +1,43 @@
+"""Bounded chat session store: caps, eviction and spilling"""
+
+from session_store import SessionStore
+
+
+def message(text):
+    return {'timestamp': 1792341685, 'subject': 'science', 'user_message': text, 'ai_response': 'answer'}
+
+
+def texts(messages):
+    return [m['user_message'] for m in messages]
+
+
+def test_sessions_are_capped_per_message_and_per_store():
+    store = SessionStore(max_sessions=2, max_messages=2)
+    for text in ('q1', 'q2', 'q3'):
+        store.append('ana', message(text))
+    store.append('ben', message('b1'))
+    store.get('ana')
+    store.append('cai', message('c1'))
+    assert texts(store.get('ana')) == ['q2', 'q3']
+    # ben was the least recently used session
+    assert store.get('ben') == []
+    assert store.stats()['evicted_lru'] == 1
+    assert store.stats()['trimmed_messages'] == 1
+
+
+def test_idle_sessions_expire():
+    now = [0.0]
+    store = SessionStore(ttl=60, clock=lambda: now[0])
+    store.append('ana', message('q1'))
+    now[0] = 61
+    assert store.get('ana') == []
+    assert store.stats()['evicted_ttl'] == 1
+
+
+def test_spilled_messages_stay_readable(tmp_path):
+    store = SessionStore(max_sessions=1, max_messages=2, spill_dir=str(tmp_path))
+    ids = [store.append('ana', message(text)) for text in ('q1', 'q2', 'q3')]
+    store.append('ben', message('b1'))
+    assert texts(store.get('ana')) == ['q1', 'q2', 'q3']
+    assert [m['id'] for m in store.since('ana', ids[0])] == ids[1:]
+    assert [m['id'] for m in store.before('ana', ids[2], limit=1)] == ids[1:2]
@@ -0,0 +1,33 @@
+"""Shutdown: saving the memory backend"""
+
+import pytest
+
+import app as astrals
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    path = tmp_path / 'snapshot.jsonl'
+    monkeypatch.setitem(astrals.app.config, 'MEMORY_SNAPSHOT', str(path))
+    return path
+
+
+def test_single_worker_saves_the_snapshot(snapshot):
+    astrals.save_memory_state()
+    assert snapshot.exists()
+
+
+def test_several_workers_refuse_the_snapshot(snapshot, monkeypatch):
+    monkeypatch.setitem(astrals.app.config, 'WORKERS', 4)
+    astrals.save_memory_state()
+    assert not snapshot.exists()
+
+
+def test_requests_finish_when_their_body_is_read(client):
+    before = astrals.in_flight.count
+    for _ in range(3):
+        client.get('/api/health', buffered=False).get_data()
+    streamed = client.post('/api/chat/stream', json={'message': 'hello', 'session_id': 'test-in-flight'}, buffered=False)
+    assert astrals.in_flight.count == before + 1
+    streamed.close()
+    assert astrals.in_flight.count == before
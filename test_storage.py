@@ -0,0 +1,65 @@
+"""Storage backends: message ids, paging, atomic updates and persistence"""
+
+import threading
+
+from storage import SQLiteStorage
+
+
+def add_messages(storage, session_id, count):
+    return [storage.append_message(session_id, {'timestamp': 1792341685, 'user_message': f'q{i}', 'ai_response': f'a{i}', 'subject': 'science'})
+            for i in range(count)]
+
+
+def test_message_ids_increase_and_page_both_ways(storage):
+    ids = add_messages(storage, 'ana', 5)
+    assert ids == sorted(ids) and len(set(ids)) == 5
+    assert [m['id'] for m in storage.get_messages_since('ana', ids[1], limit=2)] == ids[2:4]
+    assert [m['id'] for m in storage.get_messages_before('ana', ids[4], limit=2)] == ids[2:4]
+    assert [m['id'] for m in storage.get_messages_before('ana', limit=2)] == ids[3:]
+    assert storage.count_messages('ana') == 5
+    assert storage.get_history('ben') == []
+
+
+def test_cleared_history_keeps_ids_increasing(storage):
+    first = add_messages(storage, 'ana', 2)
+    storage.clear_history('ana')
+    assert storage.count_messages('ana') == 0
+    assert add_messages(storage, 'ana', 1)[0] > first[-1]
+
+
+def test_concurrent_updates_are_not_lost(storage):
+    def increment(profile):
+        profile = profile or {'count': 0}
+        profile['count'] += 1
+        return profile, profile['count']
+
+    def worker():
+        for _ in range(50):
+            storage.update_profile('ana', increment)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert storage.get_profile('ana') == {'count': 200}
+
+
+def test_operations_are_claimed_once(storage):
+    assert storage.claim_operation('ana', 'op-1')
+    assert not storage.claim_operation('ana', 'op-1')
+    assert storage.claim_operation('ben', 'op-1')
+    storage.release_operation('ana', 'op-1')
+    assert storage.claim_operation('ana', 'op-1')
+
+
+def test_sqlite_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'astrals.db')
+    backend = SQLiteStorage(path)
+    ids = add_messages(backend, 'ana', 2)
+    backend.save_gamification('ana', {'total_xp': 40})
+    backend.close()
+    reopened = SQLiteStorage(path)
+    assert [m['id'] for m in reopened.get_history('ana')] == ids
+    assert reopened.get_gamification('ana') == {'total_xp': 40}
+    reopened.close()
@@ -0,0 +1,51 @@
+"""Offline sync: replayed batches and failed claims"""
+
+import app as astrals
+import storage as storage_module
+from storage import MemoryStorage
+
+
+def batch(session_id, **extra):
+    return dict({
+        'session_id': session_id,
+        'messages': [{'id': 'm1', 'user_message': 'hello', 'ai_response': 'hi', 'subject': 'science'}],
+        'xp_events': [{'id': 'x1', 'xp': 10}, {'id': 'x2', 'xp': 5}],
+    }, **extra)
+
+
+def test_replayed_batch_is_applied_once(client):
+    first = client.post('/api/sync', json=batch('test-sync-replay')).get_json()
+    replay = client.post('/api/sync', json=batch('test-sync-replay')).get_json()
+    assert first['applied'] == {'messages': 1, 'xp_events': 2, 'duplicates': 0}
+    assert replay['applied'] == {'messages': 0, 'xp_events': 0, 'duplicates': 3}
+    assert replay['gamification']['total_xp'] == first['gamification']['total_xp'] == 15
+    history = client.get('/api/chat/history/test-sync-replay').get_json()
+    assert len(history['history']) == 1
+
+
+def test_failed_award_releases_its_claims(client, monkeypatch):
+    def fail(session_id, events):
+        raise ValueError('award failed')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(astrals.gamification, 'award_many', fail)
+        assert client.post('/api/sync', json=batch('test-sync-retry')).status_code == 400
+    # The messages went in; the XP events were not applied, so the retry applies them
+    retry = client.post('/api/sync', json=batch('test-sync-retry')).get_json()
+    assert retry['applied'] == {'messages': 0, 'xp_events': 2, 'duplicates': 1}
+
+
+def test_rejected_batch_claims_nothing(client):
+    bad = batch('test-sync-invalid', xp_events=[{'id': 'x1', 'xp': 10}, {'id': 'x2', 'xp': 'lots'}])
+    assert client.post('/api/sync', json=bad).status_code == 400
+    fixed = client.post('/api/sync', json=batch('test-sync-invalid')).get_json()
+    assert fixed['applied'] == {'messages': 1, 'xp_events': 2, 'duplicates': 0}
+
+
+def test_memory_operations_are_bounded_across_sessions(monkeypatch):
+    monkeypatch.setattr(storage_module, 'MAX_OPERATION_SESSIONS', 2)
+    backend = MemoryStorage()
+    for session_id in ('ana', 'ben', 'cai'):
+        assert backend.claim_operation(session_id, 'op')
+    assert list(backend.applied_operations) == ['ben', 'cai']
+    assert not backend.claim_operation('cai', 'op')
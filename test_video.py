@@ -0,0 +1,28 @@
+"""Splash video delivery: byte ranges and versioned caching"""
+
+import app as astrals
+
+
+def test_range_request_gets_partial_content(client):
+    response = client.get('/videos/intro.mp4', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert len(response.data) == 100
+    assert response.headers['Content-Range'].startswith('bytes 0-99/')
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_only_the_current_version_is_immutable(client):
+    with astrals.app.test_request_context():
+        url = astrals.video_url('intro.mp4')
+    current = client.get(url, headers={'Range': 'bytes=0-0'})
+    assert current.cache_control.immutable
+    assert current.cache_control.max_age == 365 * 24 * 3600
+    stale = client.get('/videos/intro.mp4?v=old', headers={'Range': 'bytes=0-0'})
+    assert not stale.cache_control.immutable
+    assert stale.cache_control.max_age == astrals.app.config['VIDEO_MAX_AGE']
+
+
+def test_missing_video_has_no_url(client):
+    with astrals.app.test_request_context():
+        assert astrals.video_url('missing.mp4') is None
+    assert client.get('/videos/missing.mp4').status_code == 404